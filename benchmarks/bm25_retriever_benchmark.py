@@ -0,0 +1,98 @@
+import argparse
+import json
+import os
+from time import perf_counter
+
+from evaluation.config import benchmark_filename, data_filepath
+from questionAnswering.bm25 import BM25Index, BM25Retriever
+from questionAnswering.config import generated_srd_filepath
+
+# Compare the in-process BM25 retriever with Elasticsearch on the benchmark
+# questions: the latency of each query, and how often the article a question
+# was written from is in the top 10 documents. Needs Elasticsearch running,
+# with the articles indexed by the flask app.
+
+repository_directory = os.path.join(os.path.dirname(__file__), '..')
+
+
+def read_benchmark_questions(benchmark_filepath):
+    '''Return each question in a SQuAD benchmark file, with the title of the
+    article it was written from.
+
+    benchmark_filepath: str
+    return: List[Tuple[str, str]]
+    '''
+    with open(benchmark_filepath) as f:
+        squad_benchmark = json.load(f)
+    return [(qas['question'], article['title'])
+            for article in squad_benchmark['data']
+            for paragraph in article['paragraphs']
+            for qas in paragraph['qas']]
+
+
+def evaluate(retriever, questions, top_k):
+    '''Return the latency of each query in seconds, and the fraction of
+    questions with their article in the top_k documents.
+
+    retriever: A haystack retriever.
+    questions: List[Tuple[str, str]]
+    top_k: int
+    return: List[float], float
+    '''
+    latencies = []
+    found = 0
+    for question, title in questions:
+        start_time = perf_counter()
+        documents = retriever.retrieve(question, top_k=top_k)
+        latencies.append(perf_counter() - start_time)
+        found += any(document.meta.get('name') == title
+                     for document in documents)
+    return latencies, found / len(questions)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--top-k', type=int, default=10)
+    parser.add_argument('--skip-elasticsearch', action='store_true')
+    args = parser.parse_args()
+
+    questions = read_benchmark_questions(os.path.join(
+        repository_directory, data_filepath, benchmark_filename))
+
+    start_time = perf_counter()
+    bm25_index = BM25Index.build_from_file(
+        os.path.join(repository_directory, generated_srd_filepath))
+    print('Built the BM25 index of {} articles in {:.2f} seconds.'.format(
+        len(bm25_index), perf_counter() - start_time))
+
+    retrievers = [('BM25', BM25Retriever(bm25_index))]
+    if not args.skip_elasticsearch:
+        from haystack.document_store.elasticsearch import \
+            ElasticsearchDocumentStore
+        from haystack.retriever.sparse import ElasticsearchRetriever
+        document_store = ElasticsearchDocumentStore(host="localhost",
+                                                    username="",
+                                                    password="",
+                                                    index="document")
+        retrievers.append(('Elasticsearch', ElasticsearchRetriever(
+            document_store=document_store)))
+
+    print('{} questions, recall at {}.'.format(len(questions), args.top_k))
+    print('{:>14} {:>10} {:>10} {:>10}'.format('retriever', 'p50 ms',
+                                               'p95 ms', 'recall'))
+    for name, retriever in retrievers:
+        # Warm up connections and caches.
+        evaluate(retriever, questions[:10], args.top_k)
+        latencies, recall = evaluate(retriever, questions, args.top_k)
+        print('{:>14} {:>10.3f} {:>10.3f} {:>10.1%}'.format(
+            name, 1000 * percentile(latencies, 0.5),
+            1000 * percentile(latencies, 0.95), recall))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+import argparse
+import os
+from time import perf_counter
+
+from evaluation.config import benchmark_filename, data_filepath
+from evaluation.create_eval_file import get_questions_from_squad
+from evaluation.squad_eval import compute_exact, compute_f1
+from questionAnswering.bm25 import BM25Index, BM25Retriever
+from questionAnswering.config import generated_srd_filepath, model_name_or_path
+from questionAnswering.SrdResponder import SrdResponderConfig, load_reader
+from questionAnswering.utils import create_absolute_path
+
+# Answer the benchmark questions with the articles split into passages of
+# different sizes, and compare how much text the reader has to read for each
+# question, the latency, and the exact match and F1 of the top answer. Uses
+# the in-process BM25 retriever, so it doesn't need Elasticsearch.
+
+repository_directory = os.path.join(os.path.dirname(__file__), '..')
+
+
+def evaluate(retriever, reader, questions, top_k_retriever, top_k_reader):
+    '''Answer each question, and return the latency of each in seconds, the
+    characters read for each, and the mean exact match and F1 of the top
+    answers.
+
+    retriever: BM25Retriever
+    reader: FARMReader
+    questions: List[Tuple[str, str, List[str]]] Questions with their ids and
+        answers.
+    top_k_retriever: int
+    top_k_reader: int
+    return: List[float], List[int], float, float
+    '''
+    latencies = []
+    characters_read = []
+    exact_match = f1 = 0.0
+    for question, _, gold_answers in questions:
+        start_time = perf_counter()
+        documents = retriever.retrieve(question, top_k=top_k_retriever)
+        prediction = reader.predict(question=question, documents=documents,
+                                    top_k=top_k_reader)
+        latencies.append(perf_counter() - start_time)
+        characters_read.append(sum(len(document.text)
+                                   for document in documents))
+
+        answers = prediction['answers']
+        predicted = (answers[0]['answer'] or '') if answers else ''
+        exact_match += max(compute_exact(gold, predicted)
+                           for gold in gold_answers)
+        f1 += max(compute_f1(gold, predicted) for gold in gold_answers)
+    return (latencies, characters_read, exact_match / len(questions),
+            f1 / len(questions))
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--chunk-sizes', type=int, nargs='*',
+                        default=[500, 1000, 2000, 4000],
+                        help='Whole articles are always compared too.')
+    parser.add_argument('--chunk-overlap', type=int, default=1)
+    parser.add_argument('--top-k-retriever', type=int, default=10)
+    parser.add_argument('--top-k-reader', type=int, default=5)
+    parser.add_argument('--questions', type=int,
+                        help='Only use the first this many questions.')
+    args = parser.parse_args()
+
+    questions = get_questions_from_squad(
+        os.path.join(repository_directory, data_filepath, benchmark_filename),
+        with_answers=True)[:args.questions]
+    articles_filepath = os.path.join(repository_directory,
+                                     generated_srd_filepath)
+
+    config = SrdResponderConfig(retriever='BM25')
+    src_directory = os.path.join(repository_directory, 'src',
+                                 'questionAnswering')
+    model_path, is_local = model_name_or_path
+    if is_local:
+        model_path = create_absolute_path(src_directory, model_path)
+    reader = load_reader(model_path,
+                         create_absolute_path(src_directory,
+                                              config.model_cache_directory),
+                         config.use_gpu)
+
+    print('{} questions, {} passages retrieved for each.'.format(
+        len(questions), args.top_k_retriever))
+    print('{:>10} {:>9} {:>10} {:>10} {:>12} {:>8} {:>8}'.format(
+        'chunk size', 'passages', 'p50 ms', 'p95 ms', 'chars read', 'EM',
+        'F1'))
+    for chunk_size in [None] + args.chunk_sizes:
+        index = BM25Index.build_from_file(articles_filepath, chunk_size,
+                                          args.chunk_overlap)
+        retriever = BM25Retriever(index)
+        # Warm up the model.
+        evaluate(retriever, reader, questions[:2], args.top_k_retriever,
+                 args.top_k_reader)
+        latencies, characters_read, exact_match, f1 = evaluate(
+            retriever, reader, questions, args.top_k_retriever,
+            args.top_k_reader)
+        print('{:>10} {:>9} {:>10.0f} {:>10.0f} {:>12.0f} {:>8.1%} {:>8.1%}'
+              .format(chunk_size or 'article', len(index),
+                      1000 * percentile(latencies, 0.5),
+                      1000 * percentile(latencies, 0.95),
+                      sum(characters_read) / len(characters_read),
+                      exact_match, f1))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+import gc
+import tracemalloc
+
+from svgParsing.formatted_text import CompactPage, FormattedText, svg_to_text
+from svgParsing.parse_rules import srd_page_numbers
+
+# Compare the memory used to hold every page of the SRD as slotted
+# FormattedText objects with interned colors, and as CompactPages, against the
+# previous class, which had a per-instance __dict__ and a separate color string
+# per object.
+
+
+class DictFormattedText:
+    '''The attributes of FormattedText, stored the way the class used to
+    store them.'''
+
+    def __init__(self, text, color, size, bold=False, italic=False):
+        self.text = text
+        self.color = color
+        self.size = size
+        self.bold = bold
+        self.italic = italic
+
+
+def traced_size(build):
+    '''Return the memory still allocated by build() once it returns, along
+    with its result.
+
+    build: Callable[[], Any]
+    return: int, Any
+    '''
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, result
+
+
+def main():
+    pages = [svg_to_text('{}.svg'.format(page_number))
+             for page_number in srd_page_numbers]
+    values = [[text.to_tuple() for text in page] for page in pages]
+    del pages
+
+    # Each color is copied, because the strings read from separate svg
+    # elements used to be separate objects.
+    def build_dict_pages():
+        return [[DictFormattedText(text, ''.join(list(color)), size, bold,
+                                   italic)
+                 for text, color, size, bold, italic in page]
+                for page in values]
+
+    def build_slotted_pages():
+        return [[FormattedText(text, ''.join(list(color)), size, bold, italic)
+                 for text, color, size, bold, italic in page]
+                for page in values]
+
+    def build_compact_pages():
+        return [CompactPage(FormattedText(text, ''.join(list(color)), size,
+                                          bold, italic)
+                            for text, color, size, bold, italic in page)
+                for page in values]
+
+    # The text strings are shared by every version, so only the objects, the
+    # colors, the lists and the columns are counted.
+    dict_size, dict_pages = traced_size(build_dict_pages)
+    del dict_pages
+    slotted_size, slotted_pages = traced_size(build_slotted_pages)
+    del slotted_pages
+    compact_size, compact_pages = traced_size(build_compact_pages)
+
+    total_texts = sum(len(page) for page in values)
+    print('{} pieces of text over {} pages'.format(total_texts, len(values)))
+    print('{:>10} {:>12} {:>14}'.format('class', 'MiB', 'bytes per text'))
+    print('{:>10} {:>12.2f} {:>14.1f}'.format(
+        '__dict__', dict_size / 2**20, dict_size / total_texts))
+    print('{:>10} {:>12.2f} {:>14.1f}'.format(
+        '__slots__', slotted_size / 2**20, slotted_size / total_texts))
+    print('{:>10} {:>12.2f} {:>14.1f}'.format(
+        'compact', compact_size / 2**20, compact_size / total_texts))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+import os
+from time import time
+
+from svgParsing import formatted_text
+from svgParsing.config import svg_directory
+from svgParsing.formatted_text import (iter_text_pieces, join_decision,
+                                       merge_runs)
+from svgParsing.parse_rules import srd_page_numbers
+
+# Measure the hit rate of the join decision cache over the SRD, and how much
+# time it saves when merging the pieces of text on every page.
+
+
+def read_pieces(page_number):
+    '''Return the unmerged pieces of text on a page.
+
+    page_number: int
+    return: List[FormattedText]
+    '''
+    return list(iter_text_pieces(
+        os.path.join(svg_directory, '{}.svg'.format(page_number))))
+
+
+def time_merging(pages):
+    '''Merge the pieces on every page, and return the time taken and the merged
+    text.
+
+    pages: List[List[FormattedText]]
+    return: float, List[str]
+    '''
+    start_time = time()
+    merged = [[text.text for text in merge_runs(page)] for page in pages]
+    return time() - start_time, merged
+
+
+def main():
+    pages = [read_pieces(page_number) for page_number in srd_page_numbers]
+    # Load the word list first, so that it isn't counted in the timings.
+    formatted_text.is_english_word('word')
+
+    # Without the cache
+    formatted_text.join_decision = join_decision.__wrapped__
+    uncached_duration, uncached_text = time_merging(pages)
+    formatted_text.join_decision = join_decision
+
+    # With an empty cache
+    join_decision.cache_clear()
+    cached_duration, cached_text = time_merging(pages)
+    cache_info = join_decision.cache_info()
+
+    if cached_text != uncached_text:
+        raise ValueError('Cached join decisions gave different text.')
+
+    lookups = cache_info.hits + cache_info.misses
+    print('Join decisions: {} ({} hits, {} misses, hit rate {:.1%}).'.format(
+        lookups, cache_info.hits, cache_info.misses,
+        cache_info.hits / lookups if lookups else 0))
+    print('Cache entries: {} of {}.'.format(cache_info.currsize,
+                                            cache_info.maxsize))
+    print('Merge time without the cache: {:.3f} seconds.'.format(
+        uncached_duration))
+    print('Merge time with the cache: {:.3f} seconds ({:+.1%}).'.format(
+        cached_duration, cached_duration / uncached_duration - 1))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+import argparse
+import json
+import os
+from functools import reduce
+from time import time
+
+from questionAnswering.config import generated_srd_filepath
+from svgParsing.formatted_text import FormattedText, merge_pages, merge_runs
+
+# Show how merging runs of text scales with the size of the SRD, using a
+# synthetic corpus built from the generated articles. At scale k, every
+# paragraph is repeated k times, which makes the corpus k times larger, with
+# k times longer runs to merge and k times more pages to stitch together.
+
+words_per_piece = 6
+pieces_per_page = 64
+
+
+def synthetic_pieces(articles, scale):
+    '''Split the articles into short FormattedText pieces. Paragraphs
+    alternate between two colors, so each paragraph is one run to merge.
+
+    articles: Dict[str, str]
+    scale: int
+    return: List[FormattedText]
+    '''
+    pieces = []
+    colors = ['#000000', '#58180d']
+    for text in articles.values():
+        for i, paragraph in enumerate(text.split('\n')):
+            words = ((paragraph + ' ') * scale).split(' ')
+            for j in range(0, len(words), words_per_piece):
+                piece = ' '.join(words[j:j + words_per_piece])
+                if piece:
+                    pieces.append(FormattedText(piece, colors[i % 2], 42))
+    return pieces
+
+
+def merge_runs_pairwise(pieces):
+    '''The previous way of merging runs, which copies the text of the run for
+    every piece added to it.
+
+    pieces: List[FormattedText]
+    return: List[FormattedText]
+    '''
+    merged = []
+    merge_text = pieces[0]
+    for text in pieces[1:]:
+        if merge_text.should_merge(text):
+            merge_text = merge_text.merge(text)
+        else:
+            merged.append(merge_text)
+            merge_text = text
+    merged.append(merge_text)
+    return merged
+
+
+def merge_pages_copying(page_1, page_2):
+    '''The previous merge_pages, which builds a new list for every page.
+
+    page_1: List[FormattedText]
+    page_2: List[FormattedText]
+    return: List[FormattedText]
+    '''
+    if not page_1 or not page_2:
+        return page_1 + page_2
+    if page_1[-1].should_merge(page_2[0]):
+        return page_1[:-1] + [page_1[-1].merge(page_2[0])] + page_2[1:]
+    return page_1 + page_2
+
+
+def time_call(fn, *args):
+    start_time = time()
+    result = fn(*args)
+    return time() - start_time, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 2, 5, 10])
+    args = parser.parse_args()
+
+    with open(os.path.join(os.path.dirname(__file__), '..',
+                           generated_srd_filepath)) as f:
+        articles = json.load(f)
+
+    print('{:>6} {:>10} | {:>12} {:>12} | {:>12} {:>12}'.format(
+        'scale', 'pieces', 'runs: old', 'runs: new', 'pages: old',
+        'pages: new'))
+    print('{:>6} {:>10} | {:>25} | {:>25}'.format(
+        '', '', 'microseconds per piece', 'microseconds per page'))
+
+    for scale in args.scales:
+        pieces = synthetic_pieces(articles, scale)
+
+        old_duration, old_runs = time_call(merge_runs_pairwise, pieces)
+        new_duration, new_runs = time_call(lambda p: list(merge_runs(p)),
+                                           pieces)
+        if [run.text for run in old_runs] != [run.text for run in new_runs]:
+            raise ValueError('Merged runs differ at scale {}.'.format(scale))
+
+        pages = [pieces[i:i + pieces_per_page]
+                 for i in range(0, len(pieces), pieces_per_page)]
+        old_pages_duration, _ = time_call(reduce, merge_pages_copying, pages,
+                                          [])
+        new_pages_duration, _ = time_call(reduce, merge_pages, pages, [])
+
+        print('{:>6} {:>10} | {:>12.2f} {:>12.2f} | {:>12.1f} {:>12.1f}'.format(
+            scale, len(pieces),
+            1e6 * old_duration / len(pieces),
+            1e6 * new_duration / len(pieces),
+            1e6 * old_pages_duration / len(pages),
+            1e6 * new_pages_duration / len(pages)))
+
+
+if __name__ == '__main__':
+    main()
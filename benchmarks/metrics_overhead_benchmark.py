@@ -0,0 +1,35 @@
+import argparse
+from timeit import timeit
+
+from questionAnswering.metrics import Registry
+
+# The cost of recording metrics, on and off, next to an empty block. A
+# question records a few dozen values, so this is the overhead per question
+# divided by that.
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeats', type=int, default=200000)
+    args = parser.parse_args()
+
+    print('{:>10} {:>16} {:>16}'.format('metrics', 'timer ns', 'counter ns'))
+    for enabled in [True, False]:
+        registry = Registry(enabled)
+        seconds = registry.histogram('seconds', 'Seconds.', ['stage'])
+        lookups = registry.counter('lookups_total', 'Lookups.', ['result'])
+
+        def time_block():
+            with seconds.time(stage='reader'):
+                pass
+
+        timer_seconds = timeit(time_block, number=args.repeats)
+        counter_seconds = timeit(lambda: lookups.inc(result='hit'),
+                                 number=args.repeats)
+        print('{:>10} {:>16.0f} {:>16.0f}'.format(
+            'on' if enabled else 'off', 1e9 * timer_seconds / args.repeats,
+            1e9 * counter_seconds / args.repeats))
+
+
+if __name__ == '__main__':
+    main()
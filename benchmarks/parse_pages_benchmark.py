@@ -0,0 +1,59 @@
+import argparse
+import json
+import os
+from functools import reduce
+from time import time
+
+from svgParsing.formatted_text import merge_pages
+from svgParsing.parse_rules import generate_srd_articles, parse_pages
+
+# Time the page parsing step for an increasing number of worker processes, and
+# check that every run stitches together to the same articles as the serial
+# path.
+
+
+def time_parse_pages(workers):
+    '''Parse and stitch all SRD pages, and return the duration in seconds
+    along with the stitched text.
+
+    workers: int
+    return: float, List[Tuple]
+    '''
+    start_time = time()
+    pages = parse_pages(workers=workers)
+    merged_content = reduce(merge_pages, pages, [])
+    duration = time() - start_time
+    return duration, [(text.text, text.color, text.size, text.bold, text.italic)
+                      for text in merged_content]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count(),
+                        help='Largest process pool size to time.')
+    args = parser.parse_args()
+
+    serial_articles = json.dumps(generate_srd_articles(workers=1))
+
+    serial_duration, serial_content = time_parse_pages(1)
+    print('{:>8} {:>10} {:>8}'.format('workers', 'seconds', 'speedup'))
+    print('{:>8} {:>10.2f} {:>8.2f}'.format(1, serial_duration, 1.0))
+
+    for workers in range(2, args.max_workers + 1):
+        duration, content = time_parse_pages(workers)
+        if content != serial_content:
+            raise ValueError(
+                'Parsing with {} workers gave different text.'.format(workers))
+        print('{:>8} {:>10.2f} {:>8.2f}'.format(
+            workers, duration, serial_duration / duration))
+
+    parallel_articles = json.dumps(
+        generate_srd_articles(workers=args.max_workers))
+    if parallel_articles != serial_articles:
+        raise ValueError('Parallel article output differs from serial output.')
+    print('Article output is identical for 1 and {} workers.'.format(
+        args.max_workers))
+
+
+if __name__ == '__main__':
+    main()
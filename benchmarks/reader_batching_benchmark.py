@@ -0,0 +1,107 @@
+import argparse
+import threading
+from time import monotonic
+
+from questionAnswering.batching import BatchingFinder
+from questionAnswering.SrdResponder import SrdResponder, SrdResponderConfig
+
+# Put the question answering stack under concurrent load, with and without
+# micro-batching in front of the reader, and show the trade-off between
+# throughput and the latency of each question. Needs Elasticsearch running
+# with the SRD articles indexed, like the flask app.
+
+questions = ['How tall is a halfling?',
+             'How much damage does a fireball do?',
+             'What is the speed of a dwarf?',
+             'How long does a long rest take?',
+             'What does the bless spell do?',
+             'How many hit points does a goblin have?',
+             'What is the armor class of plate armor?',
+             'Can a rogue use sneak attack with a longbow?']
+
+
+def run_load(finder, clients, questions_per_client):
+    '''Have each client ask questions one after another, all clients at once.
+    Return the latency of every question, and the total duration.
+
+    finder: Finder or BatchingFinder
+    clients: int
+    questions_per_client: int
+    return: List[float], float
+    '''
+    latencies = []
+    lock = threading.Lock()
+
+    def client(client_index):
+        for i in range(questions_per_client):
+            question = questions[(client_index + i) % len(questions)]
+            start_time = monotonic()
+            finder.get_answers(question=question, top_k_retriever=10,
+                               top_k_reader=5)
+            with lock:
+                latencies.append(monotonic() - start_time)
+
+    threads = [threading.Thread(target=client, args=(i,))
+               for i in range(clients)]
+    start_time = monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, monotonic() - start_time
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--questions-per-client', type=int, default=8)
+    parser.add_argument('--max-batch-sizes', type=int, nargs='+',
+                        default=[4, 8])
+    parser.add_argument('--max-waits', type=float, nargs='+',
+                        default=[0.005, 0.02])
+    args = parser.parse_args()
+
+    # The answer cache would hide the repeated questions from the reader.
+    responder = SrdResponder(SrdResponderConfig(retriever='Elasticsearch',
+                                                answer_cache_size=0))
+    unbatched_finder = responder.finder
+    retriever, reader = unbatched_finder.retriever, unbatched_finder.reader
+
+    settings = [('unbatched', unbatched_finder)]
+    for max_batch_size in args.max_batch_sizes:
+        for max_wait in args.max_waits:
+            settings.append(('batch {} wait {}ms'.format(
+                max_batch_size, int(max_wait * 1000)), BatchingFinder(
+                    retriever, reader, max_wait=max_wait,
+                    max_batch_size=max_batch_size)))
+
+    # Warm up the model.
+    run_load(unbatched_finder, 1, 1)
+
+    print('{:>20} {:>8} | {:>14} {:>10} {:>10} {:>10}'.format(
+        'setting', 'clients', 'questions/sec', 'p50 ms', 'p95 ms',
+        'mean batch'))
+    for clients in args.clients:
+        for name, finder in settings:
+            if isinstance(finder, BatchingFinder):
+                finder.batch_count = finder.question_count = 0
+            latencies, duration = run_load(finder, clients,
+                                           args.questions_per_client)
+            mean_batch = (finder.question_count / finder.batch_count
+                          if isinstance(finder, BatchingFinder) else 1)
+            print('{:>20} {:>8} | {:>14.2f} {:>10.0f} {:>10.0f} {:>10.1f}'
+                  .format(name, clients, len(latencies) / duration,
+                          1000 * percentile(latencies, 0.5),
+                          1000 * percentile(latencies, 0.95), mean_batch))
+
+    for _, finder in settings[1:]:
+        finder.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+from time import perf_counter
+
+# Compare the reader in each inference mode on the benchmark questions: the
+# latency of each question, the process's peak memory, and the exact match
+# and F1 of the top answer. Each mode runs in its own process, so the peak
+# memory is only that mode's. Uses the in-process BM25 retriever, so it
+# doesn't need Elasticsearch.
+
+repository_directory = os.path.join(os.path.dirname(__file__), '..')
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def run_mode(inference_mode, use_gpu, question_count):
+    '''Load the reader in one inference mode, answer the benchmark questions,
+    and return the results.
+
+    inference_mode: str
+    use_gpu: bool
+    question_count: Optional[int] Only use the first this many questions.
+    return: Dict
+    '''
+    from evaluation.config import benchmark_filename, data_filepath
+    from evaluation.create_eval_file import get_questions_from_squad
+    from evaluation.squad_eval import compute_exact, compute_f1
+    from haystack import Finder
+    from questionAnswering.bm25 import BM25Index, BM25Retriever
+    from questionAnswering.config import (generated_srd_filepath,
+                                          model_name_or_path)
+    from questionAnswering.SrdResponder import SrdResponderConfig, load_reader
+    from questionAnswering.utils import create_absolute_path
+
+    questions = get_questions_from_squad(
+        os.path.join(repository_directory, data_filepath, benchmark_filename),
+        with_answers=True)[:question_count]
+
+    src_directory = os.path.join(repository_directory, 'src',
+                                 'questionAnswering')
+    model_path, is_local = model_name_or_path
+    if is_local:
+        model_path = create_absolute_path(src_directory, model_path)
+    start_time = perf_counter()
+    reader = load_reader(
+        model_path,
+        create_absolute_path(src_directory,
+                             SrdResponderConfig.model_cache_directory),
+        use_gpu, inference_mode)
+    load_seconds = perf_counter() - start_time
+
+    finder = Finder(reader, BM25Retriever(BM25Index.build_from_file(
+        os.path.join(repository_directory, generated_srd_filepath))))
+    # Warm up the model.
+    finder.get_answers(question=questions[0][0], top_k_retriever=10,
+                       top_k_reader=5)
+
+    latencies = []
+    exact_match = f1 = 0.0
+    for question, _, gold_answers in questions:
+        start_time = perf_counter()
+        prediction = finder.get_answers(question=question, top_k_retriever=10,
+                                        top_k_reader=5)
+        latencies.append(perf_counter() - start_time)
+
+        answers = prediction['answers']
+        predicted = (answers[0]['answer'] or '') if answers else ''
+        exact_match += max(compute_exact(gold, predicted)
+                           for gold in gold_answers)
+        f1 += max(compute_f1(gold, predicted) for gold in gold_answers)
+
+    return {'load_seconds': load_seconds,
+            'p50_seconds': percentile(latencies, 0.5),
+            'p95_seconds': percentile(latencies, 0.95),
+            # Kilobytes on Linux.
+            'peak_memory_mb': resource.getrusage(
+                resource.RUSAGE_SELF).ru_maxrss / 1024,
+            'exact_match': exact_match / len(questions),
+            'f1': f1 / len(questions)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--modes', nargs='+',
+                        default=['default', 'quantized'])
+    parser.add_argument('--use-gpu', action='store_true',
+                        help="Run the 'default' mode on a GPU.")
+    parser.add_argument('--questions', type=int,
+                        help='Only use the first this many questions.')
+    parser.add_argument('--run-mode',
+                        help='Run one mode in this process, and print json.')
+    args = parser.parse_args()
+
+    if args.run_mode:
+        print(json.dumps(run_mode(args.run_mode, args.use_gpu,
+                                  args.questions)))
+        return
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [os.path.join(repository_directory, 'src'),
+         env.get('PYTHONPATH', '')])
+
+    print('{:>10} {:>8} {:>10} {:>10} {:>12} {:>8} {:>8}'.format(
+        'mode', 'load s', 'p50 ms', 'p95 ms', 'peak MB', 'EM', 'F1'))
+    for mode in args.modes:
+        command = [sys.executable, __file__, '--run-mode', mode]
+        if args.use_gpu:
+            command.append('--use-gpu')
+        if args.questions:
+            command += ['--questions', str(args.questions)]
+        output = subprocess.run(command, env=env, stdout=subprocess.PIPE,
+                                check=True, universal_newlines=True).stdout
+        results = json.loads(output.strip().splitlines()[-1])
+        print('{:>10} {:>8.1f} {:>10.0f} {:>10.0f} {:>12.0f} {:>8.1%} {:>8.1%}'
+              .format(mode, results['load_seconds'],
+                      1000 * results['p50_seconds'],
+                      1000 * results['p95_seconds'],
+                      results['peak_memory_mb'], results['exact_match'],
+                      results['f1']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+from questionAnswering.SrdResponder import SrdResponderConfig
+from questionAnswering.utils import create_absolute_path
+
+# Time how long the flask app takes to start answering /ready, and to become
+# ready to answer questions. A cold start has no saved reader model, so the
+# model is converted from the downloaded one and saved. A warm start loads the
+# saved model. Each start runs in a new process, and needs Elasticsearch
+# running like the flask app does.
+
+repository_directory = os.path.join(os.path.dirname(__file__), '..')
+
+# Run in the new process. Prints the timings as json.
+startup_script = '''
+import json
+from time import monotonic, sleep
+start_time = monotonic()
+
+import main
+
+client = main.app.test_client()
+client.get('/ready')
+first_response_seconds = monotonic() - start_time
+
+status = client.get('/ready').get_json()
+while not status['ready'] and status['stage'] != 'failed':
+    sleep(0.05)
+    status = client.get('/ready').get_json()
+
+print(json.dumps({'first_response_seconds': first_response_seconds,
+                  'ready_seconds': monotonic() - start_time,
+                  'error': status.get('error')}))
+'''
+
+
+def time_startup():
+    '''Start the flask app in a new process, and return its timings.
+
+    return: Dict
+    '''
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [os.path.join(repository_directory, 'src'),
+         env.get('PYTHONPATH', '')])
+    output = subprocess.run(
+        [sys.executable, '-c', startup_script],
+        cwd=os.path.join(repository_directory, 'flaskapp'), env=env,
+        stdout=subprocess.PIPE, check=True, universal_newlines=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--warm-runs', type=int, default=3)
+    parser.add_argument('--skip-cold', action='store_true',
+                        help='Keep the saved reader model.')
+    args = parser.parse_args()
+
+    model_cache_directory = SrdResponderConfig(
+        retriever='Elasticsearch').model_cache_directory
+    runs = [('warm', False)] * args.warm_runs
+    if not args.skip_cold:
+        runs.insert(0, ('cold', True))
+
+    print('{:>6} {:>22} {:>14}'.format('start', 'first response (s)',
+                                       'ready (s)'))
+    for name, clear_model_cache in runs:
+        if clear_model_cache:
+            shutil.rmtree(create_absolute_path(
+                os.path.join(repository_directory, 'src', 'questionAnswering'),
+                model_cache_directory), ignore_errors=True)
+        timings = time_startup()
+        if timings['error']:
+            raise ValueError('Startup failed: {}'.format(timings['error']))
+        print('{:>6} {:>22.2f} {:>14.2f}'.format(
+            name, timings['first_response_seconds'], timings['ready_seconds']))
+
+
+if __name__ == '__main__':
+    main()
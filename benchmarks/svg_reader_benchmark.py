@@ -0,0 +1,105 @@
+import argparse
+import os
+import tracemalloc
+import xml.etree.ElementTree as ET
+from time import time
+
+from svgParsing.config import svg_directory
+from svgParsing.formatted_text import (FormattedText, parse_svg_tag,
+                                       svg_to_text, traverse_element_tree,
+                                       xml_namespace)
+from svgParsing.parse_rules import srd_page_numbers
+
+# Compare time and peak memory per page for the streaming reader in
+# svg_to_text against the previous reader, which builds the full ElementTree
+# for the page and buffers every FormattedText before merging.
+
+
+def svg_to_text_from_tree(filename):
+    '''The ElementTree based reader that svg_to_text replaced.
+
+    filename: str
+    return: List[FormattedText]
+    '''
+    tree = ET.parse(os.path.join(svg_directory, filename))
+    root = tree.getroot()
+    top_g = root.find(xml_namespace['svg'] + 'g')
+
+    text_list = []
+    for element in traverse_element_tree(top_g):
+        if parse_svg_tag(element) == 'text':
+            text_object = FormattedText.from_text_element(element)
+            if text_object:
+                text_list.append(text_object)
+
+    merged_text_list = []
+    merge_text = text_list[0]
+    for text in text_list[1:]:
+        if merge_text.should_merge(text):
+            merge_text = merge_text.merge(text)
+        else:
+            merged_text_list.append(merge_text)
+            merge_text = text
+    merged_text_list.append(merge_text)
+
+    if ('Permission granted' in merged_text_list[0].text and
+            'System Reference Document' in merged_text_list[2].text):
+        merged_text_list = merged_text_list[3:]
+
+    return merged_text_list
+
+
+def measure_reader(reader, filenames):
+    '''Run a reader over each file, and return the total time, the largest
+    peak memory seen for a single page, and the text that was read.
+
+    reader: Callable[[str], List[FormattedText]]
+    filenames: List[str]
+    return: float, int, List[Tuple]
+    '''
+    duration = 0
+    max_peak = 0
+    content = []
+    for filename in filenames:
+        start_time = time()
+        page = reader(filename)
+        duration += time() - start_time
+
+        tracemalloc.start()
+        reader(filename)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        max_peak = max(max_peak, peak)
+
+        content.append([(text.text, text.color, text.size, text.bold,
+                         text.italic) for text in page])
+    return duration, max_peak, content
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=len(srd_page_numbers),
+                        help='Number of pages to read, starting at page 1.')
+    args = parser.parse_args()
+
+    filenames = ['{}.svg'.format(page_number)
+                 for page_number in srd_page_numbers[:args.pages]]
+
+    tree_duration, tree_peak, tree_content = measure_reader(
+        svg_to_text_from_tree, filenames)
+    stream_duration, stream_peak, stream_content = measure_reader(
+        svg_to_text, filenames)
+
+    if tree_content != stream_content:
+        raise ValueError('The streaming reader gave different text.')
+
+    print('{:>10} {:>10} {:>16}'.format('reader', 'seconds',
+                                        'max peak (KiB)'))
+    print('{:>10} {:>10.2f} {:>16.1f}'.format('tree', tree_duration,
+                                              tree_peak / 1024))
+    print('{:>10} {:>10.2f} {:>16.1f}'.format('streaming', stream_duration,
+                                              stream_peak / 1024))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+import argparse
+import os
+
+from questionAnswering.config import generated_srd_filepath
+from questionAnswering.dense_index import (DenseIndex, embedding_dtypes,
+                                           load_encoder)
+from questionAnswering.SrdResponder import SrdResponderConfig
+from questionAnswering.utils import create_absolute_path
+
+# Embed every article, or every passage if chunking, with the DPR passage
+# encoder, and save the embeddings
+# where the DensePassage retriever looks for them. Run this after generating
+# the articles, ideally on a machine with a GPU, so the server only has to map
+# the saved embeddings when it starts.
+
+parser = argparse.ArgumentParser(
+    description='Build the dense passage index used by the DensePassage '
+                'retriever.')
+parser.add_argument('--dtype', choices=embedding_dtypes,
+                    default=SrdResponderConfig.dense_index_dtype,
+                    help='Precision to store the embeddings in.')
+parser.add_argument('--cpu', action='store_true',
+                    help="Don't use a GPU, even if there is one.")
+parser.add_argument('--batch-size', type=int, default=16,
+                    help='Number of passages to embed at once.')
+parser.add_argument('--chunk-size', type=int,
+                    default=SrdResponderConfig.chunk_size,
+                    help=('Split articles into passages of up to this many '
+                          'characters. By default each article is one '
+                          'passage.'))
+parser.add_argument('--chunk-overlap', type=int,
+                    default=SrdResponderConfig.chunk_overlap,
+                    help='Paragraphs repeated between consecutive passages.')
+args = parser.parse_args()
+
+script_dir = os.path.dirname(__file__)
+articles_filepath = create_absolute_path(script_dir, generated_srd_filepath)
+index_directory = create_absolute_path(
+    script_dir, SrdResponderConfig.dense_index_directory)
+
+encoder = load_encoder(use_gpu=not args.cpu, batch_size=args.batch_size)
+dense_index = DenseIndex.load_or_build(index_directory, articles_filepath,
+                                       encoder, args.dtype, args.chunk_size,
+                                       args.chunk_overlap)
+print("Dense index of {} passages is in '{}'.".format(
+    len(dense_index), DenseIndex.directory_for(
+        index_directory, articles_filepath, args.dtype, args.chunk_size,
+        args.chunk_overlap)))
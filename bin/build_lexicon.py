@@ -0,0 +1,17 @@
+from nltk import download as nltk_download
+from nltk.corpus import words as nltk_words
+
+from svgParsing.lexicon import Lexicon, default_lexicon_filepath
+
+# Build the word list used by svgParsing.formatted_text.is_english_word from the
+# nltk English word corpus. Run this on a machine with network access, or with
+# the corpus already in NLTK_DATA, and commit the output, so parsing doesn't
+# need nltk.
+
+try:
+    words = nltk_words.words()
+except LookupError:
+    nltk_download('words')
+    words = nltk_words.words()
+Lexicon.write(words, default_lexicon_filepath)
+print("Word list written to '{}'.".format(default_lexicon_filepath))
@@ -1,7 +1,41 @@
-import json
+import argparse
 import os
+import time
 
-from svgParsing.parse_rules import generate_srd_articles
+from svgParsing.article_sinks import (ElasticsearchArticleSink,
+                                      JsonArticleSink, JsonLinesArticleSink,
+                                      write_articles)
+from svgParsing.page_cache import PageCache
+from svgParsing.parse_rules import iter_srd_articles
+
+parser = argparse.ArgumentParser(
+    description=('Parse the SRD svg pages into a json file of articles. Parsed '
+                 'pages are cached, so only pages whose svg file changed are '
+                 'parsed again.'))
+parser.add_argument('--workers', type=int, default=1,
+                    help=('Number of processes used to parse the pages. Use '
+                          '0 for one process per CPU.'))
+parser.add_argument('--force', action='store_true',
+                    help='Clear the page cache and parse every page again.')
+parser.add_argument('--format', choices=['json', 'jsonl'], default='json',
+                    help=('json writes srd_articles.json, a single object '
+                          'mapping titles to text. jsonl writes '
+                          'srd_articles.jsonl, one article per line, as soon '
+                          'as each article is parsed.'))
+parser.add_argument('--index', action='store_true',
+                    help=('Also index the articles into a new Elasticsearch '
+                          'index as they are parsed, and switch the alias the '
+                          'server searches to it once they are all in. The '
+                          'server imports the articles file into an index of '
+                          'its own when it next starts, or reindexes.'))
+parser.add_argument('--chunk-size', type=int,
+                    help=('With --index, split articles into passages of up '
+                          "to this many characters, as the server's config "
+                          'does. By default each article is one passage.'))
+parser.add_argument('--chunk-overlap', type=int, default=1,
+                    help=('With --index, paragraphs repeated between '
+                          'consecutive passages.'))
+args = parser.parse_args()
 
 #TODO move absolute path to a config file
 data_dir = '/home/lauren/dndtep/srdAnswer/data'
@@ -9,13 +43,41 @@ data_dir = '/home/lauren/dndtep/srdAnswer/data'
 if not os.path.exists(os.path.join(data_dir, 'generated')):
     os.makedirs(os.path.join(data_dir, 'generated'))
 
-article_filename = os.path.join(data_dir, 'generated', 'srd_articles.json')
+article_filename = os.path.join(data_dir, 'generated',
+                                'srd_articles.' + args.format)
 
-if not os.path.exists(article_filename):
-    articles = generate_srd_articles()
-    with open(article_filename, 'w') as f:
-        json.dump(articles, f)
-    print('Created article file!')
+page_cache = PageCache(os.path.join(data_dir, 'cache', 'svg_pages'))
+if args.force:
+    page_cache.clear()
 
+if args.format == 'json':
+    sinks = [JsonArticleSink(article_filename)]
 else:
-    print('Article data file already exists.')
+    sinks = [JsonLinesArticleSink(article_filename)]
+
+if args.index:
+    # Only needed for indexing, so haystack isn't required otherwise.
+    from questionAnswering.elasticsearch_indexing import (
+        articles_alias, versioned_index_name)
+    from questionAnswering.SrdResponder import (SrdResponderConfig,
+                                                connect_to_elasticsearch,
+                                                open_document_store)
+
+    # Split into passages the way a server with this chunking splits them.
+    config = SrdResponderConfig(retriever='Elasticsearch',
+                                chunk_size=args.chunk_size,
+                                chunk_overlap=args.chunk_overlap)
+    client = connect_to_elasticsearch(config)
+    alias = articles_alias(config.chunk_size, config.chunk_overlap)
+    sinks.append(ElasticsearchArticleSink(
+        client, alias,
+        versioned_index_name(alias, time.strftime('generated%Y%m%d%H%M%S')),
+        lambda index: open_document_store(config, client, index),
+        config.chunk_size, config.chunk_overlap,
+        config.elasticsearch_bulk_chunk_size,
+        config.elasticsearch_bulk_threads,
+        config.elasticsearch_bulk_max_retries))
+
+articles = iter_srd_articles(workers=args.workers or None, cache=page_cache)
+article_count = write_articles(articles, sinks)
+print('Created article file with {} articles!'.format(article_count))
@@ -0,0 +1,247 @@
+import asyncio
+import io
+import json
+import sys
+import threading
+
+import main
+from questionAnswering.inference_pool import InferencePool, PoolFull
+
+# Serve the flask app over ASGI, with the questions answered by a bounded pool
+# of inference threads. To start the server:
+#     pip install uvicorn
+#     uvicorn asgi:app
+# Optionally, uvicorn asgi:app --host 0.0.0.0 to access this on other devices
+# on the network.
+#
+# The routes are the flask app's, and behave the same. Requests that answer
+# questions wait on the event loop for an inference thread, instead of each
+# holding a thread of their own, and are refused with 503 when every
+# inference thread is busy and the queue is full. Other requests, like
+# /ready, are answered straight away, so health checks work under load. The
+# pool's state is at /inference-pool-stats.
+# Streamed answers are sent a line at a time, as the flask app yields them.
+
+# Inference threads, questions waiting for a thread, and seconds a request
+# waits for its answer, or the start of a streamed answer, before getting
+# 504. The threads are in this process, and share its one responder and
+# models, so more threads don't add model capacity. They let that many
+# questions be answered at once, and questions they read at the same time are
+# batched together if the responder batches reader inference. For more
+# copies of the models, run more processes, like gunicorn_prefork.py does.
+inference_threads = 4
+inference_queue_depth = 32
+request_timeout = 30
+
+# Requests that run the models, as (method, path).
+inference_routes = {('POST', '/form-question'),
+                    ('POST', '/json-question'),
+                    ('POST', '/json-all-answers'),
+                    ('POST', '/json-answers-in-context'),
+                    ('POST', '/answer-with-metadata'),
+                    ('POST', '/batch')}
+
+inference_pool = InferencePool(inference_threads, inference_queue_depth,
+                               request_timeout)
+
+
+def wsgi_environ(scope, body):
+    '''Return the WSGI environ for an ASGI request, so the flask app sees
+    the URL the client asked for, including the scheme, host and any prefix
+    the app is mounted under.
+
+    scope: Dict The ASGI connection scope.
+    body: bytes
+    return: Dict
+    '''
+    root_path = scope.get('root_path', '')
+    path = scope['path']
+    # Servers may include the prefix in the path, as newer ASGI versions say.
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        # WSGI paths are bytes decoded as latin-1.
+        'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/{}'.format(scope.get('http_version',
+                                                     '1.1')),
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_LENGTH':
+            # Set from the body.
+            continue
+        key = name if name == 'CONTENT_TYPE' else 'HTTP_' + name
+        environ[key] = (environ[key] + ',' + value if key in environ
+                        else value)
+    return environ
+
+
+def run_flask(scope, body, put, stopped):
+    '''Answer a request with the flask app, and pass the response to put
+    as ASGI messages while it is made. Each chunk of a streamed response is
+    put as soon as the app yields it. None is put last, even if this raises.
+
+    scope: Dict The ASGI connection scope.
+    body: bytes
+    put: Callable[[Optional[Dict]], None] Called from this thread with each
+        message.
+    stopped: threading.Event Set when the response is no longer wanted, to
+        stop making a streamed response.
+    '''
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        if exc_info is not None and response.get('started'):
+            raise exc_info[1].with_traceback(exc_info[2])
+        response['status'] = int(status.split()[0])
+        response['headers'] = headers
+        return write
+
+    def start():
+        # Once, before the first chunk of the body.
+        if not response.get('started'):
+            response['started'] = True
+            put({'type': 'http.response.start',
+                 'status': response['status'],
+                 'headers': [(name.encode('latin-1'), value.encode('latin-1'))
+                             for name, value in response['headers']]})
+
+    def write(chunk):
+        start()
+        if chunk:
+            put({'type': 'http.response.body', 'body': chunk,
+                 'more_body': True})
+
+    try:
+        app_iter = main.app(wsgi_environ(scope, body), start_response)
+        try:
+            for chunk in app_iter:
+                if stopped.is_set():
+                    break
+                write(chunk)
+            start()
+        finally:
+            # Closing a streamed response closes its generator.
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+    finally:
+        put(None)
+
+
+async def send_flask_response(send, messages, future, timeout=None):
+    '''Send the messages run_flask puts, as they arrive.
+
+    Raises asyncio.TimeoutError if the response doesn't start within
+    timeout seconds, and what run_flask raised if it failed before then.
+
+    send: The ASGI send function.
+    messages: asyncio.Queue Where run_flask's messages are put.
+    future: Awaitable run_flask's task.
+    timeout: Optional[float]
+    '''
+    message = await asyncio.wait_for(messages.get(), timeout)
+    if message is None:
+        # The response never started.
+        await future
+        raise RuntimeError('The app returned no response.')
+    while message is not None:
+        await send(message)
+        message = await messages.get()
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+async def send_response(send, status, headers, body):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(name.encode('latin-1'), value.encode('latin-1'))
+                            for name, value in headers]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def send_json(send, data, status=200, headers=()):
+    await send_response(send, status,
+                        [('Content-Type', 'application/json')] +
+                        list(headers),
+                        json.dumps(data).encode('utf-8'))
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            inference_pool.close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        raise ValueError("Unsupported scope type '{}'.".format(scope['type']))
+
+    if scope['path'] == '/inference-pool-stats':
+        await send_json(send, inference_pool.stats())
+        return
+
+    body = await read_body(receive)
+    loop = asyncio.get_running_loop()
+    messages = asyncio.Queue()
+    stopped = threading.Event()
+    args = (scope, body,
+            lambda message: loop.call_soon_threadsafe(messages.put_nowait,
+                                                      message),
+            stopped)
+    try:
+        if (scope['method'], scope['path']) not in inference_routes:
+            await send_flask_response(
+                send, messages, loop.run_in_executor(None, run_flask, *args))
+            return
+
+        try:
+            future = inference_pool.submit(run_flask, *args)
+        except PoolFull:
+            await send_json(send, {'error': 'The server is busy.'}, 503,
+                            [('Retry-After', '1')])
+            return
+        try:
+            # A streamed response keeps its worker until it is sent, but only
+            # has to start within the timeout.
+            await send_flask_response(send, messages,
+                                      asyncio.wrap_future(future),
+                                      inference_pool.timeout)
+        except asyncio.TimeoutError:
+            error = inference_pool.abandon(future, inference_pool.timeout)
+            await send_json(send, {'error': str(error)}, 504)
+    finally:
+        # Stops a streamed response whose client has gone.
+        stopped.set()
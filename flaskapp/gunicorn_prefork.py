@@ -0,0 +1,60 @@
+import gc
+import os
+
+# Serve the flask app from pre-forked worker processes, one for each core.
+# To start the server:
+#     pip install gunicorn
+#     gunicorn --config gunicorn_prefork.py main:app
+#
+# The app, and with it the models, is loaded once in the master process, which
+# then forks the workers. The workers share the master's copy of the weights
+# instead of each loading their own, so running more workers doesn't multiply
+# the memory the models take. Pages are only copied when a worker writes to
+# them, which inference doesn't do to the weights. With torch 2.1 or later,
+# mmap_model_weights=True also memory maps the weights from
+# model_cache_directory, so they are shared with other servers on the machine
+# too. haystack 0.5 needs an older torch, so main.py leaves it off.
+#
+# Each process's memory is at /worker-memory. The total pss is what the
+# workers use together. /metrics only reports the worker that answers it.
+#
+# /admin/reindex is turned off, since it would only switch the worker that
+# receives the request. Restart the server after regenerating the articles
+# instead.
+# Build the dense index with bin/build_dense_index.py before starting with the
+# DensePassage retriever: torch running in the master before the fork can
+# make the workers hang.
+
+bind = '127.0.0.1:5000'
+workers = os.cpu_count() or 1
+# Load the app in the master process, before forking.
+preload_app = True
+# Loading the models can take longer than gunicorn's default timeout.
+timeout = 120
+
+
+def when_ready(server):
+    import main
+
+    # The responder loads on a background thread, which doesn't exist in the
+    # workers, so it has to finish before they are forked.
+    if not main.responder_loader.wait():
+        server.log.error('Responder failed to load: %s',
+                         main.responder_loader.status().get('error'))
+    # Objects from loading are never collected, so the collector doesn't
+    # write to them in the workers, which would copy their pages.
+    gc.collect()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    import main
+    from questionAnswering.shared_weights import memory_usage
+
+    main.prefork_master_pid = os.getppid()
+    if main.responder_loader.ready:
+        # The workers split the cores, instead of each running the models on
+        # all of them.
+        main.responder_loader.get().after_fork(
+            torch_threads=max(1, (os.cpu_count() or 1) // workers))
+    server.log.info('Worker %s memory: %s', worker.pid, memory_usage())
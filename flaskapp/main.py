@@ -1,8 +1,30 @@
-from flask import Flask, Markup, render_template, request
+import hmac
+import json
+import os
+from time import monotonic
 
-from questionAnswering.SrdResponder import SrdResponder, SrdResponderConfig
+from flask import Flask, Response, g, render_template, request
+from markupsafe import Markup
 
-app = Flask(__name__)
+from questionAnswering.metrics import (errors, registry, request_seconds,
+                                       stage_seconds)
+from questionAnswering.reindexing import BackgroundJob
+from questionAnswering.responder_loader import (ResponderLoader,
+                                                ResponderNotReady)
+from questionAnswering.shared_weights import child_pids, memory_report
+
+
+
+class MeteredFlask(Flask):
+    '''Records the time taken to turn each view's return value into a
+    response, which for the json routes is serializing it.'''
+
+    def make_response(self, rv):
+        with stage_seconds.time(stage='serialization'):
+            return super().make_response(rv)
+
+
+app = MeteredFlask(__name__)
 
 # To start the server:
 #     export FLASK_APP=main.py
@@ -18,25 +40,144 @@ curl --location --request POST 'http://127.0.0.1:5000/json-question' \
 --data-raw '{"question": "How tall is a halfling?"}'
 
 or, curl --location --request POST 'http://127.0.0.1:5000/json-all-answers
+
+Add "stream": true to the json sent to json-answers-in-context to get the
+answers as they are found, as JSON Lines. Each line has the best answers so
+far, and the last has "done": true.
+curl --no-buffer 'http://127.0.0.1:5000/json-answers-in-context' \
+--header 'Content-Type: application/json' \
+--data-raw '{"question": "How tall is a halfling?", "stream": true}'
+
+Add "adaptive": true or false to the json to turn adaptive reading on or off
+for that question, instead of using the config's setting. Add "cache": false
+to answer it with the models even if the answer cache has it, like when
+timing them.
+
+Send several questions at once to batch, each with its own mode, one of
+top_answer, top_5_answer (the default), all_answers or with_metadata:
+curl --location --request POST 'http://127.0.0.1:5000/batch' \
+--header 'Content-Type: application/json' \
+--data-raw '{"questions": [{"question": "How tall is a halfling?",
+                            "mode": "top_answer"},
+                           "What does the bless spell do?"]}'
+The results are in the same order, each with an "answer" or an "error".
+
+The server starts straight away, and loads the models in the background.
+Until they are loaded, /ready and the question routes return 503.
+    curl http://127.0.0.1:5000/ready
+
+After regenerating the articles, rebuild the index and switch to it without
+restarting. This is off unless the server is started with
+CROWS_ADMIN_REINDEX=1 and a secret in CROWS_ADMIN_TOKEN, which each request
+must send in the X-Crows-Admin-Token header. It stays off when served with
+gunicorn_prefork.py, since it would only switch the worker that gets the
+request. Restart that server instead.
+    curl --request POST http://127.0.0.1:5000/admin/reindex \
+    --header "X-Crows-Admin-Token: $CROWS_ADMIN_TOKEN"
+    curl http://127.0.0.1:5000/admin/reindex/status \
+    --header "X-Crows-Admin-Token: $CROWS_ADMIN_TOKEN"
+
+The memory used by this process, or by every process when served with
+gunicorn_prefork.py, is at /worker-memory.
+
+Timings of each stage of answering, cache hits, queue waits and errors are at
+/metrics, in the Prometheus text format. They are turned off, and /metrics
+returns 404, with metrics_enabled=False in the config.
+    curl http://127.0.0.1:5000/metrics
 '''
 
-#config = SrdResponderConfig(retriever='DensePassage')
-config = SrdResponderConfig(retriever='Elasticsearch')
-srdResponder = SrdResponder(config)
+
+def load_responder(report_stage):
+    # Imported here, so that a missing or broken dependency is reported by
+    # /ready instead of stopping the server from starting.
+    from questionAnswering.SrdResponder import SrdResponder, SrdResponderConfig
+
+    #config = SrdResponderConfig(retriever='DensePassage')
+    #config = SrdResponderConfig(retriever='BM25')
+    # Flask answers requests on separate threads, so questions asked at the
+    # same time are answered by the reader in one batch.
+    # Pre-forked workers share the weights loaded before the fork. Memory
+    # mapping them, with mmap_model_weights=True, would share them with other
+    # servers too, but needs torch 2.1, which haystack 0.5 doesn't run on.
+    config = SrdResponderConfig(retriever='Elasticsearch',
+                                reader_batch_max_size=8)
+    return SrdResponder(config, report_stage)
+
+
+responder_loader = ResponderLoader(load_responder).start()
+
+reindex_job = BackgroundJob(
+    lambda report_stage: responder_loader.get().reindex(report_stage))
+
+# /admin/reindex is off unless turned on when starting the server, and then
+# needs the admin token in each request's header. The address a request
+# comes from isn't checked, since behind a reverse proxy every request comes
+# from this machine.
+admin_reindex_enabled = os.environ.get('CROWS_ADMIN_REINDEX') == '1'
+admin_token = os.environ.get('CROWS_ADMIN_TOKEN') or None
+admin_token_header = 'X-Crows-Admin-Token'
+
+# The process the workers were forked from, set in each worker by
+# gunicorn_prefork.py. None when this process isn't a pre-forked worker.
+prefork_master_pid = None
+
+
+@app.before_request
+def start_request_timer():
+    if registry.enabled:
+        g.request_start_time = monotonic()
+
+
+@app.after_request
+def record_request(response):
+    start_time = g.pop('request_start_time', None)
+    if start_time is not None:
+        # Streamed responses are timed until they start.
+        request_seconds.observe(monotonic() - start_time,
+                                route=request.url_rule.rule
+                                if request.url_rule else 'unknown',
+                                status=response.status_code)
+        # 503 is the responder still loading, not an error.
+        if response.status_code >= 500 and response.status_code != 503:
+            errors.inc(where='request')
+    return response
 
 
-def answer_question(question_text, answer_type='top_5_answer'):
+@app.errorhandler(ResponderNotReady)
+def responder_not_ready(error):
+    return error.status, 503, {'Retry-After': '5'}
+
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    status = responder_loader.status()
+    return status, 200 if status['ready'] else 503
+
+
+def answer_question(question_text, answer_type='top_5_answer',
+                    adaptive=None, use_cache=True):
+    srdResponder = responder_loader.get()
     if answer_type == 'all_answers':
-        return srdResponder.answers_with_metadata(question_text)
+        return srdResponder.answers_with_metadata(question_text,
+                                                  adaptive=adaptive,
+                                                  use_cache=use_cache)
     elif answer_type == 'top_answer':
-        return srdResponder.top_answer_in_context(question_text)
+        return srdResponder.top_answer_in_context(question_text,
+                                                  adaptive=adaptive,
+                                                  use_cache=use_cache)
     elif answer_type == 'top_5_answer':
-        return srdResponder.top_answer_in_context(question_text, top_5=True)
+        return srdResponder.top_answer_in_context(question_text, top_5=True,
+                                                  adaptive=adaptive,
+                                                  use_cache=use_cache)
     else:
         raise ValueError("Unrecognized answer_type '{}'.".format(answer_type))
 
-def answer_question_with_metadata(question_text):
-    return srdResponder.full_prediction_output(question_text)
+def answer_question_with_metadata(question_text, adaptive=None,
+                                  use_cache=True):
+    srdResponder = responder_loader.get()
+    return srdResponder.full_prediction_output(question_text,
+                                               adaptive=adaptive,
+                                               use_cache=use_cache)
 
 
 quick_template = '''Question: {}</br>
@@ -58,7 +199,9 @@ def json_route_helper(request, answer_mode: str):
     request_data = request.get_json()
 
     question = request_data['question']
-    answer = answer_question(question, answer_type = answer_mode)
+    answer = answer_question(question, answer_type = answer_mode,
+                             adaptive=request_data.get('adaptive'),
+                             use_cache=request_data.get('cache', True))
     return answer
 
 
@@ -78,11 +221,29 @@ def json_all_answers():
     return answer
 
 
+def json_lines(updates):
+    try:
+        for update in updates:
+            yield json.dumps(update) + '\n'
+    except Exception as e:
+        # The response has already started, so the error is the last line.
+        errors.inc(where='stream')
+        error = '{}: {}'.format(type(e).__name__, e)
+        yield json.dumps({'error': error}) + '\n'
+
+
 @app.route('/json-answers-in-context', methods=['POST'])
 def json_answers_in_context():
     request_data = request.get_json()
-    question = request_data['question']
-    answer = answer_question(question, answer_type = 'top_5_answer')
+    if request_data.get('stream'):
+        # Raises ResponderNotReady before the response starts.
+        srdResponder = responder_loader.get()
+        updates = srdResponder.stream_answers_in_context(
+            request_data['question'])
+        # Proxies like nginx would otherwise hold the lines back.
+        return Response(json_lines(updates), mimetype='application/x-ndjson',
+                        headers={'X-Accel-Buffering': 'no'})
+    answer = json_route_helper(request, 'top_5_answer')
     return answer
 
 
@@ -91,6 +252,92 @@ def answer_with_metadata():
     request_data = request.get_json()
 
     question = request_data['question']
-    answer = answer_question_with_metadata(question)
+    answer = answer_question_with_metadata(
+        question, adaptive=request_data.get('adaptive'),
+        use_cache=request_data.get('cache', True))
 
     return answer.as_dict()
+
+
+@app.route('/batch', methods=['POST'])
+def batch():
+    request_data = request.get_json()
+    items = (request_data.get('questions')
+             if isinstance(request_data, dict) else None)
+    if not isinstance(items, list):
+        return {'error': "Expected a list of 'questions'."}, 400
+
+    srdResponder = responder_loader.get()
+    max_questions = srdResponder.config.batch_max_questions
+    if len(items) > max_questions:
+        return {'error': 'A batch can have at most {} questions, not {}.'
+                .format(max_questions, len(items))}, 413
+
+    # A question on its own is asked with the default mode.
+    items = [{'question': item} if isinstance(item, str) else item
+             for item in items]
+    return {'results': srdResponder.answer_batch(items)}
+
+
+@app.route('/answer-cache-stats', methods=['GET'])
+def answer_cache_stats():
+    return responder_loader.get().answer_cache.stats()
+
+
+def admin_refusal():
+    '''Return the response refusing an admin request, or None if it may go
+    ahead.
+
+    return: Optional[Tuple[Dict, int]]
+    '''
+    if not admin_reindex_enabled:
+        return {'error': 'Reindexing is turned off. Start the server with '
+                         'CROWS_ADMIN_REINDEX=1 to turn it on.'}, 404
+    sent_token = request.headers.get(admin_token_header, '')
+    # Compared in constant time, so the token can't be guessed from how long
+    # a refusal takes.
+    if admin_token is None or not hmac.compare_digest(
+            sent_token.encode(), admin_token.encode()):
+        return {'error': 'Reindexing needs the admin token in the {} header.'
+                .format(admin_token_header)}, 403
+    if prefork_master_pid is not None:
+        # Each worker has its own responder, and only this one would switch.
+        return {'error': 'Reindexing would only switch one pre-forked '
+                         'worker. Restart the server to switch every '
+                         'worker.'}, 409
+    return None
+
+
+@app.route('/admin/reindex', methods=['POST'])
+def admin_reindex():
+    refusal = admin_refusal()
+    if refusal is not None:
+        return refusal
+    # Raises ResponderNotReady while the responder is loading.
+    responder_loader.get()
+    started = reindex_job.start()
+    return reindex_job.status(), 202 if started else 409
+
+
+@app.route('/admin/reindex/status', methods=['GET'])
+def admin_reindex_status():
+    refusal = admin_refusal()
+    if refusal is not None:
+        return refusal
+    return reindex_job.status()
+
+
+@app.route('/worker-memory', methods=['GET'])
+def worker_memory():
+    if prefork_master_pid is None:
+        return memory_report([os.getpid()])
+    return memory_report([prefork_master_pid] +
+                         child_pids(prefork_master_pid))
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    if not registry.enabled:
+        return {'error': 'Metrics are turned off.'}, 404
+    return Response(registry.render(),
+                    mimetype='text/plain; version=0.0.4')
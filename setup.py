@@ -4,9 +4,15 @@ setup(name='srdAnswer',
       version='0.1',
       package_dir={'': 'src'},
       packages=find_packages(where='src'),
+      package_data={'svgParsing': ['rules/*.json', 'data/*.txt']},
       scripts=['bin/generate_articles.py'],
       install_requires=[
           'flask',
+          'numpy',
           'farm-haystack==0.5.0',
-      ]
+      ],
+      extras_require={
+          'asgi': ['uvicorn'],
+          'prefork': ['gunicorn'],
+      }
       )
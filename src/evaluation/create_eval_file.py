@@ -1,3 +1,4 @@
+import argparse
 import json
 import os
 import requests
@@ -7,6 +8,8 @@ from tqdm import tqdm
 from evaluation.config import benchmark_filename
 from evaluation.config import data_filepath
 from evaluation.create_benchmark import fix_filename
+from evaluation.squad_eval import compute_exact, compute_f1
+from questionAnswering.metrics import histogram_totals
 from questionAnswering.utils import create_absolute_path
 
 def get_questions_from_squad(benchmark_filepath, with_answers=False):
@@ -30,46 +33,224 @@ def get_questions_from_squad(benchmark_filepath, with_answers=False):
                     question_id_pairs.append((qas['question'], qas['id']))
     return question_id_pairs
 
+def answer_questions(question_id_pairs, api_endpoint, adaptive=None,
+                     use_cache=True):
+    '''Ask the flask app each question, and return its predictions by
+    question id, with the seconds each question took.
+
+    question_id_pairs: List[Tuple] As returned by get_questions_from_squad.
+    api_endpoint: str
+    adaptive: Optional[bool] Turn adaptive reading on or off for every
+        question. None uses the server's setting.
+    use_cache: bool Let the server answer from its answer cache. When False,
+        every question is read by the models, so the latencies time them.
+    return: Dict[str, Dict], List[float]
+    '''
+    predictions_dict = {}
+    latencies = []
+    for question_pair in tqdm(question_id_pairs):
+        data = {'question': question_pair[0]}
+        if adaptive is not None:
+            data['adaptive'] = adaptive
+        if not use_cache:
+            data['cache'] = False
+        start_time = time()
+        r = requests.post(url = api_endpoint, json = data)
+        latencies.append(time() - start_time)
+        ans = r.json()
+        predictions_dict[question_pair[1]] = ans
+    return predictions_dict, latencies
+
+
+def answer_questions_in_batches(question_id_pairs, batch_endpoint,
+                                batch_size, adaptive=None):
+    '''Ask the flask app the questions batch_size at a time, and return its
+    predictions by question id. Questions the app couldn't answer are left
+    out, and their errors printed.
+
+    question_id_pairs: List[Tuple] As returned by get_questions_from_squad.
+    batch_endpoint: str The app's /batch endpoint.
+    batch_size: int
+    adaptive: Optional[bool] See answer_questions.
+    return: Dict[str, Dict]
+    '''
+    predictions_dict = {}
+    for start in tqdm(range(0, len(question_id_pairs), batch_size)):
+        batch = question_id_pairs[start:start + batch_size]
+        items = [{'question': question_pair[0], 'mode': 'with_metadata'}
+                 for question_pair in batch]
+        if adaptive is not None:
+            for item in items:
+                item['adaptive'] = adaptive
+        r = requests.post(url = batch_endpoint, json = {'questions': items})
+        r.raise_for_status()
+        for question_pair, result in zip(batch, r.json()['results']):
+            if 'error' in result:
+                print("Couldn't answer '{}': {}".format(question_pair[0],
+                                                        result['error']))
+            else:
+                predictions_dict[question_pair[1]] = result['answer']
+    return predictions_dict
+
+
+def score_top_answers(predictions_dict, questions_with_answers):
+    '''Return the mean exact match and F1 of the top answer to each
+    question, against the best matching benchmark answer.
+
+    predictions_dict: Dict[str, Dict] As returned by answer_questions.
+    questions_with_answers: List[Tuple[str, str, List[str]]] As returned by
+        get_questions_from_squad with answers.
+    return: float, float
+    '''
+    exact_match = f1 = 0.0
+    for _, question_id, gold_answers in questions_with_answers:
+        answers = predictions_dict[question_id]['answers']
+        predicted = (answers[0]['answer'] or '') if answers else ''
+        exact_match += max(compute_exact(gold, predicted)
+                           for gold in gold_answers)
+        f1 += max(compute_f1(gold, predicted) for gold in gold_answers)
+    return (exact_match / len(questions_with_answers),
+            f1 / len(questions_with_answers))
+
+
+def write_predictions(abs_data_filepath, predictions_dict, filename):
+    predictions_filename = os.path.join(abs_data_filepath,
+                                        fix_filename(abs_data_filepath,
+                                                     filename))
+
+    with open(predictions_filename, 'w') as f:
+        json.dump(predictions_dict, f)
+
+    print("Benchmark answers written to: '{}'".format(predictions_filename))
+
+
+def compare_adaptive(abs_data_filepath, api_endpoint):
+    '''Answer the benchmark questions with every retrieved document read,
+    then with adaptive reading, and report how much faster adaptive reading
+    is, and how its exact match and F1 differ. Both sets of predictions are
+    written for squad_eval.py. The answer cache is bypassed, so every
+    question is read, and the latencies compare the readers.
+
+    abs_data_filepath: str
+    api_endpoint: str
+    '''
+    questions_with_answers = get_questions_from_squad(
+        os.path.join(abs_data_filepath, benchmark_filename),
+        with_answers=True)
+    question_id_pairs = [(question, question_id)
+                         for question, question_id, _ in
+                         questions_with_answers]
+
+    results = {}
+    for name, adaptive in [('full', False), ('adaptive', True)]:
+        predictions_dict, latencies = answer_questions(
+            question_id_pairs, api_endpoint, adaptive, use_cache=False)
+        write_predictions(abs_data_filepath, predictions_dict,
+                          'benchmark_predictions_{}.json'.format(name))
+        results[name] = (sum(latencies) / len(latencies),
+                         sorted(latencies)[len(latencies) // 2],
+                         *score_top_answers(predictions_dict,
+                                            questions_with_answers))
+
+    print('{:>10} {:>14} {:>10} {:>8} {:>8}'.format(
+        'reading', 'mean latency', 'p50', 'EM', 'F1'))
+    for name, (mean, median, exact_match, f1) in results.items():
+        print('{:>10} {:>13.3f}s {:>9.3f}s {:>8.1%} {:>8.1%}'.format(
+            name, mean, median, exact_match, f1))
+
+    full, adaptive = results['full'], results['adaptive']
+    print('Adaptive reading saves {:.1%} of the mean latency, and changes '
+          'exact match by {:+.1%} and F1 by {:+.1%}.'.format(
+              1 - adaptive[0] / full[0], adaptive[2] - full[2],
+              adaptive[3] - full[3]))
+
+
+def stage_timings(metrics_endpoint):
+    '''Return the count and total seconds of each stage of answering the
+    server has recorded, or None if its metrics are turned off.
+
+    metrics_endpoint: str
+    return: Optional[Dict[str, List[float]]] By stage, like 'stage="reader"'.
+    '''
+    r = requests.get(metrics_endpoint)
+    if r.status_code == 404:
+        return None
+    r.raise_for_status()
+    return histogram_totals(r.text, 'crows_stage_seconds')
+
+
+def print_stage_timings(before, after):
+    '''Print how many times each stage ran between two readings of
+    stage_timings, and how long it took.
+
+    before: Optional[Dict[str, List[float]]]
+    after: Optional[Dict[str, List[float]]]
+    '''
+    if before is None or after is None:
+        print('The server has metrics turned off, so there are no stage '
+              'timings.')
+        return
+    print('{:>24} {:>8} {:>12} {:>10}'.format('stage', 'count', 'total s',
+                                               'mean ms'))
+    for stage, (count, total) in sorted(after.items()):
+        count -= before.get(stage, [0, 0.0])[0]
+        total -= before.get(stage, [0, 0.0])[1]
+        if count:
+            print('{:>24} {:>8.0f} {:>12.2f} {:>10.1f}'.format(
+                stage, count, total, 1000 * total / count))
+
+
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batch-size', type=int, default=1,
+                        help=('Send this many questions in each request to '
+                              'the /batch endpoint. 1 sends each question '
+                              'by itself.'))
+    parser.add_argument('--compare-adaptive', action='store_true',
+                        help=('Answer the questions with and without '
+                              'adaptive reading, and compare their latency '
+                              'and accuracy.'))
+    args = parser.parse_args()
 
     abs_data_filepath = create_absolute_path(
         os.path.dirname(__file__), data_filepath)
 
-    question_id_pairs = get_questions_from_squad(
-        os.path.join(abs_data_filepath, benchmark_filename))
-
-
     # curl --location --request POST  \
     # --header 'Content-Type: application/json' \
     # --data-raw '{"question": "How tall is a halfling?"}'
 
-    predictions_dict = {}
-
     API_ENDPOINT = 'http://127.0.0.1:5000/answer-with-metadata'
     #API_ENDPOINT = 'http://127.0.0.1:5000/json-all-answers'
+    BATCH_ENDPOINT = 'http://127.0.0.1:5000/batch'
+    METRICS_ENDPOINT = 'http://127.0.0.1:5000/metrics'
 
+    if args.compare_adaptive:
+        compare_adaptive(abs_data_filepath, API_ENDPOINT)
+        return
+
+    question_id_pairs = get_questions_from_squad(
+        os.path.join(abs_data_filepath, benchmark_filename))
+
+    timings_before = stage_timings(METRICS_ENDPOINT)
     start_time = time()
 
-    for question_pair in tqdm(question_id_pairs):
-        data = {'question': question_pair[0]}
-        r = requests.post(url = API_ENDPOINT, json = data)
-        ans = r.json()
-        predictions_dict[question_pair[1]] = ans
+    if args.batch_size > 1:
+        predictions_dict = answer_questions_in_batches(
+            question_id_pairs, BATCH_ENDPOINT, args.batch_size)
+    else:
+        predictions_dict, _ = answer_questions(question_id_pairs,
+                                               API_ENDPOINT)
 
     duration = time() - start_time
 
     timing_msg = ('Answering benchmark questions took {:.2f} seconds, '
                   'or {:.2f} hours.')
     print(timing_msg.format(duration, duration/3600))
+    # Where the server spent that time.
+    print_stage_timings(timings_before, stage_timings(METRICS_ENDPOINT))
 
-    predictions_filename = os.path.join(abs_data_filepath,
-                                        fix_filename(abs_data_filepath,
-                                                     'benchmark_predictions.json'))
-
-    with open(predictions_filename, 'w') as f:
-        json.dump(predictions_dict, f)
-
-    print("Benchmark answers written to: '{}'".format(predictions_filename))
+    write_predictions(abs_data_filepath, predictions_dict,
+                      'benchmark_predictions.json')
 
 if __name__ == '__main__':
     main()
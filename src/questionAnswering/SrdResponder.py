@@ -1,156 +1,707 @@
 import json
 import os
+import shutil
+import threading
 
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from functools import partial
+from typing import Callable, Optional
 from haystack import Finder
 from haystack.document_store.elasticsearch import ElasticsearchDocumentStore
 from haystack.reader.farm import FARMReader
-from haystack.retriever.dense import DensePassageRetriever
 from haystack.retriever.sparse import ElasticsearchRetriever
 
+from evaluation.config import benchmark_filename, data_filepath
 from prediction.prediction_format import PredictionOutput
-from questionAnswering.config import generated_srd_filepath, model_name_or_path
-from questionAnswering.utils import create_absolute_path, make_substring_bold
+from questionAnswering.adaptive_reading import AdaptiveFinder, read_documents
+from questionAnswering.answer_cache import (AnswerCache, file_hash,
+                                            version_stamp)
+from questionAnswering.batch_answering import (answer_batch, answer_html,
+                                               answer_in_context, submit_now)
+from questionAnswering.batching import BatchingFinder
+from questionAnswering.bm25 import BM25Index, BM25Retriever
+from questionAnswering.chunking import (article_passages,
+                                        map_answers_to_articles)
+from questionAnswering.config import (generated_srd_filepath,
+                                      model_name_or_path,
+                                      reader_inference_mode)
+from questionAnswering.dense_index import (DenseIndex, DenseIndexRetriever,
+                                           embedding_dtypes, load_encoder,
+                                           passage_embedding_model,
+                                           query_embedding_model)
+from questionAnswering.elasticsearch_indexing import (aliased_indices,
+                                                      articles_alias,
+                                                      connect,
+                                                      index_passages,
+                                                      switch_alias,
+                                                      versioned_index_name)
+from questionAnswering.metrics import TimedReader, registry, stage_seconds
+from questionAnswering.quantization import (quantize_reader,
+                                            quantized_model_filepath,
+                                            reader_inference_modes)
+from questionAnswering.reindexing import (SwitchableRetriever,
+                                          read_warm_up_questions)
+from questionAnswering.shared_weights import (map_model_weights,
+                                              weights_filepath)
+from questionAnswering.streaming import stream_answers
+from questionAnswering.utils import create_absolute_path
 
 
 @dataclass
 class SrdResponderConfig:
 
-    # The retriever to use. Should be 'Elasticsearch' or 'DensePassage'.
+    # The retriever to use. Should be 'Elasticsearch', 'DensePassage' or
+    # 'BM25'. DensePassage and BM25 search indexes kept in this process, so
+    # they don't need Elasticsearch.
     retriever: str
 
+    # Run the models on a GPU, if there is one.
+    use_gpu: bool = True
+
+    # Most predictions to keep in the answer cache. 0 turns the cache off.
+    answer_cache_size: int = 1024
+
+    # Seconds a cached prediction is used for. None keeps predictions until
+    # they are evicted, or the model or articles change.
+    answer_cache_ttl: Optional[float] = 24 * 60 * 60
+
+    # An sqlite file to keep cached predictions in across restarts, relative
+    # to the root of the repository. None keeps them in memory only.
+    answer_cache_filepath: Optional[str] = None
+
+    # Most questions the reader answers together. Questions asked at the same
+    # time are grouped into one batch, which uses the CPU better at the cost of
+    # waiting up to reader_batch_max_wait seconds for the batch to fill. 1
+    # answers each question by itself.
+    reader_batch_max_size: int = 1
+    reader_batch_max_wait: float = 0.01
+
+    # A directory, relative to the root of the repository, to save reader
+    # models downloaded by name in. Later starts load the saved model instead
+    # of converting the downloaded one again. None turns this off.
+    model_cache_directory: Optional[str] = 'models/cache'
+
+    # The directory for the BM25 index, relative to the root of the
+    # repository. The index is built from the articles file the first time,
+    # and again whenever the articles file changes.
+    bm25_index_directory: str = 'data/generated/bm25_index'
+
+    # The directory for the dense passage embeddings, relative to the root of
+    # the repository, and the precision they are stored in: 'float32', or
+    # 'float16' for half the size.
+    dense_index_directory: str = 'data/generated/dense_index'
+    dense_index_dtype: str = 'float32'
+
+    # Split articles into passages of whole paragraphs, up to chunk_size
+    # characters each, with chunk_overlap paragraphs repeated between
+    # consecutive passages. Shorter passages mean less text for the reader to
+    # read for each question. None keeps each article as a single document.
+    chunk_size: Optional[int] = None
+    chunk_overlap: int = 1
+
+    # Where Elasticsearch is, and how to use it. Requests time out after
+    # elasticsearch_timeout seconds, and up to elasticsearch_pool_size
+    # connections are kept open for concurrent requests.
+    elasticsearch_host: str = 'localhost'
+    elasticsearch_port: int = 9200
+    elasticsearch_username: str = ''
+    elasticsearch_password: str = ''
+    elasticsearch_timeout: float = 30
+    elasticsearch_pool_size: int = 10
+
+    # Importing the articles into Elasticsearch sends bulk requests of
+    # elasticsearch_bulk_chunk_size documents, elasticsearch_bulk_threads
+    # requests at a time, and retries rejected documents up to
+    # elasticsearch_bulk_max_retries times.
+    elasticsearch_bulk_chunk_size: int = 100
+    elasticsearch_bulk_threads: int = 4
+    elasticsearch_bulk_max_retries: int = 3
+
+    # Most questions answer_batch answers in one call.
+    batch_max_questions: int = 32
+
+    # Benchmark questions to search a rebuilt index with before switching to
+    # it, relative to the root of the repository. None doesn't warm it up.
+    warm_up_questions_filepath: Optional[str] = os.path.join(
+        data_filepath, benchmark_filename)
+
+    # Read the retrieved documents adaptive_step at a time, best first, and
+    # stop once the best answer's probability beats the relevance of the best
+    # unread document by adaptive_margin. See AdaptiveFinder. Questions can
+    # also ask for this, or not, one at a time.
+    adaptive_reading: bool = False
+    adaptive_margin: float = 0.2
+    adaptive_step: int = 2
+
+    # Load the models' weights from memory mapped copies saved in
+    # model_cache_directory, so processes on the same machine share one copy
+    # of them in the page cache. Only for models on the CPU, and needs torch
+    # 2.1 or later, newer than haystack 0.5 runs on; otherwise the weights are
+    # loaded as usual.
+    mmap_model_weights: bool = False
+
+    # Streamed answers are read from the best document first, then
+    # stream_step documents at a time, with the answers so far sent after
+    # each.
+    stream_step: int = 3
+
+    # Record how long each stage of answering takes, and what it does, for
+    # /metrics. Turning this off makes recording do nothing.
+    metrics_enabled: bool = True
+
     def __post_init__(self):
-        retrieverOptions = ['Elasticsearch', 'DensePassage']
+        retrieverOptions = ['Elasticsearch', 'DensePassage', 'BM25']
         if self.retriever not in retrieverOptions:
             errorMsg = "Retriever '{}' not recognized. Must be in {}.".format(
                 self.retriever, retrieverOptions)
             raise ValueError(errorMsg)
 
+        if self.dense_index_dtype not in embedding_dtypes:
+            raise ValueError("dense_index_dtype '{}' not recognized. Must be "
+                             "in {}.".format(self.dense_index_dtype,
+                                             embedding_dtypes))
+
+        if self.chunk_size is not None and self.chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1, not {}.".format(
+                self.chunk_size))
+
+        if self.stream_step < 1:
+            raise ValueError("stream_step must be at least 1, not {}.".format(
+                self.stream_step))
+
+
+def load_reader(model_name_or_path, model_cache_directory=None,
+                use_gpu=True, inference_mode='default', mmap_weights=False):
+    '''Load the reader model. A model given by name is saved in
+    model_cache_directory the first time, and loaded from there afterwards.
+    A quantized model's weights, and memory mappable weights, are saved next
+    to it.
+
+    model_name_or_path: str A model name, or an absolute path to a model.
+    model_cache_directory: Optional[str] An absolute path.
+    use_gpu: bool Ignored for a quantized model, which runs on the CPU.
+    inference_mode: str One of reader_inference_modes.
+    mmap_weights: bool Memory map the weights of a model on the CPU, see
+        shared_weights.map_model_weights. Quantized weights aren't mapped.
+    return: FARMReader
+    '''
+    if inference_mode not in reader_inference_modes:
+        raise ValueError("inference_mode '{}' not recognized. Must be in {}."
+                         .format(inference_mode, reader_inference_modes))
+    quantized = inference_mode == 'quantized'
+    if quantized:
+        use_gpu = False
+
+    if model_cache_directory is None or os.path.exists(model_name_or_path):
+        reader = FARMReader(model_name_or_path=model_name_or_path,
+                            use_gpu=use_gpu)
+        if not quantized:
+            return reader
+        # Only models this function saved have their quantized weights
+        # saved too.
+        return quantize_reader(reader)
+
+    cached_model_path = os.path.join(model_cache_directory,
+                                     model_name_or_path.replace('/', '--'))
+    if os.path.isdir(cached_model_path):
+        print("Loading reader from '{}'.".format(cached_model_path))
+        reader = FARMReader(model_name_or_path=cached_model_path,
+                            use_gpu=use_gpu)
+    else:
+        reader = FARMReader(model_name_or_path=model_name_or_path,
+                            use_gpu=use_gpu)
+
+        # Save to a temporary directory first, so an interrupted save is
+        # never mistaken for a saved model.
+        temp_path = cached_model_path + '.tmp'
+        shutil.rmtree(temp_path, ignore_errors=True)
+        reader.save(temp_path)
+        os.replace(temp_path, cached_model_path)
+        print("Saved reader to '{}'.".format(cached_model_path))
+
+        # Weights left from an earlier copy of the model are stale.
+        for filepath in [quantized_model_filepath(cached_model_path),
+                         weights_filepath(cached_model_path)]:
+            if os.path.exists(filepath):
+                os.remove(filepath)
+
+    if quantized:
+        quantize_reader(reader, quantized_model_filepath(cached_model_path))
+    elif mmap_weights:
+        model = reader.inferencer.model
+        if next(model.parameters()).device.type == 'cpu':
+            map_model_weights(model, weights_filepath(cached_model_path))
+    return reader
+
+
+def connect_to_elasticsearch(config):
+    '''Return an Elasticsearch client with the config's connection
+    settings.
+
+    config: SrdResponderConfig
+    return: Elasticsearch
+    '''
+    return connect(config.elasticsearch_host, config.elasticsearch_port,
+                   config.elasticsearch_username,
+                   config.elasticsearch_password,
+                   config.elasticsearch_timeout,
+                   config.elasticsearch_pool_size)
+
+
+def open_document_store(config, client, index):
+    '''Return a document store searching an index, which is created with
+    haystack's mapping if it doesn't exist.
+
+    config: SrdResponderConfig
+    client: Elasticsearch Used instead of the document store's own client.
+    index: str
+    return: ElasticsearchDocumentStore
+    '''
+    document_store = ElasticsearchDocumentStore(
+        host=config.elasticsearch_host,
+        port=config.elasticsearch_port,
+        username=config.elasticsearch_username,
+        password=config.elasticsearch_password,
+        index=index,
+        timeout=config.elasticsearch_timeout)
+    # The document store's client has the default connection pool.
+    document_store.client = client
+    return document_store
+
+
+def open_articles_index(config, client, articles_filepath, articles_hash=None,
+                        report_stage=None):
+    '''Open the Elasticsearch index of one version of the articles file,
+    split into passages as the config says. The articles are imported into
+    it unless its alias already points to it. The alias isn't switched, so
+    switch_alias has to be called before the index is searched through it.
+
+    config: SrdResponderConfig
+    client: Elasticsearch
+    articles_filepath: str An absolute path to the articles json file.
+    articles_hash: Optional[str] The file's hash, see answer_cache.file_hash.
+        Hashed here if None.
+    report_stage: Optional[Callable[[str], None]] Called with the name of
+        each stage as it starts.
+    return: Tuple[ElasticsearchDocumentStore, str, str] The document store
+        searching the index, the alias and the index.
+    '''
+    if report_stage is None:
+        report_stage = lambda stage: None
+    if articles_hash is None:
+        articles_hash = file_hash(articles_filepath)
+
+    alias = articles_alias(config.chunk_size, config.chunk_overlap)
+    # Each version of the articles gets its own index, and the alias points
+    # to the one being searched.
+    index = versioned_index_name(alias, version_stamp(
+        articles_hash, config.chunk_size, config.chunk_overlap))
+
+    document_store = open_document_store(config, client, index)
+
+    if index in aliased_indices(client, alias):
+        # Use document store as-is.
+        print("Using existing document store with {} documents."
+              .format(document_store.get_document_count()))
+        return document_store, alias, index
+
+    # An index left by an interrupted import is filled in again. Passages
+    # have the same ids each time, so nothing is doubled.
+
+    # Get documents with knowledge
+    report_stage('importing documents')
+    print("Importing documents from '{}' into '{}'.".format(
+        articles_filepath, index))
+
+    with open(articles_filepath) as f:
+        docs = json.load(f)
+
+    formatted_dicts = article_passages(docs, config.chunk_size,
+                                       config.chunk_overlap)
+    index_passages(client, index, formatted_dicts,
+                   config.elasticsearch_bulk_chunk_size,
+                   config.elasticsearch_bulk_threads,
+                   config.elasticsearch_bulk_max_retries)
+    return document_store, alias, index
+
 
 class SrdResponder:
     '''A class to wrap around the Haystack stack, and provide answers to
     questions with any desired formatting or post-processing.'''
 
-    def __init__(self, config: SrdResponderConfig):
-
-        # Connect to Elasticsearch
+    def __init__(self, config: SrdResponderConfig,
+                 report_stage: Optional[Callable[[str], None]] = None):
+        '''Constructor
 
-        document_store = ElasticsearchDocumentStore(host="localhost",
-                                                    username="",
-                                                    password="",
-                                                    index="document")
-
-        total_docs_in_store = document_store.get_document_count()
+        config: SrdResponderConfig
+        report_stage: Optional[Callable[[str], None]] Called with the name of
+            each stage of loading as it starts.
+        '''
+        if report_stage is None:
+            report_stage = lambda stage: None
+        self.config = config
+        registry.enabled = config.metrics_enabled
 
-        if total_docs_in_store > 0:
-            # Use document store as-is.
-            print("Using existing document store with {} documents.".format(
-                total_docs_in_store))
+        self.absolute_srd_filepath = create_absolute_path(
+            os.path.dirname(__file__), generated_srd_filepath)
 
+        abs_model_name_or_path = model_name_or_path[0]
+        if model_name_or_path[1]:
+            # The model is described by a local filepath
+            abs_model_name_or_path = create_absolute_path(
+                os.path.dirname(__file__), model_name_or_path[0])
+        self.abs_model_name_or_path = abs_model_name_or_path
+
+        model_cache_directory = config.model_cache_directory
+        if model_cache_directory is not None:
+            model_cache_directory = create_absolute_path(
+                os.path.dirname(__file__), model_cache_directory)
+
+        # Loading the reader doesn't depend on the document store, so it
+        # loads while the document store is set up.
+        report_stage('loading reader and document store')
+        reader_executor = ThreadPoolExecutor(max_workers=1)
+        reader_future = reader_executor.submit(
+            load_reader, abs_model_name_or_path, model_cache_directory,
+            config.use_gpu, reader_inference_mode,
+            config.mmap_model_weights)
+        reader_executor.shutdown(wait=False)
+
+        self.model_cache_directory = model_cache_directory
+        self._encoder = None
+        self._elasticsearch_client = None
+        retriever, document_count, articles_hash, activate = \
+            self._build_retriever(report_stage)
+        activate()
+        # Reindexing switches the retriever inside this one, so the finders
+        # don't need to change.
+        self.retriever = SwitchableRetriever(retriever)
+        self._reindex_lock = threading.Lock()
+
+        report_stage('loading reader')
+        reader = self.reader = TimedReader(reader_future.result())
+
+        if config.reader_batch_max_size > 1:
+            self.finder = BatchingFinder(
+                self.retriever, reader,
+                max_wait=config.reader_batch_max_wait,
+                max_batch_size=config.reader_batch_max_size)
+            read = self.finder.read
+            self._submit_read = self.finder.submit
         else:
+            self.finder = Finder(reader, self.retriever)
+            read = partial(read_documents, reader)
+            self._submit_read = submit_now(read)
+        self._read = read
+        self.adaptive_finder = AdaptiveFinder(self.retriever, read,
+                                              margin=config.adaptive_margin,
+                                              step=config.adaptive_step)
+        self.adaptive_reading = config.adaptive_reading
+
+        answer_cache_filepath = config.answer_cache_filepath
+        if answer_cache_filepath is not None:
+            answer_cache_filepath = create_absolute_path(
+                os.path.dirname(__file__), answer_cache_filepath)
+        self.answer_cache = AnswerCache(
+            self._answer_cache_version(articles_hash, document_count),
+            max_size=config.answer_cache_size,
+            ttl=config.answer_cache_ttl,
+            disk_filepath=answer_cache_filepath)
+
+    def _answer_cache_version(self, articles_hash, document_count):
+        '''Return the answer cache's version stamp. Predictions only depend
+        on the question, the models and the articles, so a change to any of
+        them gives a new version stamp.
+
+        articles_hash: str
+        document_count: int
+        return: str
+        '''
+        config = self.config
+        return version_stamp(self.abs_model_name_or_path,
+                             reader_inference_mode, config.retriever,
+                             articles_hash, document_count,
+                             config.chunk_size, config.chunk_overlap,
+                             config.adaptive_margin, config.adaptive_step)
+
+    def _load_encoder(self):
+        '''Load the DPR encoders, with memory mapped weights if the config
+        asks for them.
+
+        return: DensePassageRetriever
+        '''
+        encoder = load_encoder(use_gpu=self.config.use_gpu)
+        if (self.config.mmap_model_weights and
+                self.model_cache_directory is not None and
+                encoder.device.type == 'cpu'):
+            # Named after the encoders, so other encoders get their own file.
+            os.makedirs(self.model_cache_directory, exist_ok=True)
+            map_model_weights(encoder.model, os.path.join(
+                self.model_cache_directory, 'dpr-{}--weights.pt'.format(
+                    version_stamp(query_embedding_model,
+                                  passage_embedding_model))))
+        return encoder
+
+    def _build_retriever(self, report_stage):
+        '''Build or load the retriever's index of the current articles file.
+
+        report_stage: Callable[[str], None]
+        return: Tuple The retriever, the number of documents it searches, the
+            hash of the articles file it was built from, and a function to
+            call when it starts being used.
+        '''
+        config = self.config
+        absolute_srd_filepath = self.absolute_srd_filepath
+        articles_hash = file_hash(absolute_srd_filepath)
+        activate = lambda: None
+
+        if config.retriever == 'BM25':
+            # Search the articles in this process, without Elasticsearch.
+            report_stage('loading BM25 index')
+            bm25_index = BM25Index.load_or_build(
+                absolute_srd_filepath,
+                create_absolute_path(os.path.dirname(__file__),
+                                     config.bm25_index_directory),
+                config.chunk_size, config.chunk_overlap)
+            retriever = BM25Retriever(bm25_index)
+            document_count = len(bm25_index)
 
-            absolute_srd_filepath = create_absolute_path(
-                os.path.dirname(__file__), generated_srd_filepath)
-
-            # Get documents with knowledge
-            print("Importing documents from '{}'.".format(
-                absolute_srd_filepath))
-
+        elif config.retriever == 'DensePassage':
+            # Search precomputed passage embeddings in this process. They are
+            # built here if bin/build_dense_index.py hasn't been run.
+            report_stage('loading dense index')
+            if self._encoder is None:
+                self._encoder = self._load_encoder()
+            dense_index = DenseIndex.load_or_build(
+                create_absolute_path(os.path.dirname(__file__),
+                                     config.dense_index_directory),
+                absolute_srd_filepath, self._encoder,
+                config.dense_index_dtype, config.chunk_size,
+                config.chunk_overlap)
             with open(absolute_srd_filepath) as f:
-                docs = json.load(f)
+                articles = json.load(f)
+            retriever = DenseIndexRetriever(
+                self._encoder, dense_index,
+                article_passages(articles, config.chunk_size,
+                                 config.chunk_overlap))
+            document_count = len(dense_index)
 
-            formatted_dicts = [{"name": k, "text": v} for k, v in docs.items()]
-            document_store.write_documents(formatted_dicts)
-
-        if config.retriever == 'Elasticsearch':
+        else:
+            if self._elasticsearch_client is None:
+                self._elasticsearch_client = connect_to_elasticsearch(config)
+            client = self._elasticsearch_client
+            document_store, alias, index = open_articles_index(
+                config, client, absolute_srd_filepath, articles_hash,
+                report_stage)
             retriever = ElasticsearchRetriever(document_store=document_store)
+            activate = partial(switch_alias, client, alias, index)
 
-        elif config.retriever == 'DensePassage':
-            retriever = DensePassageRetriever(
-                document_store=document_store,
-                query_embedding_model=(
-                    "facebook/dpr-question_encoder-single-nq-base"),
-                passage_embedding_model=(
-                    "facebook/dpr-ctx_encoder-single-nq-base"),
-                max_seq_len_query=64,
-                max_seq_len_passage=256,
-                batch_size=16,
-                use_gpu=True,
-                embed_title=True,
-                use_fast_tokenizers=True)
-
-            if total_docs_in_store == 0:
-                # Assume that if we are re-using a document store, it has the
-                # embeddings we want.
-                document_store.update_embeddings(retriever)
+            document_count = document_store.get_document_count()
 
-        abs_model_name_or_path = model_name_or_path[0]
-        if model_name_or_path[1]:
-            # The model is described by a local filepath
-            abs_model_name_or_path = create_absolute_path(
-                os.path.dirname(__file__), model_name_or_path[0])
-
-        reader = FARMReader(model_name_or_path=abs_model_name_or_path,
-                            use_gpu=True)
+        return retriever, document_count, articles_hash, activate
 
-        self.finder = Finder(reader, retriever)
+    def reindex(self, report_stage=None):
+        '''Build the retriever's index again from the current articles file,
+        while questions are still answered from the old one. Then warm it up
+        with the benchmark questions, switch every question to it at once, and
+        clear the answer cache.
 
-    def _make_prediction(self, question):
-        '''A helper function to call the finder and return answers.
+        report_stage: Optional[Callable[[str], None]] Called with the name of
+            each stage as it starts.
+        '''
+        if report_stage is None:
+            report_stage = lambda stage: None
+
+        with self._reindex_lock:
+            retriever, document_count, articles_hash, activate = \
+                self._build_retriever(report_stage)
+
+            # Searching first loads the new index's pages and caches, so the
+            # first questions after the switch aren't slower.
+            report_stage('warming up')
+            warm_up_filepath = self.config.warm_up_questions_filepath
+            if warm_up_filepath is not None:
+                for question in read_warm_up_questions(create_absolute_path(
+                        os.path.dirname(__file__), warm_up_filepath)):
+                    retriever.retrieve(question, top_k=10)
+
+            report_stage('switching')
+            self.retriever.switch(retriever)
+            activate()
+            # After the switch, so no prediction from the old articles is
+            # cached under the new version.
+            self.answer_cache.reset(self._answer_cache_version(
+                articles_hash, document_count))
+            print('Switched to {} documents.'.format(document_count))
+
+    def after_fork(self, torch_threads=None):
+        '''Prepare a responder loaded before a fork to answer questions in
+        the forked process. Threads, connections and locks aren't carried
+        across a fork safely, so they are made again here. The models, which
+        are only read, stay shared with the process that loaded them.
+
+        torch_threads: Optional[int] Threads each model runs on in this
+            process. Workers that share a machine's cores should split them.
+            None leaves torch's default, every core.
+        '''
+        if torch_threads is not None:
+            import torch
+            torch.set_num_threads(torch_threads)
+
+        if isinstance(self.finder, BatchingFinder):
+            self.finder.after_fork()
+        self.answer_cache.after_fork()
+        self._reindex_lock = threading.Lock()
+
+        if self._elasticsearch_client is not None:
+            self._elasticsearch_client = connect_to_elasticsearch(self.config)
+            self.retriever.retriever.document_store.client = \
+                self._elasticsearch_client
+
+    def _make_prediction(self, question, top_k_retriever=10, top_k_reader=5,
+                         adaptive=None, use_cache=True):
+        '''A helper function to call the finder and return answers. Answers
+        are served from the answer cache when the same question was asked
+        before.
 
         question: str A question, plaintext.
+        top_k_retriever: int
+        top_k_reader: int Number of answers needed.
+        adaptive: Optional[bool] Stop reading documents early, see
+            AdaptiveFinder. None uses the config's adaptive_reading.
+        use_cache: bool Look the question up in the answer cache. When False,
+            the question is always answered by the models, like when timing
+            them, and the new prediction replaces any cached one.
         return: A dictionary with answers and metadata.
         '''
+        if adaptive is None:
+            adaptive = self.adaptive_reading
+        finder = self.adaptive_finder if adaptive else self.finder
+
+        cache_key = self.answer_cache.key(question, top_k_retriever,
+                                          top_k_reader, adaptive)
+        prediction = (self.answer_cache.get_answers(
+            question, top_k_retriever, top_k_reader, adaptive)
+            if use_cache else None)
+        if prediction is None:
+            prediction = finder.get_answers(
+                question=question,
+                top_k_retriever=top_k_retriever,
+                top_k_reader=top_k_reader)
+            # Answers from a passage give offsets in the passage, so they
+            # are moved to offsets in the whole article.
+            with stage_seconds.time(stage='postprocessing'):
+                map_answers_to_articles(prediction)
+            self.answer_cache.put(cache_key, prediction)
+
+        # The cached prediction may be for a differently spaced question.
+        prediction['question'] = question
+        return prediction
 
-        return self.finder.get_answers(question=question,
-                                       top_k_retriever=10,
-                                       top_k_reader=5)
-
-    def top_answer_in_context(self, question: str, top_5: bool = False) -> str:
+    def top_answer_in_context(self, question: str, top_5: bool = False,
+                              adaptive: Optional[bool] = None,
+                              use_cache: bool = True) -> str:
         '''Return the most likely answer for the given question. Return the
         context, but put the answer in bold.
 
         question: str representing a question to answer.
+        top_5: bool Return the top 5 answers instead of only the top one.
+        adaptive: Optional[bool] See _make_prediction.
+        use_cache: bool See _make_prediction.
         return: str representing the answer.
         '''
 
-        prediction = self._make_prediction(question)
-        answer_string = '<p>'
-
-        if not top_5:
-            top_answer_dict = prediction['answers'][0]
-            top_answer_text = top_answer_dict['answer']
-            top_answer_context = top_answer_dict['context']
-
-            answer_string += make_substring_bold(top_answer_context, top_answer_text)
-        else:
-            answer_string += 'Question: {}'.format(question)
-            answer_header_template = ('<br/><br/>Answer {}, '
-                                      'from article <i>{}</i>:')
-            answers = prediction['answers']
-            for i in range(5):
-                top_answer_text = answers[i]['answer']
-                top_answer_context = answers[i]['context']
-                answer_string += answer_header_template.format(
-                    i+1, answers[i]['meta']['name'])
-                answer_string += '<br/>' + make_substring_bold(
-                    top_answer_context, top_answer_text)
-        answer_string += '</p>'
-        return answer_string
-
-    def answers_with_metadata(self, question):
+        # Only the top answer is read for when it's the only one needed. The
+        # top 5 start with it, so the cache answers it from them too.
+        prediction = self._make_prediction(question,
+                                           top_k_reader=5 if top_5 else 1,
+                                           adaptive=adaptive,
+                                           use_cache=use_cache)
+        with stage_seconds.time(stage='postprocessing'):
+            return answer_in_context(question, prediction, top_5)
+
+    def stream_answers_in_context(self, question, top_k_reader=5):
+        '''Yield the top answers found so far for a question, in their
+        contexts with the answers in bold, as the reader finds them. The
+        first update comes once the best document is read. A question in the
+        answer cache gets its answers in one update.
+
+        question: str
+        top_k_reader: int Number of answers in each update.
+        return: Iterator[Dict] Updates with the 'question', its 'answers' so
+            far, best first, each with its 'rank', 'answer', 'article' and
+            'html', and whether they are 'done'.
+        '''
+        # The same key as _make_prediction without adaptive reading, which
+        # reads every document too.
+        cache_key = self.answer_cache.key(question, 10, top_k_reader, False)
+        prediction = self.answer_cache.get_answers(question, 10, top_k_reader,
+                                                   False)
+        if prediction is not None:
+            yield self._stream_update(question, prediction, True)
+            return
+
+        for prediction, unread in stream_answers(
+                self.retriever, self._read, question, top_k_reader,
+                step=self.config.stream_step):
+            if unread == 0:
+                self.answer_cache.put(cache_key, prediction)
+            yield self._stream_update(question, prediction, unread == 0)
+
+    @classmethod
+    def _stream_update(cls, question, prediction, done):
+        with stage_seconds.time(stage='postprocessing'):
+            return cls._format_stream_update(question, prediction, done)
+
+    @classmethod
+    def _format_stream_update(cls, question, prediction, done):
+        return {'question': question,
+                'answers': [{'rank': rank,
+                             'answer': answer['answer'],
+                             'article': answer['meta']['name'],
+                             'html': answer_html(rank, answer)}
+                            for rank, answer in enumerate(
+                                prediction['answers'], 1)],
+                'done': done}
+
+    def answers_with_metadata(self, question, adaptive=None, use_cache=True):
         '''Return all answer candidates, with metadata, as provided by the
         finder.
 
         question: str A question, plaintext.
+        adaptive: Optional[bool] See _make_prediction.
+        use_cache: bool See _make_prediction.
         return: Dict The answer structure as returned by the finder.
         '''
 
-        prediction = self._make_prediction(question)
+        prediction = self._make_prediction(question, adaptive=adaptive,
+                                           use_cache=use_cache)
         return prediction
 
-    def full_prediction_output(self, question: str) -> PredictionOutput:
+    def full_prediction_output(self, question: str,
+                               adaptive: Optional[bool] = None,
+                               use_cache: bool = True) -> PredictionOutput:
         '''Return all output from the finder.'''
 
-        prediction = self._make_prediction(question)
+        prediction = self._make_prediction(question, adaptive=adaptive,
+                                           use_cache=use_cache)
         return PredictionOutput(**prediction)
+
+    def answer_batch(self, items):
+        '''Answer several questions at once, see batch_answering.answer_batch.
+        The questions are read by the finder's worker when it batches
+        questions, so a batch never runs the reader alongside it.
+
+        items: List[Dict] Each with a 'question', and optionally a 'mode',
+            one of batch_answering.answer_modes, 'top_5_answer' by default,
+            and 'adaptive', see _make_prediction.
+        return: List[Dict] For each item, in the same order, either its
+            'answer', or an 'error'.
+        '''
+        return answer_batch(
+            items, self.retriever, self._submit_read, self.answer_cache,
+            lambda question, top_k_reader: self._make_prediction(
+                question, top_k_reader=top_k_reader, adaptive=True),
+            adaptive_reading=self.adaptive_reading,
+            max_questions=self.config.batch_max_questions)
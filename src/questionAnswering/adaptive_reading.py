@@ -0,0 +1,118 @@
+from copy import deepcopy
+
+
+def read_documents(reader, question, documents, top_k_reader):
+    '''Run the reader over a question's documents, and return its prediction
+    in the same format as Finder.get_answers.
+
+    reader: FARMReader
+    question: str
+    documents: List[Document]
+    top_k_reader: int Number of answers to return.
+    return: Dict
+    '''
+    if not documents:
+        return {'question': question, 'answers': []}
+
+    prediction = reader.predict(question=question, documents=documents,
+                                top_k=top_k_reader)
+    documents_by_id = {document.id: document for document in documents}
+    for answer in prediction['answers']:
+        document = documents_by_id.get(answer['document_id'])
+        answer['meta'] = {} if document is None else deepcopy(document.meta)
+    return prediction
+
+
+def retriever_relevances(documents):
+    '''Return each document's retriever score as a fraction of the best
+    score, so retrievers with different scales can be compared with the
+    reader's answer probabilities.
+
+    documents: List[Document] Sorted by score, best first.
+    return: List[float] Between 0 and 1.
+    '''
+    best_score = documents[0].score if documents else None
+    if not best_score or best_score <= 0:
+        # Without usable scores, every document might hold the answer.
+        return [1.0] * len(documents)
+    return [min(1.0, max(0.0, (document.score or 0.0) / best_score))
+            for document in documents]
+
+
+class AdaptiveFinder:
+    '''A replacement for haystack's Finder that reads the retrieved documents
+    a few at a time, best first, and stops once the answer found so far is
+    clearly better than any remaining document is likely to give.
+
+    After each step, the best answer's probability is compared with the
+    relevance of the best unread document, see retriever_relevances. When the
+    answer is ahead by at least margin, the rest of the documents aren't read,
+    so questions with a clear answer in the first few documents are answered
+    sooner.'''
+
+    def __init__(self, retriever, read, margin=0.2, step=2):
+        '''Constructor
+
+        retriever: A haystack retriever.
+        read: Callable[[str, List[Document], int], Dict] Takes a question,
+            documents and the number of answers, and returns a prediction like
+            read_documents does.
+        margin: float
+        step: int Number of documents read at a time.
+        '''
+        if step < 1:
+            raise ValueError('step must be at least 1, not {}.'.format(step))
+        self.retriever = retriever
+        self.read = read
+        self.margin = margin
+        self.step = step
+        self.documents_retrieved = 0
+        self.documents_read = 0
+
+    def get_answers(self, question, top_k_reader=1, top_k_retriever=10):
+        '''Return answers for a question, in the same format as
+        Finder.get_answers.
+
+        question: str
+        top_k_reader: int Number of answers to return.
+        top_k_retriever: int Most documents to retrieve and read.
+        return: Dict
+        '''
+        documents = self.retriever.retrieve(question, top_k=top_k_retriever)
+        if not documents:
+            return {'question': question, 'answers': []}
+
+        # Retrievers return the best documents first, but the order matters
+        # here, so it isn't left to chance. The sort is stable for ties.
+        documents = sorted(documents, key=lambda document:
+                           -(document.score or 0.0))
+        relevances = retriever_relevances(documents)
+
+        answers = []
+        no_ans_gaps = []
+        read_count = 0
+        while read_count < len(documents):
+            prediction = self.read(
+                question, documents[read_count:read_count + self.step],
+                top_k_reader)
+            answers += prediction['answers']
+            if 'no_ans_gap' in prediction:
+                no_ans_gaps.append(prediction['no_ans_gap'])
+            read_count = min(read_count + self.step, len(documents))
+
+            if (answers and read_count < len(documents) and
+                    max(answer['probability'] for answer in answers) >=
+                    relevances[read_count] + self.margin):
+                break
+
+        self.documents_retrieved += len(documents)
+        self.documents_read += read_count
+
+        # Reader scores don't depend on the other documents read with a
+        # passage, so answers from each step can be ranked together.
+        answers.sort(key=lambda answer: answer['score'], reverse=True)
+        prediction = {'question': question, 'answers': answers[:top_k_reader]}
+        if no_ans_gaps:
+            # The reader reports the largest gap of the documents it read.
+            prediction['no_ans_gap'] = max(no_ans_gaps)
+        return prediction
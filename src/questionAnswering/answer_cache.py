@@ -0,0 +1,270 @@
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+from collections import OrderedDict
+from copy import deepcopy
+from time import time
+
+from questionAnswering.metrics import answer_cache_lookups
+
+# The number of answers the responder usually reads for, and caches. A
+# question asked for fewer is answered from a prediction with this many.
+shared_top_k_reader = 5
+
+
+def normalize_question(question):
+    '''Return the form of a question used in cache keys. Runs of whitespace
+    are collapsed and the ends are stripped. Case and punctuation are kept,
+    since the reader model is case sensitive, and they can change its answers.
+
+    question: str
+    return: str
+    '''
+    return ' '.join(question.split())
+
+
+def version_stamp(*parts):
+    '''Return a short hash identifying the model, retriever and corpus that
+    predictions were made with. Predictions are only shared between caches with
+    the same stamp.
+
+    parts: Any json serializable values.
+    return: str
+    '''
+    return hashlib.sha256(json.dumps(parts).encode()).hexdigest()[:16]
+
+
+def file_hash(filepath):
+    '''Return the sha256 of a file's contents, or '' if it doesn't exist.
+
+    filepath: str
+    return: str
+    '''
+    if not os.path.exists(filepath):
+        return ''
+    sha = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(2**20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+class AnswerCache:
+    '''A cache of predictions from the finder, keyed on the question, the
+    top_k values and a version stamp.
+
+    Entries are kept in memory, up to max_size of them, with the least recently
+    used entry evicted first. Entries older than ttl seconds are treated as
+    missing. If a disk_filepath is given, entries are also stored in an sqlite
+    database there, so they survive restarts.
+
+    Callers get their own copy of a cached prediction, so they can change it
+    freely.'''
+
+    def __init__(self, version, max_size=1024, ttl=24 * 60 * 60,
+                 disk_filepath=None, clock=time):
+        '''Constructor
+
+        version: str A version stamp, see version_stamp.
+        max_size: int Most entries to keep in memory. 0 turns the cache off.
+        ttl: Optional[float] Seconds an entry is kept for. None keeps entries
+            until they are evicted.
+        disk_filepath: Optional[str] An sqlite database for the on-disk tier.
+        clock: Callable[[], float] Returns the current time in seconds.
+        '''
+        if max_size < 0:
+            raise ValueError('max_size must not be negative, not {}.'.format(
+                max_size))
+        self.version = version
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.disk_filepath = disk_filepath
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        self._connection = None
+        if disk_filepath is not None and max_size > 0:
+            os.makedirs(os.path.dirname(os.path.abspath(disk_filepath)),
+                        exist_ok=True)
+            self._connection = sqlite3.connect(disk_filepath,
+                                               check_same_thread=False)
+            with self._connection:
+                self._connection.execute(
+                    'CREATE TABLE IF NOT EXISTS predictions '
+                    '(key TEXT PRIMARY KEY, created REAL, prediction BLOB)')
+                if ttl is not None:
+                    self._connection.execute(
+                        'DELETE FROM predictions WHERE created < ?',
+                        (clock() - ttl,))
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def key(self, question, *settings):
+        '''Return the cache key for a question.
+
+        question: str
+        settings: Anything else the prediction depends on, like
+            top_k_retriever and top_k_reader. Must be json serializable.
+        return: str
+        '''
+        return json.dumps([self.version, normalize_question(question)] +
+                          list(settings))
+
+    def _expired(self, created):
+        return self.ttl is not None and self.clock() - created > self.ttl
+
+    def _get_from_disk(self, key):
+        row = self._connection.execute(
+            'SELECT created, prediction FROM predictions WHERE key = ?',
+            (key,)).fetchone()
+        if row is None:
+            return None
+        created, prediction = row
+        if self._expired(created):
+            return None
+        return created, pickle.loads(prediction)
+
+    def _remember(self, key, created, prediction):
+        self._entries[key] = (created, prediction)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key):
+        '''Return a copy of the cached prediction for a key, or None if there
+        isn't one.
+
+        key: str
+        return: Optional[Dict]
+        '''
+        return self._get([key])
+
+    def get_answers(self, question, top_k_retriever, top_k_reader,
+                    *settings):
+        '''Return a copy of the cached prediction of the top_k_reader best
+        answers to a question, or None if there isn't one. The best answers
+        are the first of the top shared_top_k_reader, so a question asked for
+        fewer is answered from a cached prediction with that many, cut to
+        top_k_reader.
+
+        question: str
+        top_k_retriever: int
+        top_k_reader: int
+        settings: Anything else the prediction depends on, see key.
+        return: Optional[Dict]
+        '''
+        keys = [self.key(question, top_k_retriever, top_k_reader, *settings)]
+        if top_k_reader < shared_top_k_reader:
+            keys.append(self.key(question, top_k_retriever,
+                                 shared_top_k_reader, *settings))
+        prediction = self._get(keys)
+        if prediction is not None:
+            prediction['answers'] = prediction['answers'][:top_k_reader]
+        return prediction
+
+    def _get(self, keys):
+        '''Return a copy of the cached prediction for the first of the keys
+        that has one, counting one hit or miss for them all.'''
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and self._expired(entry[0]):
+                    del self._entries[key]
+                    self.expirations += 1
+                    entry = None
+
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    answer_cache_lookups.inc(result='hit')
+                    return deepcopy(entry[1])
+                if self._connection is not None:
+                    entry = self._get_from_disk(key)
+                    if entry is not None:
+                        self._remember(key, *entry)
+                        self.disk_hits += 1
+                        answer_cache_lookups.inc(result='disk_hit')
+                        return deepcopy(entry[1])
+
+            self.misses += 1
+            answer_cache_lookups.inc(result='miss')
+            return None
+
+    def put(self, key, prediction):
+        '''Store a copy of a prediction.
+
+        key: str
+        prediction: Dict
+        '''
+        if not self.enabled:
+            return
+
+        created = self.clock()
+        prediction = deepcopy(prediction)
+        with self._lock:
+            self._remember(key, created, prediction)
+            if self._connection is not None:
+                with self._connection:
+                    self._connection.execute(
+                        'INSERT OR REPLACE INTO predictions VALUES (?, ?, ?)',
+                        (key, created, pickle.dumps(prediction)))
+
+    def clear(self):
+        '''Remove every entry, in memory and on disk.'''
+        with self._lock:
+            self._entries.clear()
+            if self._connection is not None:
+                with self._connection:
+                    self._connection.execute('DELETE FROM predictions')
+
+    def reset(self, version):
+        '''Change the version stamp, and remove every entry. Predictions
+        already being made are stored under the old version's keys, so they
+        are never returned.
+
+        version: str
+        '''
+        self.version = version
+        self.clear()
+
+    def after_fork(self):
+        '''Open a new connection to the on-disk tier, and make a new lock, in
+        a process forked from the one that made the cache. An sqlite
+        connection mustn't be used on both sides of a fork, and the lock may
+        have been held by a thread that doesn't exist after it.'''
+        self._lock = threading.Lock()
+        if self._connection is not None:
+            self._connection = sqlite3.connect(self.disk_filepath,
+                                               check_same_thread=False)
+
+    def stats(self):
+        '''Return the hit and miss counts, and the number of entries in memory.
+
+        return: Dict
+        '''
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {'hits': self.hits,
+                    'disk_hits': self.disk_hits,
+                    'misses': self.misses,
+                    'hit_rate': ((self.hits + self.disk_hits) / lookups
+                                 if lookups else 0.0),
+                    'evictions': self.evictions,
+                    'expirations': self.expirations,
+                    'size': len(self._entries),
+                    'max_size': self.max_size}
@@ -0,0 +1,205 @@
+from concurrent.futures import Future
+
+from prediction.prediction_format import PredictionOutput
+from questionAnswering.answer_cache import shared_top_k_reader
+from questionAnswering.chunking import map_answers_to_articles
+from questionAnswering.metrics import errors, stage_seconds
+from questionAnswering.utils import make_substring_bold
+
+# Answer several questions in one call, each in its own answer mode. The
+# questions the answer cache doesn't have are queued for the reader together,
+# so a batching finder's worker reads them in as few batches as it can,
+# alongside any questions asked at the same time.
+
+# The ways answer_batch can return an answer, named after the SrdResponder
+# methods that return them one at a time. 'top_answer' and 'top_5_answer' are
+# top_answer_in_context, 'all_answers' is answers_with_metadata, and
+# 'with_metadata' is full_prediction_output as a dictionary.
+answer_modes = ['top_answer', 'top_5_answer', 'all_answers', 'with_metadata']
+
+
+def mode_top_k_reader(mode):
+    '''Return the number of answers to read for an answer mode. Only the top
+    answer is read for when it's the only one shown.
+
+    mode: str One of answer_modes.
+    return: int
+    '''
+    return 1 if mode == 'top_answer' else shared_top_k_reader
+
+
+def answer_html(rank, answer):
+    '''Format one of the top 5 answers in its context, with the answer in
+    bold, under a header with its rank and article.
+
+    rank: int Starting from 1.
+    answer: Dict An answer from a prediction.
+    return: str
+    '''
+    return ('<br/><br/>Answer {}, from article <i>{}</i>:<br/>{}'.format(
+        rank, answer['meta']['name'],
+        make_substring_bold(answer['context'], answer['answer'])))
+
+
+def answer_in_context(question, prediction, top_5=False):
+    '''Format the top answer, or top 5 answers, of a prediction in their
+    contexts, with the answers in bold.
+
+    question: str
+    prediction: Dict In the format of Finder.get_answers.
+    top_5: bool
+    return: str
+    '''
+    if not top_5:
+        top_answer_dict = prediction['answers'][0]
+        return '<p>{}</p>'.format(make_substring_bold(
+            top_answer_dict['context'], top_answer_dict['answer']))
+
+    # Joined once, instead of copying the string for each part.
+    parts = ['<p>Question: {}'.format(question)]
+    parts += [answer_html(rank, answer)
+              for rank, answer in enumerate(prediction['answers'][:5], 1)]
+    parts.append('</p>')
+    return ''.join(parts)
+
+
+def format_prediction(question, prediction, mode):
+    '''Return a prediction in the format of an answer mode, like the
+    SrdResponder method for that mode does.
+
+    question: str
+    prediction: Dict In the format of Finder.get_answers.
+    mode: str One of answer_modes.
+    return: Union[str, Dict]
+    '''
+    if mode == 'all_answers':
+        return prediction
+    with stage_seconds.time(stage='postprocessing'):
+        if mode == 'with_metadata':
+            return PredictionOutput(**prediction).as_dict()
+        return answer_in_context(question, prediction,
+                                 top_5=mode == 'top_5_answer')
+
+
+def submit_now(read):
+    '''Wrap a read function so it returns its prediction as a finished
+    Future, like BatchingFinder.submit does.
+
+    read: Callable[[str, List[Document], int], Dict] Takes a question,
+        documents and the number of answers, and returns a prediction.
+    return: Callable[[str, List[Document], int], Future]
+    '''
+    def submit(question, documents, top_k_reader):
+        future = Future()
+        try:
+            future.set_result(read(question, documents, top_k_reader))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    return submit
+
+
+def _error_text(e):
+    return '{}: {}'.format(type(e).__name__, e)
+
+
+def answer_batch(items, retriever, submit_read, answer_cache,
+                 answer_adaptively, adaptive_reading=False,
+                 max_questions=32, top_k_retriever=10):
+    '''Answer several questions at once. Questions already in the answer
+    cache are answered from it. The rest are retrieved for one by one, and
+    then queued for the reader together. Questions asking for adaptive
+    reading are answered one by one, since how much each reads depends on
+    what it finds.
+
+    An error answering one question is returned in its place, and doesn't
+    stop the others from being answered.
+
+    items: List[Dict] Each with a 'question', and optionally a 'mode', one of
+        answer_modes, 'top_5_answer' by default, and 'adaptive'.
+    retriever: A haystack retriever.
+    submit_read: Callable[[str, List[Document], int], Future] Queues a
+        question and its documents for the reader, like
+        BatchingFinder.submit, and returns the future prediction.
+    answer_cache: AnswerCache
+    answer_adaptively: Callable[[str, int], Dict] Takes a question and the
+        number of answers, and returns a prediction of its top answers from
+        adaptive reading, with offsets in the whole article.
+    adaptive_reading: bool Whether questions that don't say are read
+        adaptively.
+    max_questions: int Most questions in a batch.
+    top_k_retriever: int Number of documents to retrieve for each question.
+    return: List[Dict] For each item, in the same order, either its 'answer',
+        or an 'error'.
+    '''
+    if len(items) > max_questions:
+        raise ValueError('A batch can have at most {} questions, not {}.'
+                         .format(max_questions, len(items)))
+
+    results = [None] * len(items)
+    # Questions queued for the reader: index, question, mode, cache key and
+    # the future prediction.
+    # The top answer is the first of the top 5, so a question asked for the
+    # top answer is answered from a cached prediction of the top 5 too.
+    to_read = []
+    for i, item in enumerate(items):
+        try:
+            question = item['question']
+            mode = item.get('mode', 'top_5_answer')
+            if mode not in answer_modes:
+                raise ValueError(
+                    "Unrecognized mode '{}'. Must be in {}.".format(
+                        mode, answer_modes))
+            adaptive = item.get('adaptive')
+            if adaptive is None:
+                adaptive = adaptive_reading
+            top_k_reader = mode_top_k_reader(mode)
+
+            if adaptive:
+                prediction = answer_adaptively(question, top_k_reader)
+                results[i] = {'answer': format_prediction(
+                    question, prediction, mode)}
+                continue
+
+            cache_key = answer_cache.key(question, top_k_retriever,
+                                         top_k_reader, False)
+            prediction = answer_cache.get_answers(question, top_k_retriever,
+                                                  top_k_reader, False)
+            if prediction is not None:
+                prediction['question'] = question
+                results[i] = {'answer': format_prediction(
+                    question, prediction, mode)}
+                continue
+
+            documents = retriever.retrieve(question, top_k=top_k_retriever)
+            # Queued straight away, so the reader can start on the first
+            # questions while the rest are retrieved for.
+            to_read.append((i, question, mode, cache_key,
+                            submit_read(question, documents,
+                                        top_k_reader)))
+        except Exception as e:
+            errors.inc(where='batch_question')
+            results[i] = {'error': _error_text(e)}
+
+    for i, question, mode, cache_key, future in to_read:
+        try:
+            prediction = future.result()
+        except Exception as e:
+            # A batching finder counts reader errors itself, once for each
+            # batch.
+            errors.inc(where='batch_question')
+            results[i] = {'error': _error_text(e)}
+            continue
+
+        try:
+            # Answers from a passage give offsets in the passage, so they
+            # are moved to offsets in the whole article.
+            with stage_seconds.time(stage='postprocessing'):
+                map_answers_to_articles(prediction)
+            answer_cache.put(cache_key, prediction)
+            results[i] = {'answer': format_prediction(question, prediction,
+                                                      mode)}
+        except Exception as e:
+            errors.inc(where='batch_question')
+            results[i] = {'error': _error_text(e)}
+    return results
@@ -0,0 +1,228 @@
+import queue
+import threading
+from concurrent.futures import Future
+from copy import deepcopy
+from time import monotonic
+
+from questionAnswering.metrics import errors, queue_wait_seconds
+
+
+class _Request:
+    '''A question waiting for the reader, with the documents retrieved for it
+    and the future its caller is waiting on.'''
+
+    __slots__ = ('question', 'documents', 'top_k_reader', 'future',
+                 'queued_time')
+
+    def __init__(self, question, documents, top_k_reader):
+        self.question = question
+        self.documents = documents
+        self.top_k_reader = top_k_reader
+        self.future = Future()
+        self.queued_time = monotonic()
+
+
+class _BatchQuestion:
+    '''FARMReader.predict_batch reads the question from a label-like object's
+    question attribute.'''
+
+    __slots__ = ('question',)
+
+    def __init__(self, question):
+        self.question = question
+
+
+def predict_batch(reader, questions_with_documents, top_k_reader,
+                  reader_batch_size=50):
+    '''Run the reader over several questions at once, and return a prediction
+    for each question in the same format as Finder.get_answers.
+
+    reader: FARMReader
+    questions_with_documents: List[Tuple[str, List[Document]]]
+    top_k_reader: int Number of answers for each question.
+    reader_batch_size: int Number of question-passage pairs in each forward
+        pass of the model.
+    return: List[Dict]
+    '''
+    predictions = [None] * len(questions_with_documents)
+
+    # The reader can't handle a question without documents, so those get an
+    # empty prediction, like Finder.get_answers gives them.
+    question_doc_list = []
+    batch_indices = []
+    for i, (question, documents) in enumerate(questions_with_documents):
+        if documents:
+            question_doc_list.append({'question': _BatchQuestion(question),
+                                      'docs': documents})
+            batch_indices.append(i)
+        else:
+            predictions[i] = {'question': question, 'answers': []}
+
+    if question_doc_list:
+        results = reader.predict_batch(question_doc_list,
+                                       top_k_per_question=top_k_reader,
+                                       batch_size=reader_batch_size)
+        for i, result in zip(batch_indices, results):
+            question, documents = questions_with_documents[i]
+            documents_by_id = {document.id: document
+                               for document in documents}
+            for answer in result['answers']:
+                document = documents_by_id.get(answer['document_id'])
+                answer['meta'] = ({} if document is None
+                                  else deepcopy(document.meta))
+            predictions[i] = {'question': question,
+                              'no_ans_gap': result['no_ans_gap'],
+                              'answers': result['answers']}
+    return predictions
+
+
+class BatchingFinder:
+    '''A replacement for haystack's Finder that groups concurrent questions
+    into one batch for the reader.
+
+    Each caller retrieves its documents in its own thread, then waits while a
+    single worker thread collects the questions that arrive within max_wait
+    seconds of the first one, up to max_batch_size of them. The worker runs
+    all of their question-passage pairs through the reader together, and hands
+    each caller its own prediction.'''
+
+    def __init__(self, retriever, reader, max_wait=0.01, max_batch_size=8,
+                 reader_batch_size=50):
+        '''Constructor
+
+        retriever: A haystack retriever.
+        reader: FARMReader
+        max_wait: float Most seconds to wait for more questions after the first
+            question of a batch arrives.
+        max_batch_size: int Most questions in a batch.
+        reader_batch_size: int Number of question-passage pairs in each
+            forward pass of the model.
+        '''
+        if max_batch_size < 1:
+            raise ValueError(
+                'max_batch_size must be at least 1, not {}.'.format(
+                    max_batch_size))
+        if max_wait < 0:
+            raise ValueError('max_wait must not be negative, not {}.'.format(
+                max_wait))
+        self.retriever = retriever
+        self.reader = reader
+        self.max_wait = max_wait
+        self.max_batch_size = max_batch_size
+        self.reader_batch_size = reader_batch_size
+        self.batch_count = 0
+        self.question_count = 0
+
+        self._requests = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def get_answers(self, question, top_k_reader=1, top_k_retriever=10):
+        '''Return answers for a question, in the same format as
+        Finder.get_answers.
+
+        question: str
+        top_k_reader: int Number of answers to return.
+        top_k_retriever: int Number of documents to retrieve.
+        return: Dict
+        '''
+        documents = self.retriever.retrieve(question, top_k=top_k_retriever)
+        return self.read(question, documents, top_k_reader)
+
+    def read(self, question, documents, top_k_reader=1):
+        '''Run the reader over documents already retrieved for a question,
+        batched with other questions, and return a prediction in the same
+        format as Finder.get_answers.
+
+        question: str
+        documents: List[Document]
+        top_k_reader: int Number of answers to return.
+        return: Dict
+        '''
+        return self.submit(question, documents, top_k_reader).result()
+
+    def submit(self, question, documents, top_k_reader=1):
+        '''Queue a question and the documents already retrieved for it for
+        the reader, without waiting for its prediction. Questions submitted
+        together are read in as few batches as max_batch_size allows.
+
+        question: str
+        documents: List[Document]
+        top_k_reader: int Number of answers to return.
+        return: Future The prediction, in the same format as
+            Finder.get_answers.
+        '''
+        request = _Request(question, documents, top_k_reader)
+        if not documents:
+            request.future.set_result({'question': question, 'answers': []})
+            return request.future
+
+        self._requests.put(request)
+        return request.future
+
+    def close(self):
+        '''Stop the worker thread, once the questions already waiting are
+        answered.'''
+        self._requests.put(None)
+        self._worker.join()
+
+    def after_fork(self):
+        '''Start a new worker thread in a process forked from the one that
+        made the finder. Only the thread that forked is copied into the new
+        process, so the worker isn't running there.'''
+        self._requests = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def _next_batch(self):
+        first = self._requests.get()
+        if first is None:
+            return None
+
+        batch = [first]
+        deadline = monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - monotonic()
+            try:
+                request = (self._requests.get(timeout=remaining)
+                           if remaining > 0 else self._requests.get_nowait())
+            except queue.Empty:
+                break
+            if request is None:
+                # Answer this batch before stopping.
+                self._requests.put(None)
+                break
+            batch.append(request)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self.batch_count += 1
+            self.question_count += len(batch)
+            start_time = monotonic()
+            for request in batch:
+                queue_wait_seconds.observe(start_time - request.queued_time,
+                                           queue='reader_batch')
+
+            try:
+                # The answers are sorted, so the top answers for a smaller
+                # top_k are the start of the answers for the largest.
+                predictions = predict_batch(
+                    self.reader,
+                    [(request.question, request.documents)
+                     for request in batch],
+                    max(request.top_k_reader for request in batch),
+                    self.reader_batch_size)
+            except Exception as e:
+                errors.inc(where='reader')
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+
+            for request, prediction in zip(batch, predictions):
+                prediction['answers'] = \
+                    prediction['answers'][:request.top_k_reader]
+                request.future.set_result(prediction)
@@ -0,0 +1,305 @@
+import json
+import os
+import re
+from collections import Counter
+
+import numpy as np
+
+from questionAnswering.answer_cache import file_hash
+from questionAnswering.chunking import article_passages
+
+# An inverted index of the articles with BM25 scoring, small enough to keep in
+# this process instead of in Elasticsearch. Each posting stores its whole BM25
+# weight for the term, so a search only adds up the postings of the terms in
+# the query.
+
+# Elasticsearch's defaults for BM25.
+default_k1 = 1.2
+default_b = 0.75
+
+token_pattern = re.compile(r'\w+')
+
+# Files in an index directory. The arrays are memory mapped when loaded.
+index_array_names = ['term_offsets', 'doc_ids', 'weights', 'text_offsets',
+                     'text', 'article_offsets']
+index_metadata_filename = 'index.json'
+
+
+def tokenize(text):
+    '''Split text into lowercase words, roughly like Elasticsearch's standard
+    analyzer.
+
+    text: str
+    return: List[str]
+    '''
+    return token_pattern.findall(text.lower())
+
+
+class BM25Index:
+    '''A BM25 index of a set of passages from articles. Without chunking,
+    each passage is a whole article.
+
+    The postings are stored in compressed sparse row form: the postings for
+    term i are doc_ids[term_offsets[i]:term_offsets[i + 1]], with their BM25
+    weights at the same positions in weights. Passage texts are stored as one
+    utf-8 array, split by text_offsets, and article_offsets holds the offset of
+    each passage in its article.'''
+
+    def __init__(self, terms, titles, arrays, source_hash='', chunking=None):
+        '''Constructor. Use build or load to make an index.
+
+        terms: List[str] The vocabulary, in the order of the postings.
+        titles: List[str] The article title of each passage.
+        arrays: Dict[str, np.ndarray] The arrays named in index_array_names.
+        source_hash: str A hash of the file the index was built from.
+        chunking: Optional[List] The chunk size and overlap the articles were
+            split with, see chunking.article_passages.
+        '''
+        self.terms = terms
+        self.term_ids = {term: i for i, term in enumerate(terms)}
+        self.titles = titles
+        self.source_hash = source_hash
+        self.chunking = chunking or [None, 1]
+        self.term_offsets = arrays['term_offsets']
+        self.doc_ids = arrays['doc_ids']
+        self.weights = arrays['weights']
+        self.text_offsets = arrays['text_offsets']
+        self.text = arrays['text']
+        self.article_offsets = arrays['article_offsets']
+
+    def __len__(self):
+        return len(self.titles)
+
+    @classmethod
+    def build(cls, articles, k1=default_k1, b=default_b, source_hash=''):
+        '''Build an index of whole articles.
+
+        articles: Dict[str, str] Article titles and texts.
+        k1: float
+        b: float
+        source_hash: str
+        return: BM25Index
+        '''
+        return cls.build_from_passages(article_passages(articles), k1, b,
+                                       source_hash)
+
+    @classmethod
+    def build_from_passages(cls, passages, k1=default_k1, b=default_b,
+                            source_hash='', chunking=None):
+        '''Build an index of passages.
+
+        passages: List[Dict] Passages as returned by
+            chunking.article_passages.
+        k1: float
+        b: float
+        source_hash: str
+        chunking: Optional[List] The chunk size and overlap used.
+        return: BM25Index
+        '''
+        titles = [passage['name'] for passage in passages]
+        texts = [passage['text'] for passage in passages]
+
+        term_counts = [Counter(tokenize(text)) for text in texts]
+        doc_lengths = np.array(
+            [sum(counts.values()) for counts in term_counts], dtype=np.float64)
+        average_length = doc_lengths.mean() if len(doc_lengths) else 0.0
+        # Scale from each document's length to its term frequency
+        # normalization, as in Lucene.
+        length_norms = k1 * (1 - b + b * doc_lengths / (average_length or 1))
+
+        postings = {}
+        for doc_id, counts in enumerate(term_counts):
+            for term, count in counts.items():
+                postings.setdefault(term, []).append((doc_id, count))
+
+        terms = sorted(postings)
+        term_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        doc_ids = []
+        weights = []
+        doc_count = len(titles)
+        for i, term in enumerate(terms):
+            term_postings = postings[term]
+            term_offsets[i + 1] = term_offsets[i] + len(term_postings)
+            idf = np.log(1 + (doc_count - len(term_postings) + 0.5) /
+                         (len(term_postings) + 0.5))
+            for doc_id, count in term_postings:
+                doc_ids.append(doc_id)
+                weights.append(idf * count * (k1 + 1) /
+                               (count + length_norms[doc_id]))
+
+        encoded_texts = [text.encode('utf-8') for text in texts]
+        text_offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        text_offsets[1:] = np.cumsum([len(text) for text in encoded_texts])
+
+        arrays = {'term_offsets': term_offsets,
+                  'doc_ids': np.array(doc_ids, dtype=np.int32),
+                  'weights': np.array(weights, dtype=np.float32),
+                  'text_offsets': text_offsets,
+                  'text': np.frombuffer(b''.join(encoded_texts),
+                                        dtype=np.uint8),
+                  'article_offsets': np.array(
+                      [passage.get('article_offset', 0)
+                       for passage in passages], dtype=np.int64)}
+        return cls(terms, titles, arrays, source_hash, chunking)
+
+    @classmethod
+    def build_from_file(cls, filepath, chunk_size=None, chunk_overlap=1):
+        '''Build an index of a json file of articles, like srd_articles.json.
+
+        filepath: str
+        chunk_size: Optional[int] See chunking.article_passages.
+        chunk_overlap: int
+        return: BM25Index
+        '''
+        with open(filepath) as f:
+            articles = json.load(f)
+        return cls.build_from_passages(
+            article_passages(articles, chunk_size, chunk_overlap),
+            source_hash=file_hash(filepath),
+            chunking=[chunk_size, chunk_overlap])
+
+    def save(self, directory):
+        '''Save the index as a directory of .npy files, and a json file with
+        the vocabulary and titles.
+
+        directory: str
+        '''
+        os.makedirs(directory, exist_ok=True)
+        arrays = {'term_offsets': self.term_offsets, 'doc_ids': self.doc_ids,
+                  'weights': self.weights, 'text_offsets': self.text_offsets,
+                  'text': self.text, 'article_offsets': self.article_offsets}
+        for name in index_array_names:
+            # Replace the file rather than writing over it, since an older
+            # index may still have it memory mapped.
+            filepath = os.path.join(directory, name + '.npy')
+            with open(filepath + '.tmp', 'wb') as f:
+                np.save(f, arrays[name])
+            os.replace(filepath + '.tmp', filepath)
+
+        # Written last, so a directory with this file has a complete index.
+        with open(os.path.join(directory, index_metadata_filename), 'w') as f:
+            json.dump({'source_hash': self.source_hash,
+                       'chunking': self.chunking, 'terms': self.terms,
+                       'titles': self.titles}, f)
+
+    @classmethod
+    def load(cls, directory):
+        '''Load a saved index, with the arrays memory mapped.
+
+        directory: str
+        return: BM25Index
+        '''
+        with open(os.path.join(directory, index_metadata_filename)) as f:
+            metadata = json.load(f)
+        arrays = {name: np.load(os.path.join(directory, name + '.npy'),
+                                mmap_mode='r')
+                  for name in index_array_names}
+        return cls(metadata['terms'], metadata['titles'], arrays,
+                   metadata['source_hash'], metadata['chunking'])
+
+    @classmethod
+    def load_or_build(cls, articles_filepath, directory, chunk_size=None,
+                      chunk_overlap=1):
+        '''Load the index saved in directory, unless it is missing, or was
+        built from a different version of the articles file or with different
+        chunking. In that case, build it again and save it.
+
+        articles_filepath: str
+        directory: str
+        chunk_size: Optional[int] See chunking.article_passages.
+        chunk_overlap: int
+        return: BM25Index
+        '''
+        metadata_filepath = os.path.join(directory, index_metadata_filename)
+        if os.path.exists(metadata_filepath):
+            try:
+                index = cls.load(directory)
+            except (KeyError, FileNotFoundError):
+                # Saved in an older format.
+                index = None
+            if (index is not None and
+                    index.source_hash == file_hash(articles_filepath) and
+                    index.chunking == [chunk_size, chunk_overlap]):
+                return index
+
+        print("Building BM25 index of '{}'.".format(articles_filepath))
+        if os.path.exists(metadata_filepath):
+            os.remove(metadata_filepath)
+        index = cls.build_from_file(articles_filepath, chunk_size,
+                                    chunk_overlap)
+        index.save(directory)
+        return index
+
+    def passage_text(self, doc_id):
+        '''Return the text of a passage.
+
+        doc_id: int
+        return: str
+        '''
+        start, end = self.text_offsets[doc_id], self.text_offsets[doc_id + 1]
+        return self.text[start:end].tobytes().decode('utf-8')
+
+    def search(self, query, top_k=10):
+        '''Return the top_k passages with the highest BM25 score for a query,
+        highest first. Passages without any of the query's words aren't
+        returned.
+
+        query: str
+        top_k: int
+        return: List[Tuple[int, float]] Passage indices and scores.
+        '''
+        scores = np.zeros(len(self.titles), dtype=np.float32)
+        for term in tokenize(query):
+            term_id = self.term_ids.get(term)
+            if term_id is None:
+                continue
+            start = self.term_offsets[term_id]
+            end = self.term_offsets[term_id + 1]
+            # An article appears once in each term's postings, so there are
+            # no repeated indices.
+            scores[self.doc_ids[start:end]] += self.weights[start:end]
+
+        matches = np.flatnonzero(scores)
+        if len(matches) > top_k:
+            matches = matches[np.argpartition(-scores[matches], top_k)[:top_k]]
+        # Ties are broken by article order.
+        matches = matches[np.lexsort((matches, -scores[matches]))]
+        return [(int(doc_id), float(scores[doc_id])) for doc_id in matches]
+
+
+class BM25Retriever:
+    '''A haystack retriever that searches a BM25Index.'''
+
+    def __init__(self, index):
+        '''Constructor
+
+        index: BM25Index
+        '''
+        self.index = index
+
+    def retrieve(self, query, filters=None, top_k=10, index=None):
+        '''Return the top_k passages for a query, as haystack Documents with
+        the article title in meta['name'] and the passage's offset in the
+        article in meta['article_offset'], like the documents SrdResponder
+        writes to Elasticsearch.
+
+        query: str
+        filters: Not supported, must be None.
+        top_k: int
+        index: Ignored. There is only one index.
+        return: List[Document]
+        '''
+        # Imported here, so the index can be built and searched without
+        # haystack.
+        from haystack import Document
+
+        if filters:
+            raise ValueError('BM25Retriever does not support filters.')
+
+        return [Document(id=str(doc_id),
+                         text=self.index.passage_text(doc_id),
+                         score=score,
+                         meta={'name': self.index.titles[doc_id],
+                               'article_offset': int(
+                                   self.index.article_offsets[doc_id])})
+                for doc_id, score in self.index.search(query, top_k)]
@@ -0,0 +1,93 @@
+import re
+
+# Split articles into passages for retrieval and reading. Articles from
+# generate_srd_articles have one paragraph per line, so passages are runs of
+# whole lines. Each passage keeps the title of its article, and the offset of
+# its first character in the article, so answer offsets can be mapped back to
+# the article.
+
+newline_pattern = re.compile('\n')
+
+
+def split_article(text, chunk_size, overlap=1):
+    '''Split an article into passages of whole paragraphs, each at most
+    chunk_size characters unless a single paragraph is longer. Consecutive
+    passages share their last and first overlap paragraphs.
+
+    Each passage is exactly text[offset:offset + len(passage)].
+
+    text: str
+    chunk_size: int Most characters in a passage.
+    overlap: int Number of paragraphs repeated at the start of the next
+        passage.
+    return: List[Tuple[int, str]] (offset, passage) pairs.
+    '''
+    if chunk_size < 1:
+        raise ValueError('chunk_size must be at least 1, not {}.'.format(
+            chunk_size))
+    if overlap < 0:
+        raise ValueError('overlap must not be negative, not {}.'.format(
+            overlap))
+
+    if not text:
+        return []
+
+    # The start of each paragraph, and the end of the text. A paragraph
+    # includes the newline after it.
+    starts = [0]
+    starts += [match.end() for match in newline_pattern.finditer(text)
+               if match.end() < len(text)]
+    starts.append(len(text))
+
+    paragraph_count = len(starts) - 1
+    passages = []
+    first = 0
+    while True:
+        last = first + 1
+        while (last < paragraph_count and
+               starts[last + 1] - starts[first] <= chunk_size):
+            last += 1
+        passages.append((starts[first], text[starts[first]:starts[last]]))
+        if last == paragraph_count:
+            return passages
+        # Always move forward, even if the overlap is the whole passage.
+        first = max(last - overlap, first + 1)
+
+
+def article_passages(articles, chunk_size=None, overlap=1):
+    '''Return the passages to index for a dictionary of articles, in the
+    format SrdResponder writes to the document store. Without a chunk_size,
+    each article is a single passage.
+
+    articles: Dict[str, str]
+    chunk_size: Optional[int] See split_article.
+    overlap: int See split_article.
+    return: List[Dict] With the article title as 'name', the passage as
+        'text', and the passage's offset in the article as 'article_offset'.
+    '''
+    if chunk_size is None:
+        return [{'name': title, 'text': text, 'article_offset': 0}
+                for title, text in articles.items()]
+
+    return [{'name': title, 'text': passage, 'article_offset': offset}
+            for title, text in articles.items()
+            for offset, passage in split_article(text, chunk_size, overlap)]
+
+
+def map_answers_to_articles(prediction):
+    '''Change the offset_start_in_doc and offset_end_in_doc of each answer
+    in a prediction from offsets in the passage to offsets in the article.
+    Answers from documents without an 'article_offset' are left as they are.
+
+    prediction: Dict A prediction in the format of Finder.get_answers, with
+        document metadata in each answer's 'meta'.
+    return: Dict The same prediction.
+    '''
+    for answer in prediction['answers']:
+        article_offset = (answer.get('meta') or {}).get('article_offset')
+        if not article_offset:
+            continue
+        for key in ['offset_start_in_doc', 'offset_end_in_doc']:
+            if answer.get(key) is not None:
+                answer[key] += article_offset
+    return prediction
@@ -7,3 +7,7 @@ generated_srd_filepath = os.path.join(data_filepath, 'srd_articles.json')
 # is a boolean for whether the model references a local file.
 #model_name_or_path = ('models/roberta-base-squad2-v2', True)
 model_name_or_path = ('deepset/roberta-base-squad2', False)
+
+# How the reader model runs, one of quantization.reader_inference_modes.
+# 'quantized' runs on the CPU with int8 weights, for machines without a GPU.
+reader_inference_mode = 'default'
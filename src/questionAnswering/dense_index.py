@@ -0,0 +1,267 @@
+import json
+import os
+
+import numpy as np
+
+from questionAnswering.answer_cache import file_hash, version_stamp
+from questionAnswering.chunking import article_passages
+
+# Dense passage embeddings of the articles, computed once and stored as a
+# matrix on disk, so the DensePassage retriever doesn't need Elasticsearch or
+# to embed every article on each start. Searching is an exact dot product
+# against the memory mapped matrix, which for a few thousand passages is
+# faster than an approximate index would be to build or to query.
+
+# The encoders and their settings. The index is versioned by these, so
+# changing any of them builds a new index.
+query_embedding_model = 'facebook/dpr-question_encoder-single-nq-base'
+passage_embedding_model = 'facebook/dpr-ctx_encoder-single-nq-base'
+max_seq_len_query = 64
+max_seq_len_passage = 256
+embed_title = True
+
+embedding_dtypes = ['float32', 'float16']
+embeddings_filename = 'embeddings.npy'
+index_metadata_filename = 'index.json'
+
+# Rows of a float16 matrix converted to float32 at a time when searching.
+search_block_size = 4096
+
+
+def load_encoder(use_gpu=True, batch_size=16):
+    '''Load the DPR question and passage encoders.
+
+    use_gpu: bool Use a GPU if there is one.
+    batch_size: int Number of passages to embed at once.
+    return: DensePassageRetriever Used only for its encoders, so it has no
+        document store.
+    '''
+    from haystack.retriever.dense import DensePassageRetriever
+
+    return DensePassageRetriever(
+        document_store=None,
+        query_embedding_model=query_embedding_model,
+        passage_embedding_model=passage_embedding_model,
+        max_seq_len_query=max_seq_len_query,
+        max_seq_len_passage=max_seq_len_passage,
+        batch_size=batch_size,
+        use_gpu=use_gpu,
+        embed_title=embed_title,
+        use_fast_tokenizers=True)
+
+
+def index_version(articles_filepath, chunk_size=None, chunk_overlap=1):
+    '''Return the version of the index for an articles file, made from the
+    file's contents, the chunking and the encoder settings.
+
+    articles_filepath: str
+    chunk_size: Optional[int] See chunking.article_passages.
+    chunk_overlap: int
+    return: str
+    '''
+    return version_stamp(query_embedding_model, passage_embedding_model,
+                         max_seq_len_query, max_seq_len_passage, embed_title,
+                         file_hash(articles_filepath), chunk_size,
+                         chunk_overlap)
+
+
+def passage_documents(passages):
+    '''Return passages as haystack Documents, with the passage's index as
+    its id, and the rest of the passage in meta.
+
+    passages: List[Dict] Passages as returned by chunking.article_passages.
+    return: List[Document]
+    '''
+    from haystack import Document
+
+    return [Document(id=str(doc_id), text=passage['text'],
+                     meta={key: value for key, value in passage.items()
+                           if key != 'text'})
+            for doc_id, passage in enumerate(passages)]
+
+
+class DenseIndex:
+    '''A matrix with one embedding per passage, and the article titles of
+    the passages in the same order. Without chunking, each passage is a whole
+    article.'''
+
+    def __init__(self, embeddings, titles, version=''):
+        '''Constructor
+
+        embeddings: np.ndarray Shape (number of passages, embedding size).
+        titles: List[str]
+        version: str See index_version.
+        '''
+        if len(embeddings) != len(titles):
+            raise ValueError(
+                'Expected one embedding for each of the {} titles, got {}.'
+                .format(len(titles), len(embeddings)))
+        self.embeddings = embeddings
+        self.titles = titles
+        self.version = version
+
+    def __len__(self):
+        return len(self.titles)
+
+    @classmethod
+    def build(cls, passages, encoder, dtype='float32', version=''):
+        '''Embed every passage.
+
+        passages: List[Dict] Passages as returned by
+            chunking.article_passages.
+        encoder: DensePassageRetriever
+        dtype: str One of embedding_dtypes.
+        version: str
+        return: DenseIndex
+        '''
+        if dtype not in embedding_dtypes:
+            raise ValueError("dtype '{}' not recognized. Must be in {}."
+                             .format(dtype, embedding_dtypes))
+        embeddings = np.asarray(encoder.embed_passages(
+            passage_documents(passages)), dtype=dtype)
+        return cls(embeddings, [passage['name'] for passage in passages],
+                   version)
+
+    def save(self, directory):
+        '''Save the embeddings as a .npy file, and the titles in a json file.
+
+        directory: str
+        '''
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, embeddings_filename), 'wb') as f:
+            np.save(f, self.embeddings)
+
+        # Written last, so a directory with this file has a complete index.
+        with open(os.path.join(directory, index_metadata_filename), 'w') as f:
+            json.dump({'version': self.version, 'titles': self.titles}, f)
+
+    @classmethod
+    def load(cls, directory):
+        '''Load a saved index, with the embeddings memory mapped.
+
+        directory: str
+        return: DenseIndex
+        '''
+        with open(os.path.join(directory, index_metadata_filename)) as f:
+            metadata = json.load(f)
+        embeddings = np.load(os.path.join(directory, embeddings_filename),
+                             mmap_mode='r')
+        return cls(embeddings, metadata['titles'], metadata['version'])
+
+    @staticmethod
+    def directory_for(index_directory, articles_filepath, dtype='float32',
+                      chunk_size=None, chunk_overlap=1):
+        '''Return the directory for the current version of the index.
+
+        index_directory: str The directory holding every version.
+        articles_filepath: str
+        dtype: str
+        chunk_size: Optional[int] See chunking.article_passages.
+        chunk_overlap: int
+        return: str
+        '''
+        return os.path.join(index_directory, '{}-{}'.format(
+            index_version(articles_filepath, chunk_size, chunk_overlap),
+            dtype))
+
+    @classmethod
+    def load_or_build(cls, index_directory, articles_filepath, encoder,
+                      dtype='float32', chunk_size=None, chunk_overlap=1):
+        '''Load the current version of the index, building and saving it
+        first if it doesn't exist yet.
+
+        index_directory: str The directory holding every version.
+        articles_filepath: str
+        encoder: DensePassageRetriever
+        dtype: str
+        chunk_size: Optional[int] See chunking.article_passages.
+        chunk_overlap: int
+        return: DenseIndex
+        '''
+        directory = cls.directory_for(index_directory, articles_filepath,
+                                      dtype, chunk_size, chunk_overlap)
+        if not os.path.exists(os.path.join(directory,
+                                           index_metadata_filename)):
+            print("Building dense index of '{}' in '{}'.".format(
+                articles_filepath, directory))
+            with open(articles_filepath) as f:
+                articles = json.load(f)
+            passages = article_passages(articles, chunk_size, chunk_overlap)
+            cls.build(passages, encoder, dtype,
+                      index_version(articles_filepath, chunk_size,
+                                    chunk_overlap)).save(directory)
+        return cls.load(directory)
+
+    def search(self, query_embedding, top_k=10):
+        '''Return the top_k passages with the largest dot product with a
+        query embedding, largest first.
+
+        query_embedding: np.ndarray
+        top_k: int
+        return: List[Tuple[int, float]] Passage indices and scores.
+        '''
+        if top_k < 1 or not len(self):
+            return []
+
+        query_embedding = np.asarray(query_embedding, dtype=np.float32)
+        if self.embeddings.dtype == np.float32:
+            scores = self.embeddings @ query_embedding
+        else:
+            # Half precision products are slow and lose precision, so the
+            # embeddings are converted a block at a time.
+            scores = np.concatenate([
+                self.embeddings[i:i + search_block_size].astype(np.float32)
+                @ query_embedding
+                for i in range(0, len(self), search_block_size)])
+
+        top_k = min(top_k, len(scores))
+        top_ids = np.argpartition(-scores, top_k - 1)[:top_k]
+        # Ties are broken by article order.
+        top_ids = top_ids[np.lexsort((top_ids, -scores[top_ids]))]
+        return [(int(doc_id), float(scores[doc_id])) for doc_id in top_ids]
+
+
+class DenseIndexRetriever:
+    '''A haystack retriever that embeds the query with the DPR question
+    encoder, and searches a DenseIndex.'''
+
+    def __init__(self, encoder, index, passages):
+        '''Constructor
+
+        encoder: DensePassageRetriever
+        index: DenseIndex
+        passages: List[Dict] The passages the index was built from, as
+            returned by chunking.article_passages.
+        '''
+        if len(passages) != len(index):
+            raise ValueError('The index has {} passages, but {} were given.'
+                             .format(len(index), len(passages)))
+        self.encoder = encoder
+        self.index = index
+        self.passages = passages
+
+    def retrieve(self, query, filters=None, top_k=10, index=None):
+        '''Return the top_k passages for a query, as haystack Documents with
+        the article title in meta['name'] and the passage's offset in the
+        article in meta['article_offset'].
+
+        query: str
+        filters: Not supported, must be None.
+        top_k: int
+        index: Ignored. There is only one index.
+        return: List[Document]
+        '''
+        from haystack import Document
+
+        if filters:
+            raise ValueError('DenseIndexRetriever does not support filters.')
+
+        query_embedding = self.encoder.embed_queries(texts=[query])[0]
+        documents = []
+        for doc_id, score in self.index.search(query_embedding, top_k):
+            passage = self.passages[doc_id]
+            documents.append(Document(
+                id=str(doc_id), text=passage['text'], score=score,
+                meta={key: value for key, value in passage.items()
+                      if key != 'text'}))
+        return documents
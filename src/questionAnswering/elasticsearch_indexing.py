@@ -0,0 +1,269 @@
+import hashlib
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+# Load passages into Elasticsearch with the bulk API: in chunks, several
+# chunks at a time, retrying the documents Elasticsearch rejects because it is
+# busy. Refreshing the index is turned off while loading, so Elasticsearch
+# doesn't make new segments searchable over and over, and is turned back on
+# once every document is in.
+
+# Bulk item statuses worth retrying: too many requests, and server errors.
+# Anything else, like a mapping error, would fail again.
+retryable_statuses = {429, 500, 502, 503, 504}
+
+
+def connect(host='localhost', port=9200, username='', password='',
+            timeout=30, pool_size=10):
+    '''Return an Elasticsearch client that keeps up to pool_size connections
+    open, so concurrent questions and bulk requests don't wait for one.
+
+    host: str
+    port: int
+    username: str
+    password: str
+    timeout: float Seconds before a request times out.
+    pool_size: int
+    return: Elasticsearch
+    '''
+    from elasticsearch import Elasticsearch
+
+    return Elasticsearch(hosts=[{'host': host, 'port': port}],
+                         http_auth=(username, password), timeout=timeout,
+                         maxsize=pool_size, retry_on_timeout=True)
+
+
+def passage_id(passage):
+    '''Return an id for a passage that is the same every time it is indexed,
+    so a chunk sent again after a timeout replaces its documents instead of
+    adding copies.
+
+    passage: Dict As returned by chunking.article_passages.
+    return: str
+    '''
+    key = json.dumps([passage['name'], passage.get('article_offset', 0)])
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def passage_actions(index, passages):
+    '''Return bulk index actions for passages, with their fields laid out
+    like haystack's ElasticsearchDocumentStore writes them.
+
+    index: str
+    passages: List[Dict] As returned by chunking.article_passages.
+    return: List[Dict]
+    '''
+    return [dict(passage, _op_type='index', _index=index,
+                 _id=passage_id(passage))
+            for passage in passages]
+
+
+def _bulk_body(actions):
+    body = []
+    for action in actions:
+        source = {key: value for key, value in action.items()
+                  if not key.startswith('_')}
+        body.append({action['_op_type']: {'_index': action['_index'],
+                                          '_id': action['_id']}})
+        body.append(source)
+    return body
+
+
+def _send_chunk(client, actions):
+    '''Send one bulk request, and return the actions to retry and the errors
+    that shouldn't be retried.
+
+    client: Elasticsearch
+    actions: List[Dict]
+    return: List[Dict], List[Dict]
+    '''
+    try:
+        response = client.bulk(body=_bulk_body(actions))
+    except Exception as e:
+        # The whole request failed, like a timeout or a lost connection.
+        print('Bulk request of {} documents failed: {!r}'.format(
+            len(actions), e))
+        return actions, []
+
+    if not response.get('errors'):
+        return [], []
+
+    retry = []
+    errors = []
+    for action, item in zip(actions, response['items']):
+        result = next(iter(item.values()))
+        status = result.get('status', 500)
+        if status < 300:
+            continue
+        if status in retryable_statuses:
+            retry.append(action)
+        else:
+            errors.append({'_id': action['_id'], 'status': status,
+                           'error': result.get('error')})
+    return retry, errors
+
+
+def bulk_index(client, actions, chunk_size=100, thread_count=4,
+               max_retries=3, backoff=0.5, sleep=time.sleep):
+    '''Send bulk index actions in chunks of chunk_size, thread_count chunks
+    at a time. Documents rejected with a retryable status, or in a chunk that
+    failed altogether, are sent again after waiting backoff seconds, doubling
+    each time, up to max_retries times.
+
+    client: Elasticsearch
+    actions: List[Dict] As returned by passage_actions.
+    chunk_size: int Documents in each bulk request.
+    thread_count: int Bulk requests sent at once.
+    max_retries: int
+    backoff: float Seconds to wait before the first retry.
+    sleep: Callable[[float], None]
+    return: int The number of documents indexed.
+    '''
+    if chunk_size < 1:
+        raise ValueError('chunk_size must be at least 1, not {}.'.format(
+            chunk_size))
+    if thread_count < 1:
+        raise ValueError('thread_count must be at least 1, not {}.'.format(
+            thread_count))
+
+    pending = list(actions)
+    errors = []
+    with ThreadPoolExecutor(max_workers=thread_count) as executor:
+        for attempt in range(max_retries + 1):
+            if attempt:
+                print('Retrying {} documents in {:.1f} seconds.'.format(
+                    len(pending), backoff))
+                sleep(backoff)
+                backoff *= 2
+
+            chunks = [pending[i:i + chunk_size]
+                      for i in range(0, len(pending), chunk_size)]
+            pending = []
+            for retry, chunk_errors in executor.map(
+                    lambda chunk: _send_chunk(client, chunk), chunks):
+                pending += retry
+                errors += chunk_errors
+            if not pending:
+                break
+
+    if errors or pending:
+        raise ValueError(
+            '{} documents could not be indexed, and {} still failed after {} '
+            'retries. First error: {}'.format(
+                len(errors), len(pending), max_retries,
+                errors[0] if errors else None))
+    return len(actions)
+
+
+@contextmanager
+def bulk_load_settings(client, index):
+    '''Turn off refreshing an index while bulk loading it. The refresh
+    interval is restored, and the index refreshed so the new documents can be
+    searched, when the block ends, even if loading failed.
+
+    client: Elasticsearch
+    index: str
+    '''
+    settings = client.indices.get_settings(index=index)
+    # None restores Elasticsearch's default, if the index didn't set one.
+    refresh_interval = (settings.get(index, {}).get('settings', {})
+                        .get('index', {}).get('refresh_interval'))
+
+    client.indices.put_settings(index=index,
+                                body={'index': {'refresh_interval': '-1'}})
+    try:
+        yield
+    finally:
+        client.indices.put_settings(
+            index=index, body={'index': {'refresh_interval': refresh_interval}})
+        client.indices.refresh(index=index)
+
+
+def index_passages(client, index, passages, chunk_size=100, thread_count=4,
+                   max_retries=3):
+    '''Bulk load passages into an existing index.
+
+    client: Elasticsearch
+    index: str
+    passages: List[Dict] As returned by chunking.article_passages.
+    chunk_size: int See bulk_index.
+    thread_count: int
+    max_retries: int
+    return: int The number of documents indexed.
+    '''
+    with bulk_load_settings(client, index):
+        return bulk_index(client, passage_actions(index, passages),
+                          chunk_size, thread_count, max_retries)
+
+
+def articles_alias(chunk_size=None, chunk_overlap=1):
+    '''Return the alias searched for the articles split into passages one
+    way. Chunked passages are kept in their own indices for each chunking, so
+    they don't mix with whole articles.
+
+    chunk_size: Optional[int] See chunking.article_passages.
+    chunk_overlap: int
+    return: str
+    '''
+    if chunk_size is None:
+        return 'document'
+    return 'document_chunks_{}_{}'.format(chunk_size, chunk_overlap)
+
+
+def versioned_index_name(alias, version):
+    '''Return the name of the index holding one version of the passages.
+    The alias points to whichever version is being searched.
+
+    alias: str
+    version: str See answer_cache.version_stamp.
+    return: str
+    '''
+    return '{}-{}'.format(alias, version)
+
+
+def aliased_indices(client, alias):
+    '''Return the indices an alias points to.
+
+    client: Elasticsearch
+    alias: str
+    return: List[str]
+    '''
+    if not client.indices.exists_alias(name=alias):
+        return []
+    return sorted(client.indices.get_alias(name=alias))
+
+
+def switch_alias(client, alias, index, keep_previous=True):
+    '''Point an alias at an index, in one atomic update, and delete the
+    versions it no longer needs. An index named like the alias, from before
+    indices were versioned, is replaced by the alias in the same update.
+
+    client: Elasticsearch
+    alias: str
+    index: str
+    keep_previous: bool Keep the index the alias pointed to before, so
+        searches already sent to it can finish, and so it can be switched
+        back to.
+    return: List[str] The indices deleted.
+    '''
+    previous = [name for name in aliased_indices(client, alias)
+                if name != index]
+    actions = [{'remove': {'index': name, 'alias': alias}}
+               for name in previous]
+    if (client.indices.exists(index=alias) and
+            not client.indices.exists_alias(name=alias)):
+        actions.append({'remove_index': {'index': alias}})
+    actions.append({'add': {'index': index, 'alias': alias}})
+    client.indices.update_aliases(body={'actions': actions})
+
+    keep = {index}
+    if keep_previous:
+        keep.update(previous)
+    stale = [name for name in
+             client.indices.get(index=versioned_index_name(alias, '*'))
+             if name not in keep]
+    for name in stale:
+        client.indices.delete(index=name)
+    return stale
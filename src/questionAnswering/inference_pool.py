@@ -0,0 +1,154 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from time import monotonic
+
+from questionAnswering.metrics import queue_wait_seconds
+
+
+class PoolFull(Exception):
+    '''Raised when every inference worker is busy and the queue is full.'''
+
+
+class InferenceTimeout(Exception):
+    '''Raised when a task isn't finished within the request timeout.'''
+
+
+class InferencePool:
+    '''A fixed number of worker threads that run inference tasks, with a
+    bounded queue in front of them.
+
+    A task submitted while the workers are busy waits in the queue. A task
+    submitted while the queue is full is refused straight away with
+    PoolFull, so a server can shed load instead of letting requests pile up.
+    A caller that stops waiting after the timeout gets InferenceTimeout, and
+    its task is dropped if it hadn't started.'''
+
+    def __init__(self, workers=2, queue_depth=16, timeout=30):
+        '''Constructor
+
+        workers: int Tasks run at once.
+        queue_depth: int Most tasks waiting for a worker.
+        timeout: Optional[float] Default seconds to wait for a task. None
+            waits until it finishes.
+        '''
+        if workers < 1:
+            raise ValueError('workers must be at least 1, not {}.'.format(
+                workers))
+        if queue_depth < 0:
+            raise ValueError('queue_depth must not be negative, not {}.'
+                             .format(queue_depth))
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.timeout = timeout
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='inference')
+
+    def _task_done(self, future):
+        with self._lock:
+            self.in_flight -= 1
+            if not future.cancelled():
+                self.completed += 1
+
+    @staticmethod
+    def _run_task(queued_time, function, args, kwargs):
+        queue_wait_seconds.observe(monotonic() - queued_time,
+                                   queue='inference_pool')
+        return function(*args, **kwargs)
+
+    def submit(self, function, *args, **kwargs):
+        '''Queue a task for the workers.
+
+        Raises PoolFull if the queue is full.
+
+        function: Callable
+        return: concurrent.futures.Future
+        '''
+        with self._lock:
+            if self.in_flight >= self.workers + self.queue_depth:
+                self.rejected += 1
+                raise PoolFull('{} tasks are running or waiting.'.format(
+                    self.in_flight))
+            self.in_flight += 1
+        try:
+            future = self._executor.submit(self._run_task, monotonic(),
+                                           function, args, kwargs)
+        except Exception:
+            with self._lock:
+                self.in_flight -= 1
+            raise
+        future.add_done_callback(self._task_done)
+        return future
+
+    def abandon(self, future, timeout):
+        '''Drop a task its caller stopped waiting for, and count it as timed
+        out. A task that hasn't started is dropped. One that has keeps its
+        worker until it finishes.
+
+        future: concurrent.futures.Future As returned by submit.
+        timeout: float The seconds waited.
+        return: InferenceTimeout For the caller to raise.
+        '''
+        future.cancel()
+        with self._lock:
+            self.timed_out += 1
+        return InferenceTimeout('No result after {} seconds.'.format(timeout))
+
+    def call(self, function, *args, timeout=None, **kwargs):
+        '''Run a task on a worker, and wait for its result.
+
+        Raises PoolFull if the queue is full, and InferenceTimeout if the
+        task doesn't finish in time.
+
+        function: Callable
+        timeout: Optional[float] Seconds to wait. None uses the pool's.
+        return: What the function returns.
+        '''
+        timeout = self.timeout if timeout is None else timeout
+        future = self.submit(function, *args, **kwargs)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            raise self.abandon(future, timeout) from None
+
+    async def run(self, function, *args, timeout=None, **kwargs):
+        '''Run a task on a worker, and wait for its result without blocking
+        the event loop.
+
+        Raises PoolFull if the queue is full, and InferenceTimeout if the
+        task doesn't finish in time.
+
+        function: Callable
+        timeout: Optional[float] Seconds to wait. None uses the pool's.
+        return: What the function returns.
+        '''
+        timeout = self.timeout if timeout is None else timeout
+        future = self.submit(function, *args, **kwargs)
+        try:
+            # Shielded, so the timeout cancels the task below, where it is
+            # counted, rather than through the asyncio future.
+            return await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(future)), timeout)
+        except asyncio.TimeoutError:
+            raise self.abandon(future, timeout) from None
+
+    def stats(self):
+        '''Return the pool's size, how busy it is, and how many tasks were
+        refused or timed out.
+
+        return: Dict
+        '''
+        with self._lock:
+            return {'workers': self.workers, 'queue_depth': self.queue_depth,
+                    'in_flight': self.in_flight, 'completed': self.completed,
+                    'rejected': self.rejected, 'timed_out': self.timed_out}
+
+    def close(self):
+        '''Stop the workers once the tasks already queued are done.'''
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,327 @@
+import re
+import threading
+from bisect import bisect_left
+from time import monotonic
+
+# Count and time what answering a question involves, and report it in the
+# Prometheus text format, served at /metrics. Recording a value takes a lock
+# and a few additions. With the registry turned off it returns straight away,
+# and timers don't read the clock.
+#
+# Each process keeps its own metrics, so under the pre-fork server a scrape
+# reports the worker that answered it.
+
+# Upper bounds, in seconds, of the latency histograms' buckets.
+latency_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0, 30.0)
+
+# Upper bounds of the buckets for the documents and words the reader reads in
+# one pass.
+document_buckets = (1, 2, 5, 10, 20, 50, 100, 200)
+word_buckets = (100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000)
+
+
+def _label_text(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\')
+                         .replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in pairs) + '}'
+
+
+class Registry:
+    '''The metrics of a process, which can all be turned off at once.'''
+
+    def __init__(self, enabled=True):
+        '''Constructor
+
+        enabled: bool Record values. When False, recording does nothing.
+        '''
+        self.enabled = enabled
+        self._metrics = []
+
+    def counter(self, name, help, labelnames=()):
+        '''Make a counter, and report it with this registry.
+
+        return: Counter
+        '''
+        counter = Counter(self, name, help, labelnames)
+        self._metrics.append(counter)
+        return counter
+
+    def histogram(self, name, help, labelnames=(), buckets=latency_buckets):
+        '''Make a histogram, and report it with this registry.
+
+        return: Histogram
+        '''
+        histogram = Histogram(self, name, help, labelnames, buckets)
+        self._metrics.append(histogram)
+        return histogram
+
+    def render(self):
+        '''Return every metric in the Prometheus text format.
+
+        return: str
+        '''
+        return ''.join(metric.render() for metric in self._metrics)
+
+    def reset(self):
+        '''Forget every value recorded.'''
+        for metric in self._metrics:
+            metric.reset()
+
+
+class _Metric:
+
+    type = None
+
+    def __init__(self, registry, name, help, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError('{} needs labels {}, not {}.'.format(
+                self.name, list(self.labelnames), sorted(labels)))
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _header(self):
+        return '# HELP {} {}\n# TYPE {} {}\n'.format(self.name, self.help,
+                                                     self.name, self.type)
+
+
+class Counter(_Metric):
+    '''A count that only goes up, for each combination of labels.'''
+
+    type = 'counter'
+
+    def reset(self):
+        with self._lock:
+            self._values = {}
+
+    def inc(self, amount=1, **labels):
+        '''Add to the count.
+
+        amount: float
+        labels: str A value for each of the counter's label names.
+        '''
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return self._header() + ''.join(
+            '{}{} {}\n'.format(self.name,
+                               _label_text(zip(self.labelnames, key)), value)
+            for key, value in values)
+
+
+class _Timer:
+    '''Observes the seconds its block took in a histogram.'''
+
+    __slots__ = ('histogram', 'labels', 'start_time')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start_time = monotonic()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(monotonic() - self.start_time, **self.labels)
+
+
+class _NoTimer:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_no_timer = _NoTimer()
+
+
+class Histogram(_Metric):
+    '''Counts of values in buckets, with their sum, for each combination of
+    labels.'''
+
+    type = 'histogram'
+
+    def __init__(self, registry, name, help, labelnames=(),
+                 buckets=latency_buckets):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(registry, name, help, labelnames)
+
+    def reset(self):
+        with self._lock:
+            # For each key, the count in each bucket, the last for values
+            # above every bucket, and the sum of the values.
+            self._values = {}
+
+    def observe(self, value, **labels):
+        '''Record a value.
+
+        value: float
+        labels: str A value for each of the histogram's label names.
+        '''
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(
+                key, ([0] * (len(self.buckets) + 1), 0))
+            counts[bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def time(self, **labels):
+        '''Return a context manager that observes the seconds its block
+        takes, even if it raises.
+
+        labels: str A value for each of the histogram's label names.
+        '''
+        if not self.registry.enabled:
+            return _no_timer
+        return _Timer(self, labels)
+
+    def totals(self, **labels):
+        '''Return the number of values recorded with some labels, and their
+        sum.
+
+        return: Tuple[int, float]
+        '''
+        with self._lock:
+            counts, total = self._values.get(self._key(labels), ([0], 0))
+            return sum(counts), total
+
+    def render(self):
+        with self._lock:
+            values = sorted((key, (list(counts), total))
+                            for key, (counts, total) in self._values.items())
+        lines = [self._header()]
+        for key, (counts, total) in values:
+            pairs = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append('{}_bucket{} {}\n'.format(
+                    self.name, _label_text(pairs + [('le', bound)]),
+                    cumulative))
+            lines.append('{}_sum{} {}\n'.format(self.name, _label_text(pairs),
+                                                total))
+            lines.append('{}_count{} {}\n'.format(
+                self.name, _label_text(pairs), cumulative))
+        return ''.join(lines)
+
+
+_sample_pattern = re.compile(r'^(\w+?)(_sum|_count)(\{.*\})? (\S+)$')
+
+
+def histogram_totals(text, name):
+    '''Read the count and sum of each of a histogram's label combinations
+    from metrics in the Prometheus text format.
+
+    text: str As returned by Registry.render.
+    name: str The histogram's name.
+    return: Dict[str, List[float]] The count and sum, by the labels as they
+        are written, like 'stage="reader"'.
+    '''
+    totals = {}
+    for line in text.splitlines():
+        match = _sample_pattern.match(line)
+        if match is None or match.group(1) != name:
+            continue
+        labels = (match.group(3) or '{}')[1:-1]
+        index = 0 if match.group(2) == '_count' else 1
+        totals.setdefault(labels, [0, 0.0])[index] = float(match.group(4))
+    return totals
+
+
+registry = Registry()
+
+# The stages of answering a question: 'retrieval', 'reader',
+# 'postprocessing', like mapping offsets and formatting answers, and
+# 'serialization' of the response.
+stage_seconds = registry.histogram(
+    'crows_stage_seconds', 'Seconds spent in each stage of answering.',
+    ['stage'])
+request_seconds = registry.histogram(
+    'crows_request_seconds', 'Seconds to respond to each request.',
+    ['route', 'status'])
+# 'reader_batch', questions waiting for the batching finder's worker, and
+# 'inference_pool', requests waiting for an ASGI inference thread.
+queue_wait_seconds = registry.histogram(
+    'crows_queue_wait_seconds', 'Seconds waited for a worker.', ['queue'])
+reader_documents = registry.histogram(
+    'crows_reader_documents', 'Documents read in each reader pass.',
+    buckets=document_buckets)
+# Words of the question and passage, for each document read. The reader's
+# tokens are a little more than its words.
+reader_words = registry.histogram(
+    'crows_reader_words', 'Words read in each reader pass.',
+    buckets=word_buckets)
+answer_cache_lookups = registry.counter(
+    'crows_answer_cache_lookups_total', 'Answer cache lookups, by result.',
+    ['result'])
+errors = registry.counter(
+    'crows_errors_total', 'Errors, by where they happened.', ['where'])
+
+
+class TimedReader:
+    '''Wraps a haystack reader, to record how long each pass takes and how
+    much it reads. Everything else is passed through to the reader.'''
+
+    def __init__(self, reader):
+        '''Constructor
+
+        reader: FARMReader
+        '''
+        self.reader = reader
+
+    def __getattr__(self, name):
+        return getattr(self.reader, name)
+
+    @staticmethod
+    def _record_read(questions_with_documents):
+        if not registry.enabled:
+            return
+        document_count = word_count = 0
+        for question, documents in questions_with_documents:
+            question_words = len(question.split())
+            document_count += len(documents)
+            word_count += sum(question_words + len(document.text.split())
+                              for document in documents)
+        reader_documents.observe(document_count)
+        reader_words.observe(word_count)
+
+    def predict(self, question, documents, top_k=None):
+        self._record_read([(question, documents)])
+        with stage_seconds.time(stage='reader'):
+            return self.reader.predict(question=question, documents=documents,
+                                       top_k=top_k)
+
+    def predict_batch(self, question_doc_list, top_k_per_question=None,
+                      batch_size=None):
+        # The questions are label-like objects, see batching._BatchQuestion.
+        self._record_read([(item['question'].question, item['docs'])
+                           for item in question_doc_list])
+        with stage_seconds.time(stage='reader'):
+            return self.reader.predict_batch(
+                question_doc_list, top_k_per_question=top_k_per_question,
+                batch_size=batch_size)
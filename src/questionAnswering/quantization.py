@@ -0,0 +1,55 @@
+import os
+
+# Run the reader on the CPU with dynamic int8 quantization. The weights of the
+# model's linear layers are stored as int8, a quarter of their size, and
+# activations are quantized on the fly, so the matrix multiplications that
+# take most of the reader's time use int8 arithmetic.
+
+# 'default' runs the model as it was saved, on a GPU if use_gpu is set and
+# there is one. 'quantized' always runs on the CPU.
+reader_inference_modes = ['default', 'quantized']
+
+
+def quantized_model_filepath(cached_model_path):
+    '''Return where the quantized weights of a cached model are saved.
+
+    cached_model_path: str The directory of the saved model.
+    return: str
+    '''
+    return cached_model_path.rstrip(os.sep) + '--int8.pt'
+
+
+def quantize_reader(reader, cache_filepath=None):
+    '''Quantize a reader's model in place, for CPU inference.
+
+    The quantized weights are saved to cache_filepath the first time, and
+    loaded from there afterwards, so every process serves the same weights.
+
+    reader: FARMReader Loaded with use_gpu=False.
+    cache_filepath: Optional[str] An absolute path. None doesn't save the
+        quantized weights.
+    return: FARMReader The same reader.
+    '''
+    import torch
+
+    model = torch.quantization.quantize_dynamic(
+        reader.inferencer.model, {torch.nn.Linear}, dtype=torch.qint8,
+        inplace=True)
+
+    if cache_filepath is not None:
+        if os.path.exists(cache_filepath):
+            print("Loading quantized reader weights from '{}'.".format(
+                cache_filepath))
+            model.load_state_dict(torch.load(cache_filepath,
+                                             map_location='cpu'))
+        else:
+            # Save to a temporary file first, so an interrupted save is never
+            # mistaken for saved weights.
+            torch.save(model.state_dict(), cache_filepath + '.tmp')
+            os.replace(cache_filepath + '.tmp', cache_filepath)
+            print("Saved quantized reader weights to '{}'.".format(
+                cache_filepath))
+
+    model.eval()
+    reader.inferencer.model = model
+    return reader
@@ -0,0 +1,136 @@
+import json
+import os
+import threading
+import traceback
+from time import monotonic
+
+from questionAnswering.metrics import stage_seconds
+
+# Swap the articles a running responder searches for a newly built version,
+# without restarting it. The new version is built and warmed up while the old
+# one keeps answering questions, and questions switch to it all at once.
+
+
+class SwitchableRetriever:
+    '''A haystack retriever that passes each query to another retriever,
+    which can be switched for a new one while questions are being
+    answered. Each query uses either the old or the new retriever, never
+    a mix.'''
+
+    def __init__(self, retriever):
+        '''Constructor
+
+        retriever: A haystack retriever.
+        '''
+        self.retriever = retriever
+
+    def retrieve(self, query, filters=None, top_k=10, index=None):
+        with stage_seconds.time(stage='retrieval'):
+            return self.retriever.retrieve(query, filters=filters,
+                                           top_k=top_k, index=index)
+
+    def switch(self, retriever):
+        '''Send later queries to a new retriever.
+
+        retriever: A haystack retriever.
+        return: The retriever switched from.
+        '''
+        previous, self.retriever = self.retriever, retriever
+        return previous
+
+
+def read_warm_up_questions(benchmark_filepath):
+    '''Return the questions in a SQuAD benchmark file, or none if there isn't
+    one.
+
+    benchmark_filepath: str
+    return: List[str]
+    '''
+    if not os.path.exists(benchmark_filepath):
+        return []
+    with open(benchmark_filepath) as f:
+        squad_benchmark = json.load(f)
+    return [qas['question']
+            for article in squad_benchmark['data']
+            for paragraph in article['paragraphs']
+            for qas in paragraph['qas']]
+
+
+class BackgroundJob:
+    '''Runs a task on a background thread when asked to, at most one run at
+    a time, and reports how the latest run went.'''
+
+    def __init__(self, task):
+        '''Constructor
+
+        task: Callable[[Callable[[str], None]], Any] It is passed a function
+            to call with the name of each stage as it starts.
+        '''
+        self.task = task
+        self.stage = 'not started'
+        self.error = None
+        self.runs = 0
+        self._start_time = None
+        self._duration = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        '''Start a run, unless one is already running.
+
+        return: bool Whether a run was started.
+        '''
+        with self._lock:
+            if self.running:
+                return False
+            self.runs += 1
+            self.stage = 'starting'
+            self.error = None
+            self._start_time = monotonic()
+            self._duration = None
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+            return True
+
+    def wait(self, timeout=None):
+        '''Wait for the current run to finish.
+
+        timeout: Optional[float] Most seconds to wait.
+        '''
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _set_stage(self, stage):
+        print('Reindexing: {}.'.format(stage))
+        self.stage = stage
+
+    def _run(self):
+        try:
+            self.task(self._set_stage)
+        except Exception as e:
+            self.error = '{}: {}'.format(type(e).__name__, e)
+            self.stage = 'failed'
+            traceback.print_exc()
+        else:
+            self.stage = 'finished'
+        self._duration = monotonic() - self._start_time
+
+    def status(self):
+        '''Return the stage of the latest run, how long it took or has taken
+        so far, and its error if it failed.
+
+        return: Dict
+        '''
+        status = {'running': self.running, 'stage': self.stage,
+                  'runs': self.runs}
+        if self._duration is not None:
+            status['seconds'] = self._duration
+        elif self._start_time is not None:
+            status['seconds'] = monotonic() - self._start_time
+        if self.error is not None:
+            status['error'] = self.error
+        return status
@@ -0,0 +1,112 @@
+import threading
+import traceback
+from time import monotonic
+
+
+class ResponderNotReady(Exception):
+    '''Raised when the responder is asked for before it has finished loading,
+    or after loading it failed.'''
+
+    def __init__(self, status):
+        '''Constructor
+
+        status: Dict The loader's status, see ResponderLoader.status.
+        '''
+        super().__init__('Responder is not ready: {}.'.format(
+            status.get('error') or status['stage']))
+        self.status = status
+
+
+class ResponderLoader:
+    '''Builds a responder on a background thread, so a server can start
+    taking requests straight away and report when it is ready.
+
+    Errors while loading, including import errors, are recorded and reported
+    through status() instead of being raised.'''
+
+    def __init__(self, factory):
+        '''Constructor
+
+        factory: Callable[[Callable[[str], None]], Any] Builds the responder.
+            It is passed a function to call with the name of each stage of
+            loading as it starts.
+        '''
+        self.factory = factory
+        self.stage = 'not started'
+        self.error = None
+        self._responder = None
+        self._start_time = None
+        self._load_duration = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        '''Start loading on a background thread, unless already started.
+
+        return: ResponderLoader self
+        '''
+        with self._lock:
+            if self._thread is None:
+                self._start_time = monotonic()
+                self.stage = 'starting'
+                self._thread = threading.Thread(target=self._load,
+                                                daemon=True)
+                self._thread.start()
+        return self
+
+    def _set_stage(self, stage):
+        print('Loading responder: {}.'.format(stage))
+        self.stage = stage
+
+    def _load(self):
+        try:
+            responder = self.factory(self._set_stage)
+        except Exception as e:
+            self.error = '{}: {}'.format(type(e).__name__, e)
+            self.stage = 'failed'
+            traceback.print_exc()
+        else:
+            self._responder = responder
+            self.stage = 'ready'
+        self._load_duration = monotonic() - self._start_time
+
+    def wait(self, timeout=None):
+        '''Wait until loading finishes, and return whether the responder is
+        ready.
+
+        timeout: Optional[float] Most seconds to wait.
+        return: bool
+        '''
+        self.start()
+        self._thread.join(timeout)
+        return self.ready
+
+    @property
+    def ready(self):
+        return self._responder is not None
+
+    def status(self):
+        '''Return the loading stage, how long loading has taken so far, and
+        the error if loading failed.
+
+        return: Dict
+        '''
+        status = {'ready': self.ready, 'stage': self.stage}
+        if self._load_duration is not None:
+            status['load_seconds'] = self._load_duration
+        elif self._start_time is not None:
+            status['load_seconds'] = monotonic() - self._start_time
+        if self.error is not None:
+            status['error'] = self.error
+        return status
+
+    def get(self):
+        '''Return the responder.
+
+        Raises ResponderNotReady if it is still loading, or failed to load.
+
+        return: Any
+        '''
+        if self._responder is None:
+            raise ResponderNotReady(self.status())
+        return self._responder
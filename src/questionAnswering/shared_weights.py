@@ -0,0 +1,135 @@
+import inspect
+import os
+
+# Share model weights between processes on the same machine. Weights loaded
+# from a memory mapped file live in the page cache, which every process
+# mapping the file shares, instead of in each process's private memory. Pre-
+# forked workers share weights loaded before the fork in the same way, until
+# a worker writes to them, which inference never does.
+
+
+def weights_filepath(model_path):
+    '''Return where the memory mappable weights of a saved model are kept.
+
+    model_path: str The directory of the saved model.
+    return: str
+    '''
+    return model_path.rstrip(os.sep) + '--weights.pt'
+
+
+def supports_mmap():
+    '''Return whether this version of torch can memory map saved weights,
+    and load them into a model without copying them.
+
+    return: bool
+    '''
+    import torch
+
+    return ('mmap' in inspect.signature(torch.load).parameters and
+            'assign' in inspect.signature(
+                torch.nn.Module.load_state_dict).parameters)
+
+
+def map_model_weights(model, filepath):
+    '''Replace a model's weights with ones memory mapped from a file. The
+    weights are saved to the file first if it doesn't exist.
+
+    model: torch.nn.Module On the CPU.
+    filepath: str
+    return: bool Whether the weights are memory mapped. They aren't with a
+        version of torch that can't.
+    '''
+    import torch
+
+    if not supports_mmap():
+        print('torch {} cannot memory map weights, so they are loaded into '
+              'memory.'.format(torch.__version__))
+        return False
+
+    if not os.path.exists(filepath):
+        # Save to a temporary file first, so an interrupted save is never
+        # mistaken for saved weights.
+        torch.save(model.state_dict(), filepath + '.tmp')
+        os.replace(filepath + '.tmp', filepath)
+        print("Saved weights to '{}'.".format(filepath))
+
+    state_dict = torch.load(filepath, map_location='cpu', mmap=True,
+                            weights_only=True)
+    model.load_state_dict(state_dict, assign=True)
+    return True
+
+
+def memory_usage(pid='self'):
+    '''Return a process's memory use in megabytes. rss counts every page the
+    process has in memory, shared or not. pss splits each shared page between
+    the processes sharing it, so adding up the pss of every worker gives the
+    memory they use together. shared is the part of rss other processes map
+    too.
+
+    pid: Union[int, str] A process id, or 'self'.
+    return: Dict[str, float] Only rss where /proc has no smaps_rollup.
+    '''
+    fields = {}
+    smaps_filepath = '/proc/{}/smaps_rollup'.format(pid)
+    if os.path.exists(smaps_filepath):
+        with open(smaps_filepath) as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+        return {'rss_mb': fields.get('Rss', 0.0),
+                'pss_mb': fields.get('Pss', 0.0),
+                'shared_mb': (fields.get('Shared_Clean', 0.0) +
+                              fields.get('Shared_Dirty', 0.0))}
+
+    with open('/proc/{}/status'.format(pid)) as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return {'rss_mb': int(line.split()[1]) / 1024}
+    return {}
+
+
+def child_pids(pid):
+    '''Return the ids of a process's children, like a pre-fork server's
+    workers.
+
+    pid: int
+    return: List[int]
+    '''
+    children = []
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open('/proc/{}/stat'.format(name)) as f:
+                stat = f.read()
+        except OSError:
+            # The process exited.
+            continue
+        # The command name, in brackets, may contain spaces, so the fields
+        # are counted from after it. The parent id is the second.
+        if int(stat.rsplit(')', 1)[1].split()[1]) == pid:
+            children.append(int(name))
+    return sorted(children)
+
+
+def memory_report(pids):
+    '''Return the memory use of several processes, and their totals. The
+    total pss is the memory they use together, with shared pages counted
+    once, and the total rss is what they would use if nothing were shared.
+
+    pids: List[int] Processes that have exited are left out.
+    return: Dict
+    '''
+    processes = {}
+    for pid in pids:
+        try:
+            processes[str(pid)] = memory_usage(pid)
+        except OSError:
+            continue
+    report = {'processes': processes}
+    for field in ['rss_mb', 'pss_mb']:
+        if all(field in usage for usage in processes.values()):
+            report['total_' + field] = sum(usage[field]
+                                           for usage in processes.values())
+    return report
@@ -0,0 +1,59 @@
+from questionAnswering.chunking import map_answers_to_articles
+
+# Answer a question a few documents at a time, and report the best answers
+# found so far after each step, so the first answers can be shown while the
+# reader is still reading the rest of the documents.
+
+
+def stream_answers(retriever, read, question, top_k_reader=5,
+                   top_k_retriever=10, step=3):
+    '''Read the documents retrieved for a question, the best one first, then
+    step at a time, and yield the best answers found so far after each read.
+
+    Reader scores don't depend on the other documents read with a passage,
+    so the last prediction yielded has the same answers that reading every
+    document at once would give.
+
+    retriever: A haystack retriever.
+    read: Callable[[str, List[Document], int], Dict] Takes a question,
+        documents and the number of answers, and returns a prediction like
+        adaptive_reading.read_documents does.
+    question: str
+    top_k_reader: int Number of answers in each prediction.
+    top_k_retriever: int Number of documents to retrieve.
+    step: int Number of documents read at a time after the first.
+    return: Iterator[Tuple[Dict, int]] Each prediction so far, in the format
+        of Finder.get_answers with offsets in the whole article, and the
+        number of documents still to read. The last has 0 still to read.
+    '''
+    if step < 1:
+        raise ValueError('step must be at least 1, not {}.'.format(step))
+
+    documents = retriever.retrieve(question, top_k=top_k_retriever)
+    if not documents:
+        yield {'question': question, 'answers': []}, 0
+        return
+    # Best first, as in AdaptiveFinder. The sort is stable for ties.
+    documents = sorted(documents, key=lambda document:
+                       -(document.score or 0.0))
+
+    answers = []
+    no_ans_gaps = []
+    read_count = 0
+    while read_count < len(documents):
+        size = 1 if read_count == 0 else step
+        step_prediction = read(question,
+                               documents[read_count:read_count + size],
+                               top_k_reader)
+        # Mapped once, as each step's answers arrive.
+        answers += map_answers_to_articles(step_prediction)['answers']
+        if 'no_ans_gap' in step_prediction:
+            no_ans_gaps.append(step_prediction['no_ans_gap'])
+        read_count = min(read_count + size, len(documents))
+
+        answers.sort(key=lambda answer: answer['score'], reverse=True)
+        answers = answers[:top_k_reader]
+        prediction = {'question': question, 'answers': list(answers)}
+        if no_ans_gaps:
+            prediction['no_ans_gap'] = max(no_ans_gaps)
+        yield prediction, len(documents) - read_count
@@ -0,0 +1,125 @@
+import json
+import os
+import re
+
+# Rules for splitting the SRD into articles, as a json file of
+#     [ [<condition for a higher-font title>, <list of lower-font headers to split on> ], ... ]
+# where the condition and each header are a [regex pattern, font size] pair.
+# Rules for other SRD versions can be kept in their own files.
+default_rules_filepath = os.path.join(os.path.dirname(__file__), 'rules',
+                                      'srd_5_1.json')
+
+
+class ArticleRules:
+    '''Compiled rules for starting a new article. A rule applies while a
+    matching title is open, and makes any text matching one of its headers
+    the start of a new article.'''
+
+    def __init__(self, rules):
+        '''Constructor
+
+        rules: List[List] Rules in the format described for
+            default_rules_filepath.
+        '''
+        # Index the rules by the font size of the title they apply to, so only
+        # the conditions for titles of that size are checked.
+        self._rules_by_title_size = {}
+        for (title_pattern, title_size), headers in rules:
+            compiled_headers = [(re.compile(pattern), size)
+                                for pattern, size in headers]
+            self._rules_by_title_size.setdefault(title_size, []).append(
+                (re.compile(title_pattern), compiled_headers))
+
+    @classmethod
+    def from_file(cls, filepath=default_rules_filepath):
+        '''Load rules from a json file.
+
+        filepath: str
+        return: ArticleRules
+        '''
+        with open(filepath) as f:
+            return cls(json.load(f))
+
+    def headers_for_title(self, title, size):
+        '''Return the headers that start a new article while the given title
+        is open.
+
+        title: str
+        size: int The font size of the title.
+        return: List[Tuple[Pattern, int]]
+        '''
+        headers = []
+        for title_pattern, title_headers in self._rules_by_title_size.get(
+                size, []):
+            if title_pattern.match(title):
+                headers += title_headers
+        return headers
+
+
+class TitleStack:
+    '''The titles with a larger font than the current text, sorted by font
+    size in descending order, along with the headers their rules split on.
+
+    The headers for the open titles are indexed by font size whenever the
+    stack changes, so checking a piece of text is a single lookup.'''
+
+    def __init__(self, rules, title, size):
+        '''Constructor
+
+        rules: ArticleRules
+        title: str The first open title.
+        size: int The font size of the first title.
+        '''
+        self.rules = rules
+        self.reset(title, size)
+
+    def __len__(self):
+        return len(self._titles)
+
+    def smallest_size(self):
+        '''Return the font size of the most recently opened title.
+
+        return: int
+        '''
+        return self._titles[-1][1]
+
+    def reset(self, title, size):
+        '''Replace all open titles with the given title.
+
+        title: str
+        size: int
+        '''
+        self._titles = []
+        self.push(title, size)
+
+    def push(self, title, size):
+        '''Open a new title.
+
+        title: str
+        size: int
+        '''
+        self._titles.append(
+            (title, size, self.rules.headers_for_title(title, size)))
+        self._index_headers()
+
+    def pop(self):
+        '''Close the most recently opened title.'''
+        self._titles.pop()
+        self._index_headers()
+
+    def _index_headers(self):
+        self._headers_by_size = {}
+        for _, _, headers in self._titles:
+            for pattern, size in headers:
+                self._headers_by_size.setdefault(size, []).append(pattern)
+
+    def starts_article(self, formatted_text):
+        '''Check if a piece of text matches a rule for one of the open titles.
+
+        formatted_text: FormattedText
+        return: bool
+        '''
+        patterns = self._headers_by_size.get(formatted_text.size)
+        if not patterns:
+            return False
+        return any(pattern.match(formatted_text.text) for pattern in patterns)
@@ -0,0 +1,187 @@
+import json
+import os
+
+from questionAnswering.chunking import article_passages
+from questionAnswering.elasticsearch_indexing import (bulk_index,
+                                                      bulk_load_settings,
+                                                      passage_actions,
+                                                      switch_alias)
+
+# Destinations for the articles yielded by parse_rules.iter_srd_articles. A
+# sink receives one (title, text) pair at a time, so apart from JsonArticleSink,
+# which has to build the whole dictionary, no sink holds more than one article
+# (or one batch of passages) in memory.
+
+
+class ArticleSink:
+    '''Base class for article destinations. Subclasses implement write, and
+    close if they hold resources. Sinks can be used as context managers, and
+    are closed on exit.'''
+
+    def write(self, title, text):
+        '''Handle one article.
+
+        title: str
+        text: str
+        '''
+        raise NotImplementedError
+
+    def close(self):
+        '''Finish writing. Called once, after the last article.'''
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+class JsonArticleSink(ArticleSink):
+    '''Writes the articles as a single json object mapping titles to text,
+    the format of srd_articles.json. The object is written on close, to a
+    temporary file that then replaces the file. If a title comes up more than
+    once, the last article with that title is kept.'''
+
+    def __init__(self, filepath):
+        '''Constructor
+
+        filepath: str
+        '''
+        self.filepath = filepath
+        self.articles = {}
+
+    def write(self, title, text):
+        self.articles[title] = text
+
+    def close(self):
+        with open(self.filepath + '.tmp', 'w') as f:
+            json.dump(self.articles, f)
+        os.replace(self.filepath + '.tmp', self.filepath)
+
+
+class JsonLinesArticleSink(ArticleSink):
+    '''Writes each article as soon as it arrives, as a json object with
+    'title' and 'text' keys on its own line. Every article is written, so
+    readers that want the articles by title should keep the last one for each
+    title, as JsonArticleSink does.
+
+    The lines go to a temporary file, which replaces the file on close, so a
+    run that fails part way leaves the previous file as it was.'''
+
+    def __init__(self, filepath):
+        '''Constructor
+
+        filepath: str
+        '''
+        self.filepath = filepath
+        self._file = open(filepath + '.tmp', 'w')
+
+    def write(self, title, text):
+        self._file.write(json.dumps({'title': title, 'text': text}) + '\n')
+
+    def close(self):
+        self._file.close()
+        os.replace(self.filepath + '.tmp', self.filepath)
+
+
+class ElasticsearchArticleSink(ArticleSink):
+    '''Indexes the articles into a new Elasticsearch index while they are
+    parsed, split into passages the way SrdResponder splits them, and points
+    the alias at the index on close. Passages are sent in bulk requests of
+    batch_size, with the same stable ids SrdResponder gives them.
+
+    Articles can't be taken back once sent, so only the first article with a
+    title is indexed, and later ones with the same title are skipped.
+    JsonArticleSink keeps the last instead.'''
+
+    def __init__(self, client, alias, index, create_index=None,
+                 chunk_size=None, chunk_overlap=1, batch_size=100,
+                 thread_count=4, max_retries=3):
+        '''Constructor
+
+        client: Elasticsearch
+        alias: str The alias searched, see
+            elasticsearch_indexing.articles_alias.
+        index: str A new index for these articles, see
+            elasticsearch_indexing.versioned_index_name.
+        create_index: Optional[Callable[[str], None]] Creates the index, with
+            the mapping it is searched with. None if it exists already.
+        chunk_size: Optional[int] See chunking.article_passages.
+        chunk_overlap: int
+        batch_size: int Passages in each bulk request.
+        thread_count: int See elasticsearch_indexing.bulk_index.
+        max_retries: int
+        '''
+        if batch_size < 1:
+            raise ValueError('batch_size must be at least 1, not {}.'.format(
+                batch_size))
+        self.client = client
+        self.alias = alias
+        self.index = index
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.batch_size = batch_size
+        self.thread_count = thread_count
+        self.max_retries = max_retries
+        self.documents_written = 0
+        self.skipped_titles = []
+        self._titles = set()
+        self._batch = []
+
+        if create_index is not None:
+            create_index(index)
+        # Refreshing stays off until close, so an index left by a failed run
+        # isn't searchable, and is never switched to.
+        self._load_settings = bulk_load_settings(client, index)
+        self._load_settings.__enter__()
+
+    def write(self, title, text):
+        if title in self._titles:
+            self.skipped_titles.append(title)
+            return
+        self._titles.add(title)
+        self._batch += article_passages({title: text}, self.chunk_size,
+                                        self.chunk_overlap)
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        '''Send the passages received since the last batch.'''
+        if self._batch:
+            self.documents_written += bulk_index(
+                self.client, passage_actions(self.index, self._batch),
+                self.batch_size, self.thread_count, self.max_retries)
+            self._batch = []
+
+    def close(self):
+        self.flush()
+        self._load_settings.__exit__(None, None, None)
+        switch_alias(self.client, self.alias, self.index)
+        if self.skipped_titles:
+            print('Indexed the first of repeated articles {}.'.format(
+                sorted(set(self.skipped_titles))))
+        print("Indexed {} passages into '{}', and switched '{}' to it."
+              .format(self.documents_written, self.index, self.alias))
+
+
+def write_articles(articles, sinks):
+    '''Pass each article to every sink, then close the sinks.
+
+    articles: Iterable[Tuple[str, str]] (title, text) pairs, as yielded by
+        iter_srd_articles.
+    sinks: List[ArticleSink]
+    return: int The number of articles written.
+    '''
+    count = 0
+    for title, text in articles:
+        for sink in sinks:
+            sink.write(title, text)
+        count += 1
+
+    # Not closed if parsing fails part way, so an existing json file isn't
+    # replaced with a partial one.
+    for sink in sinks:
+        sink.close()
+    return count
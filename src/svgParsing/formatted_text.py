@@ -1,20 +1,26 @@
 import os
 import re
+import sys
+import threading
 import xml.etree.ElementTree as ET
-from nltk import download as nltk_download
-from nltk.corpus import words as nltk_words
+from array import array
+from collections.abc import MutableSequence
+from functools import lru_cache
+from itertools import islice
 from svgParsing.config import svg_directory
-
-nltk_download('words')
+from svgParsing.lexicon import Lexicon
 
 xml_namespace = {'svg': '{http://www.w3.org/2000/svg}'}
 
-nltk_words_set = set(nltk_words.words())
+
+# The packaged word list, built by bin/build_lexicon.py. Opened on the first
+# call to is_english_word.
+english_words = Lexicon()
 
 def is_english_word(string):
     if len(string) == 1 and string not in ['a', 'i']:
         return False
-    return string.lower() in nltk_words_set
+    return string.lower() in english_words
 
 def parse_svg_tag(element):
     '''Elements from SVG files have tags that look like
@@ -24,57 +30,130 @@ def parse_svg_tag(element):
 
 
 def traverse_element_tree(root_element):
-    '''For preorder traversal.
+    '''For preorder traversal. Uses an explicit stack, so deeply nested
+    groups don't hit the recursion limit.
 
     element: Element
     '''
-    yield root_element
-    for child in root_element:
-        yield from traverse_element_tree(child)
+    stack = [root_element]
+    while stack:
+        element = stack.pop()
+        yield element
+        stack.extend(reversed(list(element)))
 
 
-def svg_to_text(filename):
-    '''Given an SVG filename representing a page of the 5e SRD, return a list
-    of objects with text from the file.
+def iter_text_pieces(filepath):
+    '''Stream the pieces of text inside the top-level group of an SVG file, in
+    document order, without building the whole ElementTree.
 
-    filename: str
-    return: List[FormattedText]
+    Each text element is turned into a FormattedText once it is complete
+    (including its tspan children), and is removed from the partial tree
+    afterwards, so memory use doesn't grow with the size of the page. Text
+    elements with no text are skipped.
+
+    filepath: str
+    return: Iterator[FormattedText]
+    '''
+    group_tag = xml_namespace['svg'] + 'g'
+    open_elements = []
+    top_g = None
+    text_depth = 0
+
+    for event, element in ET.iterparse(filepath, events=('start', 'end')):
+        is_text = element.tag.endswith('}text') or element.tag == 'text'
+        if event == 'start':
+            if (top_g is None and len(open_elements) == 1 and
+                    element.tag == group_tag):
+                top_g = element
+            text_depth += is_text
+            open_elements.append(element)
+            continue
+
+        open_elements.pop()
+        if is_text:
+            text_depth -= 1
+            # Parsing stops when the top group ends, so any text seen after it
+            # starts is inside it. The element's values are read before it is
+            # yielded, since it is cleared when parsing resumes.
+            if top_g is not None:
+                text = FormattedText.from_text_element(element)
+                if text:
+                    yield text
+
+        if element is top_g:
+            # Only the first group is read, the rest of the file is ignored.
+            return
+
+        # Children of a text element are needed until the text element is
+        # finished. Everything else can be dropped as soon as it ends.
+        if open_elements and text_depth == 0:
+            element.clear()
+            open_elements[-1].remove(element)
+
+
+def merge_runs(text_objects):
+    '''Merge consecutive FormattedText objects that should be merged, as
+    they arrive.
+
+    text_objects: Iterable[FormattedText]
+    return: Iterator[FormattedText]
     '''
-    tree = ET.parse(os.path.join(svg_directory, filename))
-    root = tree.getroot()
-    top_g = root.find(xml_namespace['svg'] + 'g')
-
-    gen = traverse_element_tree(top_g)
-    text_list = []
-    for element in gen:
-        if parse_svg_tag(element) == 'text':
-            # The method to create a FormattedText object returns None if there
-            # is no text.
-            text_object = FormattedText.from_text_element(element)
-            if text_object:
-                text_list.append(text_object)
-
-    merged_text_list = []
-    merge_text = text_list[0]
-    for text in text_list[1:]:
-        if merge_text.should_merge(text):
-            merge_text = merge_text.merge(text)
+    builder = None
+    for text in text_objects:
+        if builder is None:
+            builder = TextRunBuilder(text)
+        elif builder.should_merge(text):
+            builder.add(text)
         else:
-            merged_text_list.append(merge_text)
-            merge_text = text
-    merged_text_list.append(merge_text)
-
-    # Strip the footer and page number
-    if ('Permission granted' in merged_text_list[0].text and
-            'System Reference Document' in merged_text_list[2].text):
-        if len(merged_text_list) == 2:
-            # In case there is a blank page
-            merged_text_list = []
-        merged_text_list = merged_text_list[3:]
+            yield builder.build()
+            builder = TextRunBuilder(text)
+    if builder is not None:
+        yield builder.build()
+
+
+def strip_footer(text_objects):
+    '''Drop the footer and page number, which are the first three merged
+    pieces of text on a page.
+
+    text_objects: Iterable[FormattedText]
+    return: Iterator[FormattedText]
+    '''
+    text_objects = iter(text_objects)
+    first_texts = list(islice(text_objects, 3))
+
+    if (len(first_texts) == 3 and
+            'Permission granted' in first_texts[0].text and
+            'System Reference Document' in first_texts[2].text):
+        first_texts = []
 
     # else:
     #    raise ValueError('Page found with no footer, this is unexpected.')
-    return merged_text_list
+    yield from first_texts
+    yield from text_objects
+
+
+def iter_svg_text(filename):
+    '''Given an SVG filename representing a page of the 5e SRD, stream the
+    merged objects with text from the file.
+
+    filename: str
+    return: Iterator[FormattedText]
+    '''
+    text_objects = iter_text_pieces(os.path.join(svg_directory, filename))
+    return strip_footer(merge_runs(text_objects))
+
+
+def svg_to_text(filename, compact=False):
+    '''Given an SVG filename representing a page of the 5e SRD, return a list
+    of objects with text from the file.
+
+    filename: str
+    compact: bool Return a CompactPage instead of a list.
+    return: Union[List[FormattedText], CompactPage]
+    '''
+    if compact:
+        return CompactPage(iter_svg_text(filename))
+    return list(iter_svg_text(filename))
 
 
 def merge_pages(page_1, page_2):
@@ -82,29 +161,145 @@ def merge_pages(page_1, page_2):
     the first list should be combined with the first element of the second
     list.
 
+    page_1 is extended in place and returned, so folding many pages together
+    doesn't copy the list for every page.
+
     page_1: List[FormattedText]
     page_2: List[FormattedText]
     return: List[FormattedText]
     '''
-    if not page_1 or not page_2:
-        merged = page_1 + page_2
+    if page_1 and page_2 and page_1[-1].should_merge(page_2[0]):
+        page_1[-1] = page_1[-1].merge(page_2[0])
+        page_1.extend(islice(page_2, 1, None))
+
+    else:
+        page_1.extend(page_2)
+
+    return page_1
+
+
+def stitch_pages(pages):
+    '''Stream the FormattedText objects from a sequence of pages, merging the
+    last object on each page with the first object on the next page when they
+    should be merged. Gives the same objects as folding the pages together
+    with merge_pages, without keeping them all in a list.
+
+    pages: Iterable[List[FormattedText]]
+    return: Iterator[FormattedText]
+    '''
+    # The last object seen so far is held back, since it might be merged with
+    # the start of the next page.
+    pending = None
+    for page in pages:
+        if not page:
+            continue
+
+        if pending is None:
+            pending = page[0]
+        elif pending.should_merge(page[0]):
+            pending = pending.merge(page[0])
+        else:
+            yield pending
+            pending = page[0]
+
+        if len(page) > 1:
+            yield pending
+            yield from islice(page, 1, len(page) - 1)
+            pending = page[-1]
+
+    if pending is not None:
+        yield pending
+
+
+# The same word boundaries come up again and again across the SRD, so join
+# decisions are cached. Call join_decision.cache_info() for hit and miss counts.
+join_cache_size = 2**16
+
+
+@lru_cache(maxsize=join_cache_size)
+def join_decision(last_word, first_word, bold, italic, other_bold,
+                  other_italic):
+    '''Decide how to join two non-empty pieces of text with the same font size
+    and color.
+
+    Sometimes one piece of text ends with a word, and the next piece starts the
+    next word, and there is no space in between. Other times, one piece of text
+    ends midway through a word, and the next one finishes the word.
+
+    The decision only depends on the last word of the first piece and the
+    first word of the second piece (split on spaces, so either can be empty),
+    and on their formatting.
+
+    last_word: str
+    first_word: str
+    bold, italic: bool Formatting of the first piece.
+    other_bold, other_italic: bool Formatting of the second piece.
+    return: Tuple[bool, bool, bool] Whether to put a space between the pieces,
+        and the bold and italic formatting of the joined text.
+    '''
+    # Add a space between the two pieces to join if the first ends with a
+    # lowercase letter (and no newline) and the next starts with an
+    # uppercase letter.
+    use_space = False
+
+    first_tail = last_word[-1] if last_word else ' '
+    second_head = first_word[0] if first_word else ' '
+    use_bold = False
+    use_italic = False
+
+    either_side_false = [' ', '-', '\n', '\t']
+
+    if (first_tail in either_side_false + ['('] or
+            second_head in either_side_false + [')', '.']):
+        use_space = False
 
-    elif page_1[-1].should_merge(page_2[0]):
-        # Protection if page 2 is a list with only one FormattedText item.
-        if len(page_2) == 1:
-            rest_of_page_2 = []
+    elif bold != other_bold or italic != other_italic:
+        # When a non-bold phrase has a bold phrase merged onto the end, the
+        # merged phrase needs to be marked as bold so that the subsequent
+        # phrase will get a space before it.
+        use_space = True
+        use_bold = other_bold
+        use_italic = other_italic
+
+    elif first_tail.isalpha() and second_head.isalpha():
+        if first_tail.islower() and second_head.isupper():
+            use_space = True
+        elif len(last_word) >= 2 and last_word[-2].isupper() and first_tail.isupper():
+            use_space = True
         else:
-            rest_of_page_2 = page_2[1:]
-        merged = page_1[:-1] + [page_1[-1].merge(page_2[0])] + rest_of_page_2
+            # If the combined 'word' across the two pieces of text is in a
+            # standard English dictionary, then let them be combined.
+            if not first_word[-1].isalpha():
+                # If the second piece of text ends in punctuation, remove
+                # that character.
+                first_word = first_word[:-1]
+
+            if (is_english_word(last_word + first_word) or
+                not is_english_word(last_word) or
+                not is_english_word(first_word)):
+                # Useful for checking the behavior of ntlk for word
+                # splitting.
+                #print('<{:15}|{:15}>'.format(last_word, first_word))
+                use_space = False
+            else:
+                #print(' '*30 + '<{:15}|{:15}>'.format(last_word, first_word))
+                use_space = True
+
+    elif first_tail in ['.', ':']:
+        use_space = True
 
     else:
-        merged = page_1 + page_2
+        use_space = True
 
-    return merged
+    return use_space, use_bold, use_italic
 
 
 class FormattedText:
 
+    # The SRD is read as hundreds of thousands of these objects, so they don't
+    # get a per-instance __dict__.
+    __slots__ = ('text', 'color', 'size', 'bold', 'italic')
+
     def __init__(self, text, color, size, bold=False, italic=False):
         '''Constructor
 
@@ -114,7 +309,10 @@ class FormattedText:
         '''
 
         self.text = text
-        self.color = color
+        # The SRD only uses a handful of colors. Interning them means every
+        # object shares one string per color, and comparing colors is usually
+        # an identity check.
+        self.color = sys.intern(color)
         self.size = size
         self.bold = bold
         self.italic = italic
@@ -188,113 +386,232 @@ class FormattedText:
         Note: bold and italic formatting will be lost with the current
         implementation of this method.
 
+        To merge more than two objects, use a TextRunBuilder, which doesn't
+        copy the text for every merge.
+
         other_element: Element
         return: FormattedText
         '''
+        builder = TextRunBuilder(self)
+        builder.add(other_element)
+        return builder.build()
+
+    def to_tuple(self):
+        '''Return the attributes of this object as a tuple, for storing it as
+        json.
+
+        return: Tuple[str, str, int, bool, bool]
+        '''
+        return (self.text, self.color, self.size, self.bold, self.italic)
+
+    @classmethod
+    def from_tuple(cls, values):
+        '''Inverse of to_tuple.
+
+        values: Sequence, as returned by to_tuple
+        return: FormattedText
+        '''
+        return cls(*values)
 
-        if (self.size != other_element.size or
-                self.color != other_element.color):
+    @staticmethod
+    def fix_text(text):
+        '''Apply hard-coded rules to clean up text (address tabs and newlines)
+
+        text: str
+        return: str'''
+
+        if text == '\t':
+            return ''
+        else:
+            return text.replace('\t', ' ')
+
+    def __repr__(self):
+
+        return '<{}> <{}> {}'.format(self.color, self.size, repr(self.text))
+
+
+class TextRunBuilder:
+    '''Merges a run of FormattedText objects with the same font size and
+    color, giving the same text as merging them one by one with
+    FormattedText.merge.
+
+    The pieces of text and spaces are collected in a list, and joined once when
+    the merged object is built, so merging a long run takes linear time.'''
+
+    __slots__ = ('_first', '_pieces', '_last_word', '_is_empty', 'color',
+                 'size', 'bold', 'italic')
+
+    def __init__(self, first):
+        '''Constructor
+
+        first: FormattedText The start of the run.
+        '''
+        self._first = first
+        self._pieces = [first.text]
+        self._last_word = first.text.rpartition(' ')[2]
+        self._is_empty = first.text == ''
+        self.color = first.color
+        self.size = first.size
+        self.bold = first.bold
+        self.italic = first.italic
+
+    def should_merge(self, other_element):
+        '''Same as FormattedText.should_merge, for the run so far.
+
+        other_element: FormattedText
+        return: bool
+        '''
+        return (self.size == other_element.size and
+                self.color == other_element.color)
+
+    def add(self, other_element):
+        '''Add a piece of text to the end of the run.
+
+        other_element: FormattedText
+        '''
+        if not self.should_merge(other_element):
             raise ValueError(
                 ("Cannot merge provided text '{}' and '{}', different font "
-                 "size or color.").format(self.text, other_element.text))
-
-        # Sometimes one piece of text ends with a word, and the next piece
-        # starts the next word, and there is no space in between. Other times,
-        # one piece of text ends midway through a word, and the next one
-        # finishes the word.
-        # Add a space between the two pieces to join if the first ends with a
-        # lowercase letter (and no newline) and the next starts with an
-        # uppercase letter.
-        if self.text == '' or other_element.text == '':
+                 "size or color.").format(''.join(self._pieces),
+                                          other_element.text))
+
+        other_text = other_element.text
+        if self._is_empty or other_text == '':
             # If a bold/italic phrase is merged with an empty text string, then
             # the bold/italic formatting should be kept, so that space will be
             # added before the following word.
-            return FormattedText(self.text + other_element.text,
-                                 self.color,
-                                 self.size,
-                                 (self.bold or other_element.bold),
-                                 (self.italic or other_element.italic))
+            self.bold = self.bold or other_element.bold
+            self.italic = self.italic or other_element.italic
+            if other_text:
+                self._pieces.append(other_text)
+                self._last_word = other_text.rpartition(' ')[2]
+                self._is_empty = False
+            return
+
+        use_space, self.bold, self.italic = join_decision(
+            self._last_word, other_text.partition(' ')[0], self.bold,
+            self.italic, other_element.bold, other_element.italic)
 
-        use_space = False
+        if use_space:
+            self._pieces.append(' ')
+        self._pieces.append(other_text)
 
-        first_tail = self.text[-1]
-        second_head = other_element.text[0]
-        use_bold = False
-        use_italic = False
+        if ' ' in other_text:
+            self._last_word = other_text.rpartition(' ')[2]
+        elif use_space:
+            self._last_word = other_text
+        else:
+            self._last_word += other_text
 
-        either_side_false = [' ', '-', '\n', '\t']
+    def build(self):
+        '''Return the merged FormattedText object.
 
-        if (first_tail in either_side_false + ['('] or
-                second_head in either_side_false + [')', '.']):
-            use_space = False
+        return: FormattedText
+        '''
+        if len(self._pieces) == 1 and (self.bold, self.italic) == (
+                self._first.bold, self._first.italic):
+            return self._first
+        return FormattedText(''.join(self._pieces), self.color, self.size,
+                             self.bold, self.italic)
 
-        elif (self.bold != other_element.bold or
-                self.italic != other_element.italic):
-            # When a non-bold phrase has a bold phrase merged onto the end, the
-            # merged phrase needs to be marked as bold so that the subsequent
-            # phrase will get a space before it.
-            use_space = True
-            use_bold = other_element.bold
-            use_italic = other_element.italic
 
-        elif first_tail.isalpha() and second_head.isalpha():
-            if first_tail.islower() and second_head.isupper():
-                use_space = True
-            elif (len(self.text) >= 2 and self.text[-2].isupper() and
-                    first_tail.isupper()):
-                use_space = True
-            else:
-                # If the combined 'word' across the two pieces of text is in a
-                # standard English dictionary, then let them be combined.
-                last_word_of_self = self.text.split(' ')[-1]
-                first_word_of_other = other_element.text.split(' ')[0]
-
-                if not first_word_of_other[-1].isalpha():
-                    # If the second piece of text ends in punctuation, remove
-                    # that character.
-                    first_word_of_other = first_word_of_other[:-1]
-
-                if (is_english_word(last_word_of_self + first_word_of_other) or
-                    not is_english_word(last_word_of_self) or
-                    not is_english_word(first_word_of_other)):
-                    # Useful for checking the behavior of ntlk for word
-                    # splitting.
-                    #print('<{:15}|{:15}>'.format(last_word_of_self, first_word_of_other))
-                    use_space = False
-                else:
-                    space_string = ' '*30
-                    #print(space_string + '<{:15}|{:15}>'.format(last_word_of_self, first_word_of_other))
-                    use_space = True
-
-        elif first_tail in ['.', ':']:
-            use_space = True
+# Every color used by a CompactPage in this process, and the id of each. The
+# SRD only uses a handful, so the ids fit in two bytes.
+_colors = []
+_color_ids = {}
+_colors_lock = threading.Lock()
 
-        else:
-            use_space = True
 
-        if use_space:
-            new_text = self.text + ' ' + other_element.text
-        else:
-            new_text = self.text + other_element.text
+def _color_id(color):
+    color_id = _color_ids.get(color)
+    if color_id is None:
+        with _colors_lock:
+            color_id = _color_ids.get(color)
+            if color_id is None:
+                color_id = _color_ids[color] = len(_colors)
+                _colors.append(sys.intern(color))
+    return color_id
 
-        return FormattedText(new_text,
-                             self.color,
-                             self.size,
-                             use_bold,
-                             use_italic)
 
-    @staticmethod
-    def fix_text(text):
-        '''Apply hard-coded rules to clean up text (address tabs and newlines)
+class CompactPage(MutableSequence):
+    '''The FormattedText objects of a page, stored in columns instead of as
+    objects: the texts in a list, and the color ids, font sizes and bold and
+    italic flags in arrays, with the colors in a table shared by every page.
 
-        text: str
-        return: str'''
+    It is a mutable sequence of FormattedText, so merge_pages, stitch_pages and
+    the page cache work on it as they do on a list. Objects are made when an
+    item is read, and only the columns are kept.'''
 
-        if text == '\t':
-            return ''
-        else:
-            return text.replace('\t', ' ')
+    __slots__ = ('_texts', '_color_ids', '_sizes', '_flags')
+
+    def __init__(self, texts=()):
+        '''Constructor
+
+        texts: Iterable[FormattedText]
+        '''
+        self._texts = []
+        self._color_ids = array('H')
+        self._sizes = array('I')
+        self._flags = array('B')
+        self.extend(texts)
+
+    @staticmethod
+    def _columns(text):
+        return (_color_id(text.color), text.size,
+                text.bold | (text.italic << 1))
+
+    def __len__(self):
+        return len(self._texts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return CompactPage(self[i]
+                               for i in range(*index.indices(len(self))))
+        flags = self._flags[index]
+        return FormattedText(self._texts[index],
+                             _colors[self._color_ids[index]],
+                             self._sizes[index], bool(flags & 1),
+                             bool(flags & 2))
+
+    def __iter__(self):
+        for i in range(len(self._texts)):
+            yield self[i]
+
+    def __setitem__(self, index, text):
+        if isinstance(index, slice):
+            raise TypeError('CompactPage does not support slice assignment.')
+        self._texts[index] = text.text
+        (self._color_ids[index], self._sizes[index],
+         self._flags[index]) = self._columns(text)
+
+    def __delitem__(self, index):
+        for column in [self._texts, self._color_ids, self._sizes,
+                       self._flags]:
+            del column[index]
+
+    def insert(self, index, text):
+        color_id, size, flags = self._columns(text)
+        self._texts.insert(index, text.text)
+        self._color_ids.insert(index, color_id)
+        self._sizes.insert(index, size)
+        self._flags.insert(index, flags)
+
+    def append(self, text):
+        color_id, size, flags = self._columns(text)
+        self._texts.append(text.text)
+        self._color_ids.append(color_id)
+        self._sizes.append(size)
+        self._flags.append(flags)
+
+    def __reduce__(self):
+        # Color ids are only meaningful in this process, so pages are sent to
+        # other processes with their colors.
+        return (_compact_page_from_tuples,
+                ([text.to_tuple() for text in self],))
 
     def __repr__(self):
+        return 'CompactPage({!r})'.format(list(self))
 
-        return '<{}> <{}> {}'.format(self.color, self.size, repr(self.text))
+
+def _compact_page_from_tuples(values):
+    return CompactPage(FormattedText.from_tuple(value) for value in values)
@@ -0,0 +1,89 @@
+import mmap
+import os
+
+# The word list shipped with the package, built by bin/build_lexicon.py.
+default_lexicon_filepath = os.path.join(os.path.dirname(__file__), 'data',
+                                        'english_words.txt')
+
+
+class Lexicon:
+    '''A set of lowercase words, stored on disk as a sorted list with one word
+    per line. Lookups are a binary search over a memory map of the file, so
+    nothing is read into memory up front.
+
+    The file is only opened on the first lookup, and a missing file is an
+    error then. A small word list can be given instead of a file, which is
+    kept in memory.'''
+
+    def __init__(self, filepath=default_lexicon_filepath, words=None):
+        '''Constructor
+
+        filepath: Optional[str] Ignored if words are given.
+        words: Optional[Iterable[str]] Words to keep in memory instead of
+            reading a file. As with write, only lowercase words are kept.
+        '''
+        self._words_map = None
+        self._word_set = None
+        if words is not None:
+            filepath = None
+            self._word_set = {word for word in words
+                              if word and word == word.lower()}
+        self.filepath = filepath
+
+    @staticmethod
+    def write(words, filepath):
+        '''Write a word list file that a Lexicon can read.
+
+        Only words that are already lowercase are kept, since lookups are made
+        with lowercase strings.
+
+        words: Iterable[str]
+        filepath: str
+        '''
+        encoded_words = sorted({word.encode('utf-8') for word in words
+                                if word and word == word.lower()})
+        os.makedirs(os.path.dirname(os.path.abspath(filepath)), exist_ok=True)
+        with open(filepath, 'wb') as f:
+            f.write(b''.join(word + b'\n' for word in encoded_words))
+
+    def _load(self):
+        if self._words_map is not None or self._word_set is not None:
+            return
+
+        if not os.path.exists(self.filepath):
+            raise FileNotFoundError(
+                "Word list '{}' not found. Build it with "
+                "bin/build_lexicon.py.".format(self.filepath))
+
+        if os.path.getsize(self.filepath) == 0:
+            self._words_map = b''
+            return
+
+        with open(self.filepath, 'rb') as f:
+            self._words_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __contains__(self, word):
+        self._load()
+        if self._word_set is not None:
+            return word in self._word_set
+
+        key = word.encode('utf-8')
+        if not key or b'\n' in key:
+            return False
+
+        # Binary search over the lines of the file. low and high always point
+        # at the start of a line.
+        data = self._words_map
+        low, high = 0, len(data)
+        while low < high:
+            middle = (low + high) // 2
+            line_start = data.rfind(b'\n', low, middle) + 1 or low
+            line_end = data.find(b'\n', line_start)
+            line = data[line_start:line_end]
+            if line == key:
+                return True
+            elif line < key:
+                low = line_end + 1
+            else:
+                high = line_start
+        return False
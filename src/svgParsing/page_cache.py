@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import re
+
+from svgParsing import formatted_text, lexicon
+from svgParsing.formatted_text import FormattedText
+
+# Modules whose source decides how a page is parsed. Their contents are part of
+# every cache key, so changing the parser invalidates the cached pages.
+parser_modules = [formatted_text, lexicon]
+
+# The names of the cache's files: a page, named after its sha256 key, or the
+# temporary file a page is written to first.
+cache_filename_pattern = re.compile(r'[0-9a-f]{64}\.json(\.tmp)?')
+
+
+def parser_fingerprint():
+    '''Return a hash of the source code of the modules that parse a page, and
+    of the word list used to decide where spaces go.
+
+    return: str
+    '''
+    filepaths = [module.__file__ for module in parser_modules]
+    if formatted_text.english_words.filepath is not None:
+        filepaths.append(formatted_text.english_words.filepath)
+
+    sha = hashlib.sha256()
+    for filepath in filepaths:
+        if os.path.exists(filepath):
+            with open(filepath, 'rb') as f:
+                sha.update(f.read())
+    return sha.hexdigest()
+
+
+class PageCache:
+    '''A persistent cache of parsed pages. Each page is stored as a json file
+    named after a hash of the svg file's contents and of the parser, so a page
+    is only parsed again when either of them changes.'''
+
+    def __init__(self, cache_directory):
+        '''Constructor
+
+        cache_directory: str The directory for the cache files. It is created
+            if it doesn't exist.
+        '''
+        self.cache_directory = cache_directory
+        self.fingerprint = parser_fingerprint()
+        os.makedirs(cache_directory, exist_ok=True)
+
+    def key(self, svg_filepath):
+        '''Return the cache key for an svg file.
+
+        svg_filepath: str
+        return: str
+        '''
+        sha = hashlib.sha256(self.fingerprint.encode())
+        with open(svg_filepath, 'rb') as f:
+            sha.update(f.read())
+        return sha.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_directory, key + '.json')
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def get(self, key):
+        '''Return the cached page for a key, or None if it isn't cached.
+
+        key: str
+        return: Optional[List[FormattedText]]
+        '''
+        try:
+            with open(self._path(key)) as f:
+                page = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return [FormattedText.from_tuple(values) for values in page]
+
+    def put(self, key, page):
+        '''Store a parsed page.
+
+        key: str
+        page: List[FormattedText]
+        '''
+        # Write to a temporary file first, so an interrupted build never
+        # leaves a partial page behind.
+        temp_path = self._path(key) + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump([text.to_tuple() for text in page], f)
+        os.replace(temp_path, self._path(key))
+
+    def prune(self, keys):
+        '''Delete every cached page whose key is not in keys. Only the cache's
+        own files are deleted, named like the pages or the temporary files
+        they are written to, so anything else in the directory is left
+        alone.
+
+        keys: Iterable[str] The keys to keep.
+        '''
+        filenames_to_keep = {key + '.json' for key in keys}
+        for filename in os.listdir(self.cache_directory):
+            if (cache_filename_pattern.fullmatch(filename)
+                    and filename not in filenames_to_keep):
+                os.remove(os.path.join(self.cache_directory, filename))
+
+    def clear(self):
+        '''Delete every cached page.'''
+        self.prune([])
@@ -1,121 +1,208 @@
-import re
-
-from svgParsing.formatted_text import merge_pages, svg_to_text, FormattedText
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from svgParsing.article_rules import ArticleRules, TitleStack
+from svgParsing.config import svg_directory
+from svgParsing.formatted_text import CompactPage, stitch_pages, svg_to_text
+from svgParsing.table_filter import TableFilter
 from svgParsing.table_names import tables_to_remove
 
-# A function to parse the rules from SVG files (one per page).
-
-def generate_srd_articles():
-    ''' Parse the svg files created from the SRD, into a dictionary of
-    articles. Each article has a title and its corresponding text.
-
-    return: Dict[str, str]
-    '''
+# The SRD has one svg file per page, named '1.svg' through '403.svg'.
+srd_page_numbers = range(1, 404)
 
-    # Read the svg file for each page, and generate a list of FormattedText objects
-    # representing all text in the SRD. This loop handles 'smoothing out' the page
-    # breaks.
-    merged_content = []
-    for page_number in range(1, 404):
-        current_page = svg_to_text('{}.svg'.format(page_number))
-        merged_content = merge_pages(merged_content, current_page)
+# Functions to parse the rules from SVG files (one per page). Each step is a
+# generator, pages -> pieces of text -> articles, so an article is handed on as
+# soon as it is complete, and only one article's text is held at a time.
 
-    # Identify tables using their font size. Treat the title of the table as the
-    # previous FormattedText object in the list. Remove tables if the title is in
-    # the tables_to_remove list.
+def _iter_parsed_files(filenames, workers, compact=False):
+    '''Parse svg files in order, on a process pool if more than one worker is
+    requested.
 
-    indices_to_remove = []
+    filenames: List[str]
+    workers: Optional[int]
+    compact: bool Parse into CompactPages.
+    return: Iterator[List[FormattedText]]
+    '''
+    if workers == 1 or len(filenames) < 2:
+        for filename in filenames:
+            yield svg_to_text(filename, compact)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # map() returns results in the order of the inputs, which the
+        # stitching over page breaks relies on.
+        yield from executor.map(partial(svg_to_text, compact=compact),
+                                filenames, chunksize=4)
+
+
+def iter_pages(page_numbers=srd_page_numbers, workers=1, cache=None,
+               compact=False):
+    '''Parse the svg file for each page, and yield the FormattedText lists
+    in page order.
+
+    Pages are independent of each other, so with more than one worker they
+    are parsed on a process pool. The stitching across page breaks is left to
+    the caller.
+
+    page_numbers: Iterable[int]
+    workers: Optional[int] Number of processes to use. 1 parses in this
+        process, None uses one process per CPU.
+    cache: Optional[PageCache] If given, only pages missing from the cache
+        are parsed, and the cache is updated with them. Entries for files that
+        are no longer used are removed once the pages are done with, even if
+        the caller stops before the last one.
+    compact: bool Yield CompactPages, which take less memory than lists of
+        FormattedText objects, and are quicker to send between processes.
+    return: Iterator[List[FormattedText]]
+    '''
+    filenames = ['{}.svg'.format(page_number) for page_number in page_numbers]
+
+    if cache is None:
+        yield from _iter_parsed_files(filenames, workers, compact)
+        return
+
+    keys = [cache.key(os.path.join(svg_directory, filename))
+            for filename in filenames]
+    missing_indices = [i for i, key in enumerate(keys) if key not in cache]
+    parsed_pages = _iter_parsed_files([filenames[i] for i in missing_indices],
+                                      workers, compact)
+
+    missing = set(missing_indices)
+    try:
+        for i, key in enumerate(keys):
+            page = cache.get(key) if i not in missing else None
+            if page is None:
+                # Missing, or unreadable since the check above.
+                page = (next(parsed_pages) if i in missing
+                        else svg_to_text(filenames[i], compact))
+                cache.put(key, page)
+            elif compact:
+                page = CompactPage(page)
+            yield page
+
+        print('Parsed {} pages, read {} pages from the cache.'.format(
+            len(missing), len(keys) - len(missing)))
+    finally:
+        # Also when the caller stops early. The keys of the pages not yielded
+        # yet are kept too, so only files no longer used are removed.
+        cache.prune(keys)
+
+
+def parse_pages(page_numbers=srd_page_numbers, workers=1, cache=None,
+                compact=False):
+    '''Parse the svg file for each page, and return the FormattedText lists
+    in page order. See iter_pages.
+
+    return: List[List[FormattedText]]
+    '''
+    return list(iter_pages(page_numbers, workers, cache, compact))
 
-    for i in range(1, len(merged_content)):
-        if merged_content[i].size == 37:
-            if merged_content[i-1].text in tables_to_remove:
-                indices_to_remove += [i-1, i]
 
-    for index in sorted(indices_to_remove, reverse=True):
-        del merged_content[index]
+def iter_articles(formatted_texts, rules=None):
+    '''Split a stream of FormattedText objects into articles, and yield each
+    article once it is complete.
 
-    # Split the list of FormattedText objects up, using text at size 108 as the
+    formatted_texts: Iterable[FormattedText]
+    rules: Optional[ArticleRules] Rules for splitting the text into articles.
+        Defaults to the rules for the 5.1 SRD.
+    return: Iterator[Tuple[str, str]] (title, text) pairs
+    '''
+    # Split the stream of FormattedText objects up, using text at size 108 as the
     # start of a 'new article.' Extract the text from the FormattedText objects.
 
-    # [ [<list of conditions for higher-font titles>, <list of lower-font headers to split on> ]
-    rules = [
-        [["^Races$", 108], [[".*", 75]]],
-        [["^Beyond 1st Level$", 108], [[".*", 75]]],
-        [["^Using Ability Scores$", 108], [[".*", 75]]],
-        [["^Spellcasting$", 108], [[".*", 75]]],
-        [["^Spell Descriptions$", 75], [[".*", 50]]],
-        [["^Magic Items A-Z$", 75], [[".*", 50]]],
-        [["^Monsters$", 108], [["^Monsters \(.*", 75]]],
-        [["^Monsters \(.*", 75], [[".*", 58], [".*", 50]]],
-    ]
-
     # one absolute of this system - no text will be added to an article if the text font size is larger than the article title font size.
 
-    def check_text_matches_rule(formText, rule):
-        '''Check a FormattedText object against a rule for starting a new article.
-
-        formText: FormattedText The text to match against the rule.
-        rule: List[str, int] A pattern and a font size to match text against.
-        '''
-        #import pdb;pdb.set_trace()
-        if formText.size != rule[1]:
-            return False
-        if re.match(rule[0], formText.text):
-            return True
-        else:
-            return False
-
-    articles = {}
-    cur_larger_font_titles = [['Introduction', 108]]
+    if rules is None:
+        rules = ArticleRules.from_file()
+
+    cur_larger_font_titles = TitleStack(rules, 'Introduction', 108)
     current_title = 'Introduction'
-    current_article = ''
+    current_article = []
 
-    for formatted_text in merged_content:
-        #if formatted_text.text == "Spell Descriptions":
-        #    import pdb;pdb.set_trace()
+    for formatted_text in formatted_texts:
         if formatted_text.size == 108:
-            cur_larger_font_titles = [[formatted_text.text, 108]]
+            cur_larger_font_titles.reset(formatted_text.text, 108)
 
             # make new article
-            articles[current_title] = current_article
+            yield current_title, ''.join(current_article)
             current_title = formatted_text.text
-            current_article = ''
+            current_article = []
             continue
 
         # if text size any 'larger font title', then remove larger title(s), and make the current piece of text a new article title.
         # I believe with this code, the list of cur_larger_font_titles will be sorted by font size in descending order.
         create_new_article_by_font_size = False
 
-        while len(cur_larger_font_titles) and formatted_text.size >= cur_larger_font_titles[-1][1]:
+        while (len(cur_larger_font_titles) and
+               formatted_text.size >= cur_larger_font_titles.smallest_size()):
             create_new_article_by_font_size = True
-            cur_larger_font_titles = cur_larger_font_titles[:-1]
+            cur_larger_font_titles.pop()
 
         if create_new_article_by_font_size:
-            articles[current_title] = current_article
+            yield current_title, ''.join(current_article)
             current_title = formatted_text.text
-            current_article = ''
-            cur_larger_font_titles.append([current_title, formatted_text.size])
+            current_article = []
+            cur_larger_font_titles.push(current_title, formatted_text.size)
             continue
 
-        # If text matches a rule for the smallest 'larger font title', then make a new article.
-        create_new_article_by_formatting_rules = False
-        if formatted_text.size >= 50: # Don't do these looping checks for pieces of text that are too small for any of the rules to turn into a header.
-            for title in cur_larger_font_titles:
-                for condition_rule_pair in rules:
-                    #print(condition_rule_pair, title)
-                    if check_text_matches_rule(FormattedText(title[0], '#000000', title[1]), condition_rule_pair[0]):
-                        for rule in condition_rule_pair[1]:
-                            if check_text_matches_rule(formatted_text, rule):
-                                create_new_article_by_formatting_rules = True
-        if create_new_article_by_formatting_rules:
-            cur_larger_font_titles.append([formatted_text.text, formatted_text.size])
-            articles[current_title] = current_article
+        # If text matches a rule for one of the 'larger font titles', then make a new article.
+        if cur_larger_font_titles.starts_article(formatted_text):
+            cur_larger_font_titles.push(formatted_text.text,
+                                        formatted_text.size)
+            yield current_title, ''.join(current_article)
             current_title = formatted_text.text
-            current_article = ''
+            current_article = []
             continue
 
-        current_article += formatted_text.text + '\n'
+        current_article += [formatted_text.text, '\n']
+
+    yield current_title, ''.join(current_article)
+
 
-    articles[current_title] = current_article
+def iter_srd_articles(workers=1, cache=None, rules=None):
+    ''' Parse the svg files created from the SRD, and yield the articles in
+    order. Each article is a title and its corresponding text.
 
-    return articles
+    The same title can come up more than once. generate_srd_articles keeps the
+    last article for each title.
+
+    workers: Optional[int] Number of processes used to parse the pages, see
+        iter_pages.
+    cache: Optional[PageCache] A cache of parsed pages, see iter_pages.
+    rules: Optional[ArticleRules] Rules for splitting the text into articles,
+        see iter_articles.
+    return: Iterator[Tuple[str, str]]
+    '''
+
+    # Read the svg file for each page, and generate a stream of FormattedText
+    # objects representing all text in the SRD. The stitching handles
+    # 'smoothing out' the page breaks, and has to run in page order.
+    # Pages are held in compact form while they wait to be stitched, like
+    # those a process pool has parsed ahead.
+    pages = iter_pages(workers=workers, cache=cache, compact=True)
+    formatted_texts = stitch_pages(pages)
+
+    # Identify tables using their font size. Treat the title of the table as the
+    # previous FormattedText object in the stream. Remove tables if the title is
+    # in the tables_to_remove list.
+    table_filter = TableFilter(tables_to_remove)
+    formatted_texts = table_filter.filter(formatted_texts)
+
+    yield from iter_articles(formatted_texts, rules)
+
+    unmatched_titles = table_filter.unmatched_titles()
+    if unmatched_titles:
+        print('Tables to remove that were not found: {}'.format(
+            unmatched_titles))
+
+
+def generate_srd_articles(workers=1, cache=None, rules=None):
+    ''' Parse the svg files created from the SRD, into a dictionary of
+    articles. Each article has a title and its corresponding text.
+
+    See iter_srd_articles for the arguments.
+
+    return: Dict[str, str]
+    '''
+    return dict(iter_srd_articles(workers, cache, rules))
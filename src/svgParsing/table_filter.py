@@ -0,0 +1,56 @@
+from svgParsing.table_names import tables_to_remove
+
+# Tables in the SRD are the only text at this font size. The title of a table
+# is the piece of text just before it.
+table_font_size = 37
+
+
+class TableFilter:
+    '''Removes tables, and their titles, from a stream of FormattedText
+    objects, and keeps track of which table titles were found.'''
+
+    def __init__(self, table_titles=tables_to_remove):
+        '''Constructor
+
+        table_titles: Iterable[str] Titles of the tables to remove.
+        '''
+        self.table_titles = list(table_titles)
+        self._table_title_set = frozenset(self.table_titles)
+        self.matched_titles = set()
+
+    def filter(self, formatted_texts):
+        '''Yield the given FormattedText objects, leaving out the tables with
+        one of the titles, and their titles.
+
+        formatted_texts: Iterable[FormattedText]
+        return: Iterator[FormattedText]
+        '''
+        # Hold back one piece of text, since whether it is removed depends on
+        # the piece after it.
+        previous = None
+        remove_previous = False
+        for formatted_text in formatted_texts:
+            remove_current = False
+            if (previous is not None and
+                    formatted_text.size == table_font_size and
+                    previous.text in self._table_title_set):
+                self.matched_titles.add(previous.text)
+                remove_previous = True
+                remove_current = True
+
+            if previous is not None and not remove_previous:
+                yield previous
+            previous = formatted_text
+            remove_previous = remove_current
+
+        if previous is not None and not remove_previous:
+            yield previous
+
+    def unmatched_titles(self):
+        '''Return the table titles that haven't been found so far, in the
+        order they were given.
+
+        return: List[str]
+        '''
+        return [title for title in self.table_titles
+                if title not in self.matched_titles]
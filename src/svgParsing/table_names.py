@@ -24,8 +24,8 @@ tables_to_remove = [
     'Damage Severity by Level',
     'Trap Save DCs and Attack Bonuses',
     'Apparatus of the Crab Levers',
-    ('Armor (light, medium, or heavy), rare (requires attunement) You have ',
-     'resistance to one type of damage while you wear this armor. The GM ',
+    ('Armor (light, medium, or heavy), rare (requires attunement) You have '
+     'resistance to one type of damage while you wear this armor. The GM '
      'chooses the type or determines it randomly from the options below.'),
     'Gray Bag of Tricks',
     'Rust Bag of Tricks',
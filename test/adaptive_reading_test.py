@@ -0,0 +1,98 @@
+from functools import partial
+
+import pytest
+
+from questionAnswering.adaptive_reading import (AdaptiveFinder,
+                                                read_documents,
+                                                retriever_relevances)
+
+
+class FakeDocument:
+    def __init__(self, id, score, answer_probability):
+        self.id = id
+        self.text = id
+        self.score = score
+        self.answer_probability = answer_probability
+        self.meta = {'name': 'Article ' + id}
+
+
+class FakeRetriever:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def retrieve(self, query, top_k=10):
+        return self.documents[:top_k]
+
+
+class FakeReader:
+    '''Finds one answer in each document, as likely as the document says.'''
+
+    def __init__(self):
+        self.documents_read = []
+
+    def predict(self, question, documents, top_k):
+        self.documents_read += [document.id for document in documents]
+        answers = [{'answer': document.text,
+                    'score': document.answer_probability,
+                    'probability': document.answer_probability,
+                    'document_id': document.id}
+                   for document in documents]
+        answers.sort(key=lambda answer: answer['score'], reverse=True)
+        return {'question': question, 'no_ans_gap': len(documents),
+                'answers': answers[:top_k]}
+
+
+def make_finder(documents, margin=0.2, step=1):
+    reader = FakeReader()
+    return AdaptiveFinder(FakeRetriever(documents),
+                          partial(read_documents, reader), margin=margin,
+                          step=step), reader
+
+
+def test_retriever_relevances():
+    documents = [FakeDocument('a', 10, 0), FakeDocument('b', 5, 0)]
+    assert retriever_relevances(documents) == [1.0, 0.5]
+    documents[0].score = None
+    assert retriever_relevances(documents) == [1.0, 1.0]
+
+
+def test_stops_when_answer_beats_remaining_documents():
+    documents = [FakeDocument('a', 10, 0.9), FakeDocument('b', 6, 0.95),
+                 FakeDocument('c', 2, 0.99)]
+    finder, reader = make_finder(documents, margin=0.2)
+    prediction = finder.get_answers('question', top_k_reader=1)
+    # 0.9 beats b's relevance of 0.6 by more than the margin.
+    assert reader.documents_read == ['a']
+    assert prediction['answers'][0]['answer'] == 'a'
+    assert prediction['answers'][0]['meta'] == {'name': 'Article a'}
+    assert (finder.documents_read, finder.documents_retrieved) == (1, 3)
+
+
+def test_keeps_reading_while_answer_is_uncertain():
+    documents = [FakeDocument('a', 10, 0.5), FakeDocument('b', 9, 0.8),
+                 FakeDocument('c', 8, 0.7)]
+    finder, reader = make_finder(documents, margin=0.2)
+    prediction = finder.get_answers('question', top_k_reader=2)
+    assert reader.documents_read == ['a', 'b', 'c']
+    assert [answer['answer'] for answer in prediction['answers']] == ['b',
+                                                                      'c']
+    assert prediction['no_ans_gap'] == 1
+
+
+def test_reads_in_steps_in_score_order():
+    documents = [FakeDocument('b', 5, 0.1), FakeDocument('a', 10, 0.1),
+                 FakeDocument('c', 1, 0.1)]
+    finder, reader = make_finder(documents, step=2)
+    finder.get_answers('question')
+    assert reader.documents_read == ['a', 'b', 'c']
+
+
+def test_no_documents():
+    finder, _ = make_finder([])
+    assert finder.get_answers('question') == {'question': 'question',
+                                              'answers': []}
+
+
+def test_invalid_step():
+    with pytest.raises(ValueError):
+        make_finder([], step=0)
@@ -0,0 +1,131 @@
+import os
+
+import pytest
+
+from questionAnswering.answer_cache import AnswerCache, normalize_question
+
+prediction = {'question': 'How tall is a halfling?',
+              'answers': [{'answer': 'about 3 feet',
+                           'meta': {'name': 'Halfling'}}],
+              'no_ans_gap': 1.5}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_normalize_question():
+    assert (normalize_question('  How tall\tis a  halfling? ') ==
+            'How tall is a halfling?')
+
+
+def test_hit_returns_copy():
+    cache = AnswerCache('v1')
+    key = cache.key('How tall is a halfling?', 10, 5)
+    assert cache.get(key) is None
+    cache.put(key, prediction)
+
+    cached = cache.get(cache.key('How tall is  a halfling?', 10, 5))
+    assert cached == prediction
+    cached['answers'].clear()
+    assert cache.get(key) == prediction
+    assert cache.stats()['hits'] == 2
+    assert cache.stats()['misses'] == 1
+
+
+def test_key_depends_on_top_k_and_version():
+    cache = AnswerCache('v1')
+    key = cache.key('question', 10, 5)
+    assert key != cache.key('question', 10, 1)
+    assert key != AnswerCache('v2').key('question', 10, 5)
+
+
+def test_fewer_answers_come_from_the_top_5():
+    top_5 = dict(prediction, answers=[{'answer': str(rank)}
+                                      for rank in range(1, 6)])
+    cache = AnswerCache('v1')
+    assert cache.get_answers('question', 10, 1, False) is None
+    cache.put(cache.key('question', 10, 5, False), top_5)
+
+    assert cache.get_answers('question', 10, 1, False)['answers'] == \
+        [{'answer': '1'}]
+    assert cache.get_answers('question', 10, 5, False) == top_5
+    # Not from a prediction read with other settings.
+    assert cache.get_answers('question', 10, 1, True) is None
+    assert cache.stats()['hits'] == 2
+    assert cache.stats()['misses'] == 2
+
+
+def test_lru_eviction():
+    cache = AnswerCache('v1', max_size=2)
+    for question in ['a', 'b']:
+        cache.put(cache.key(question, 10, 5), prediction)
+    cache.get(cache.key('a', 10, 5))
+    cache.put(cache.key('c', 10, 5), prediction)
+    assert cache.get(cache.key('b', 10, 5)) is None
+    assert cache.get(cache.key('a', 10, 5)) is not None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_ttl_expiry():
+    clock = FakeClock()
+    cache = AnswerCache('v1', ttl=60, clock=clock)
+    key = cache.key('question', 10, 5)
+    cache.put(key, prediction)
+    clock.now = 61
+    assert cache.get(key) is None
+    assert cache.stats()['expirations'] == 1
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    disk_filepath = str(tmp_path / 'answers.sqlite')
+    cache = AnswerCache('v1', disk_filepath=disk_filepath)
+    cache.put(cache.key('question', 10, 5), prediction)
+
+    restarted = AnswerCache('v1', disk_filepath=disk_filepath)
+    assert restarted.get(restarted.key('question', 10, 5)) == prediction
+    assert restarted.stats()['disk_hits'] == 1
+
+
+def test_disabled():
+    cache = AnswerCache('v1', max_size=0)
+    key = cache.key('question', 10, 5)
+    cache.put(key, prediction)
+    assert cache.get(key) is None
+
+
+def test_reset_changes_version():
+    cache = AnswerCache('v1')
+    old_key = cache.key('question', 10, 5)
+    cache.put(old_key, prediction)
+    cache.reset('v2')
+    assert cache.get(cache.key('question', 10, 5)) is None
+    # A prediction made from the old articles during the reset.
+    cache.put(old_key, prediction)
+    assert cache.get(cache.key('question', 10, 5)) is None
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs os.fork')
+def test_after_fork_uses_own_connection(tmp_path):
+    disk_filepath = str(tmp_path / 'answers.sqlite')
+    cache = AnswerCache('v1', disk_filepath=disk_filepath)
+    cache.put(cache.key('first', 10, 5), prediction)
+
+    pid = os.fork()
+    if pid == 0:
+        ok = False
+        try:
+            cache.after_fork()
+            ok = cache.get(cache.key('first', 10, 5)) == prediction
+            cache.put(cache.key('second', 10, 5), prediction)
+        finally:
+            os._exit(0 if ok else 1)
+    assert os.waitpid(pid, 0)[1] == 0
+
+    # The forked process's prediction is on disk.
+    restarted = AnswerCache('v1', disk_filepath=disk_filepath)
+    assert restarted.get(restarted.key('second', 10, 5)) == prediction
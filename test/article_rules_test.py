@@ -0,0 +1,37 @@
+from svgParsing.article_rules import ArticleRules, TitleStack
+from svgParsing.formatted_text import FormattedText
+
+rules = ArticleRules([
+    [["^Monsters$", 108], [["^Monsters \\(.*", 75]]],
+    [["^Monsters \\(.*", 75], [[".*", 58], [".*", 50]]],
+])
+
+
+def test_default_rules_load():
+    default_rules = ArticleRules.from_file()
+    assert default_rules.headers_for_title('Races', 108)
+    assert not default_rules.headers_for_title('Races', 75)
+
+
+def test_headers_follow_open_titles():
+    titles = TitleStack(rules, 'Monsters', 108)
+    monster_list = FormattedText('Monsters (A)', '#000000', 75)
+    monster = FormattedText('Aboleth', '#000000', 58)
+    assert titles.starts_article(monster_list)
+    assert not titles.starts_article(monster)
+
+    titles.push('Monsters (A)', 75)
+    assert titles.starts_article(monster)
+    assert titles.smallest_size() == 75
+
+    titles.pop()
+    assert not titles.starts_article(monster)
+
+
+def test_reset_closes_all_titles():
+    titles = TitleStack(rules, 'Monsters', 108)
+    titles.push('Monsters (A)', 75)
+    titles.reset('Races', 108)
+    assert len(titles) == 1
+    assert not titles.starts_article(
+        FormattedText('Monsters (B)', '#000000', 75))
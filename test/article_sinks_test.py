@@ -0,0 +1,131 @@
+import json
+
+import pytest
+
+from questionAnswering.elasticsearch_indexing import passage_id
+from svgParsing.article_sinks import (ElasticsearchArticleSink,
+                                      JsonArticleSink, JsonLinesArticleSink,
+                                      write_articles)
+
+articles = [('Introduction', ''), ('Races', 'Dwarf\n'), ('Races', 'Elf\n'),
+            ('Classes', 'Bard\n')]
+
+
+def test_json_keeps_last_article_per_title(tmp_path):
+    filepath = str(tmp_path / 'articles.json')
+    assert write_articles(articles, [JsonArticleSink(filepath)]) == 4
+    with open(filepath) as f:
+        assert json.load(f) == dict(articles)
+
+
+def test_files_are_replaced_on_close(tmp_path):
+    for sink_class, extension in [(JsonArticleSink, 'json'),
+                                  (JsonLinesArticleSink, 'jsonl')]:
+        filepath = tmp_path / ('articles.' + extension)
+        filepath.write_text('previous')
+
+        def failing_articles():
+            yield articles[0]
+            raise ValueError('Parsing failed')
+
+        sink = sink_class(str(filepath))
+        with pytest.raises(ValueError):
+            write_articles(failing_articles(), [sink])
+        assert filepath.read_text() == 'previous'
+
+        write_articles(articles, [sink_class(str(filepath))])
+        assert filepath.read_text() != 'previous'
+        assert not (tmp_path / ('articles.{}.tmp'.format(extension))).exists()
+
+
+def test_json_lines(tmp_path):
+    filepath = str(tmp_path / 'articles.jsonl')
+    write_articles(articles, [JsonLinesArticleSink(filepath)])
+    with open(filepath) as f:
+        lines = [json.loads(line) for line in f]
+    assert [(line['title'], line['text']) for line in lines] == articles
+
+
+class StubIndices:
+    def __init__(self, client):
+        self.client = client
+        self.aliases = {}
+
+    def get_settings(self, index):
+        return {}
+
+    def put_settings(self, index, body):
+        self.client.refresh_intervals.append(
+            body['index']['refresh_interval'])
+
+    def refresh(self, index):
+        pass
+
+    def exists(self, index):
+        return index in self.aliases
+
+    def exists_alias(self, name):
+        return any(name in aliases for aliases in self.aliases.values())
+
+    def get_alias(self, name):
+        return {index: {} for index, aliases in self.aliases.items()
+                if name in aliases}
+
+    def get(self, index):
+        return {name: {} for name in self.aliases
+                if name.startswith(index.rstrip('*'))}
+
+    def update_aliases(self, body):
+        for action in body['actions']:
+            (kind, target), = action.items()
+            if kind == 'add':
+                self.aliases[target['index']].add(target['alias'])
+            else:
+                self.aliases[target['index']].discard(target['alias'])
+
+
+class StubClient:
+    '''Records the documents sent in each bulk request, and the aliases.'''
+
+    def __init__(self):
+        self.indices = StubIndices(self)
+        self.bulk_requests = []
+        self.refresh_intervals = []
+
+    def create_index(self, index):
+        self.indices.aliases[index] = set()
+
+    def bulk(self, body):
+        self.bulk_requests.append([(action['index']['_id'], source)
+                                   for action, source in zip(body[::2],
+                                                             body[1::2])])
+        return {'errors': False}
+
+
+def test_elasticsearch_indexes_while_parsing():
+    client = StubClient()
+    sink = ElasticsearchArticleSink(client, 'document', 'document-v2',
+                                    client.create_index, chunk_size=10,
+                                    chunk_overlap=0, batch_size=2)
+
+    sink.write('Races', 'Dwarf\nElf and more\n')
+    # Sent before the next article arrives.
+    assert [[source['text'] for _, source in request]
+            for request in client.bulk_requests] == [
+        ['Dwarf\n', 'Elf and more\n']]
+    assert not client.indices.exists_alias('document')
+
+    sink.write('Races', 'Halfling\n')
+    sink.write('Classes', 'Bard\n')
+    sink.close()
+
+    sent = [source for request in client.bulk_requests
+            for _, source in request]
+    assert [source['name'] for source in sent] == ['Races', 'Races',
+                                                   'Classes']
+    assert [doc_id for request in client.bulk_requests
+            for doc_id, _ in request] == [passage_id(source)
+                                          for source in sent]
+    assert sink.skipped_titles == ['Races']
+    assert client.refresh_intervals == ['-1', None]
+    assert client.indices.aliases == {'document-v2': {'document'}}
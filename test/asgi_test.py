@@ -0,0 +1,143 @@
+import asyncio
+import importlib
+import json
+import threading
+
+import pytest
+from flask import request, url_for
+
+
+@pytest.fixture
+def asgi(flask_main):
+    return importlib.import_module('asgi')
+
+
+def call_app(asgi, path, data=None, method='POST', on_send=None):
+    '''Send one request to the ASGI app, and return the messages it sent.'''
+    scope = {'type': 'http', 'method': method, 'path': path,
+             'query_string': b'', 'client': ('127.0.0.1', 50000),
+             'headers': [(b'content-type', b'application/json')]}
+    requests = [{'type': 'http.request',
+                 'body': json.dumps(data).encode() if data else b'',
+                 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return requests.pop(0)
+
+    async def send(message):
+        sent.append(message)
+        if on_send is not None:
+            on_send(message)
+
+    asyncio.run(asgi.app(scope, receive, send))
+    return sent
+
+
+def response_body(sent):
+    return b''.join(message.get('body', b'') for message in sent[1:])
+
+
+class StreamingResponder:
+    '''Streams one update, then waits to be told to send the last.'''
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def stream_answers_in_context(self, question):
+        yield {'question': question, 'answers': [], 'done': False}
+        assert self.release.wait(5)
+        yield {'question': question, 'answers': [], 'done': True}
+
+
+def test_streamed_answers_are_sent_as_they_are_found(asgi, serve_responder):
+    responder = StreamingResponder()
+    serve_responder(responder)
+
+    def on_send(message):
+        # The first line arrives while the second is still being found.
+        if message.get('body'):
+            responder.release.set()
+
+    sent = call_app(asgi, '/json-answers-in-context',
+                    {'question': 'tall halfling', 'stream': True},
+                    on_send=on_send)
+    assert sent[0]['status'] == 200
+    chunks = [message['body'] for message in sent[1:] if message['body']]
+    assert [json.loads(chunk)['done'] for chunk in chunks] == [False, True]
+    assert all(message['more_body'] for message in sent[1:-1])
+    assert not sent[-1].get('more_body')
+
+
+def test_other_routes_answer_without_workers(asgi, serve_responder):
+    serve_responder(StreamingResponder())
+    sent = call_app(asgi, '/ready', method='GET')
+    assert sent[0]['status'] == 200
+    assert json.loads(response_body(sent))['ready']
+
+
+class BlockingResponder:
+    '''Answers once released.'''
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def top_answer_in_context(self, question, top_5=False, adaptive=None,
+                              use_cache=True):
+        assert self.release.wait(5)
+        return '<p>answer</p>'
+
+
+@pytest.fixture
+def small_pool(asgi, monkeypatch):
+    pool = asgi.InferencePool(workers=1, queue_depth=0, timeout=0.05)
+    monkeypatch.setattr(asgi, 'inference_pool', pool)
+    yield pool
+    pool.close()
+
+
+def test_saturated_pool_returns_503(asgi, serve_responder, small_pool):
+    responder = BlockingResponder()
+    serve_responder(responder)
+    # The only thread is busy, and there is no room to wait.
+    busy = small_pool.submit(responder.release.wait, 5)
+
+    sent = call_app(asgi, '/json-question', {'question': 'tall halfling'})
+    responder.release.set()
+    busy.result(5)
+    assert sent[0]['status'] == 503
+    assert (b'retry-after', b'1') in [(name.lower(), value)
+                                      for name, value in sent[0]['headers']]
+    assert small_pool.stats()['rejected'] == 1
+
+
+def test_slow_answer_returns_504(asgi, serve_responder, small_pool):
+    responder = BlockingResponder()
+    serve_responder(responder)
+
+    sent = call_app(asgi, '/json-question', {'question': 'tall halfling'})
+    responder.release.set()
+    assert sent[0]['status'] == 504
+    assert 'No result after' in json.loads(response_body(sent))['error']
+    assert small_pool.stats()['timed_out'] == 1
+
+
+def test_environ_has_the_requested_url(asgi):
+    scope = {'type': 'http', 'method': 'GET', 'scheme': 'https',
+             'http_version': '2', 'server': ('crows.example', 8443),
+             'client': ('203.0.113.5', 50000), 'root_path': '/crows',
+             'path': '/crows/ready', 'query_string': b'verbose=1',
+             'headers': [(b'accept', b'text/html'),
+                         (b'accept', b'application/json'),
+                         (b'content-length', b'99')]}
+    environ = asgi.wsgi_environ(scope, b'')
+    assert environ['SERVER_PROTOCOL'] == 'HTTP/2'
+    assert environ['CONTENT_LENGTH'] == '0'
+    assert environ['HTTP_ACCEPT'] == 'text/html,application/json'
+
+    with asgi.main.app.request_context(environ):
+        assert request.url == \
+            'https://crows.example:8443/crows/ready?verbose=1'
+        assert request.remote_addr == '203.0.113.5'
+        assert url_for('ready', _external=True) == \
+            'https://crows.example:8443/crows/ready'
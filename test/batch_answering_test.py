@@ -0,0 +1,243 @@
+import threading
+
+import pytest
+
+from questionAnswering.answer_cache import AnswerCache
+from questionAnswering.batch_answering import answer_batch, submit_now
+from questionAnswering.batching import BatchingFinder
+
+
+class FakeDocument:
+    def __init__(self, id, text):
+        self.id = id
+        self.text = text
+        self.meta = {'name': 'Article ' + id}
+
+
+class FakeRetriever:
+    def __init__(self):
+        self.queries = []
+
+    def retrieve(self, query, top_k=10):
+        self.queries.append(query)
+        if query == 'broken retriever':
+            raise RuntimeError('Elasticsearch is down')
+        return [FakeDocument(word, word) for word in query.split()][:top_k]
+
+
+def fake_answer(document):
+    return {'answer': document.text, 'context': 'the ' + document.text,
+            'document_id': document.id, 'offset_start': 4,
+            'offset_end': 4 + len(document.text), 'offset_start_in_doc': 0,
+            'offset_end_in_doc': len(document.text), 'probability': 0.5,
+            'score': len(document.text)}
+
+
+class FakeReader:
+    '''Answers with every retrieved word, longest first, and records which
+    thread each batch ran on.'''
+
+    def __init__(self):
+        self.batches = []
+        self.threads = set()
+        self.lock = threading.Lock()
+
+    def predict_batch(self, question_doc_list, top_k_per_question,
+                      batch_size):
+        with self.lock:
+            self.batches.append([item['question'].question
+                                 for item in question_doc_list])
+            self.threads.add(threading.current_thread())
+        results = []
+        for item in question_doc_list:
+            answers = sorted((fake_answer(doc) for doc in item['docs']),
+                             key=lambda answer: answer['score'],
+                             reverse=True)
+            results.append({'question': None, 'no_ans_gap': 0.0,
+                            'answers': answers[:top_k_per_question]})
+        return results
+
+
+def no_adaptive_reading(question, top_k_reader):
+    raise AssertionError('Not reading adaptively.')
+
+
+@pytest.fixture
+def finder():
+    finder = BatchingFinder(FakeRetriever(), FakeReader(), max_wait=0.5,
+                            max_batch_size=8)
+    yield finder
+    finder.close()
+
+
+def ask(finder, items, cache=None, **kwargs):
+    if cache is None:
+        cache = AnswerCache('v1', max_size=16)
+    kwargs.setdefault('answer_adaptively', no_adaptive_reading)
+    return answer_batch(items, finder.retriever, finder.submit, cache,
+                        **kwargs)
+
+
+def test_results_in_order_and_mode(finder):
+    results = ask(finder, [
+        {'question': 'tall halfling', 'mode': 'top_answer'},
+        {'question': 'bless spell'},
+        {'question': 'a dwarf', 'mode': 'all_answers'},
+        {'question': 'an elf', 'mode': 'with_metadata'}])
+
+    assert results[0] == {'answer': '<p>the <b>halfling</b></p>'}
+    assert results[1]['answer'].startswith('<p>Question: bless spell<br/>')
+    assert 'Answer 2, from article <i>Article spell</i>' in \
+        results[1]['answer']
+    assert [answer['answer'] for answer in
+            results[2]['answer']['answers']] == ['dwarf', 'a']
+    assert results[3]['answer']['question'] == 'an elf'
+    assert results[3]['answer']['answers'][0]['meta'] == \
+        {'name': 'Article elf'}
+
+
+def test_reading_goes_through_the_finder_worker(finder):
+    ask(finder, [{'question': question}
+                 for question in ['a b', 'c d', 'e f', 'g h']])
+    reader = finder.reader
+    # Read together, on the worker the finder reads every question on.
+    assert reader.batches == [['a b', 'c d', 'e f', 'g h']]
+    assert reader.threads == {finder._worker}
+
+
+def test_cache_hits_inside_a_batch(finder):
+    cache = AnswerCache('v1', max_size=16)
+    ask(finder, [{'question': 'tall halfling', 'mode': 'top_answer'}], cache)
+
+    results = ask(finder, [{'question': 'new question'},
+                           {'question': '  tall  halfling',
+                            'mode': 'top_answer'}], cache)
+    assert finder.reader.batches == [['tall halfling'], ['new question']]
+    assert finder.retriever.queries == ['tall halfling', 'new question']
+    assert results[1] == {'answer': '<p>the <b>halfling</b></p>'}
+
+
+def test_bad_items_return_errors(finder):
+    results = ask(finder, [{'question': 'tall halfling'},
+                           {'question': 'bless', 'mode': 'poem'},
+                           {'mode': 'top_answer'},
+                           {'question': 'broken retriever'},
+                           {'question': 'a dwarf', 'mode': 'top_answer'}])
+    assert "Unrecognized mode 'poem'" in results[1]['error']
+    assert results[2] == {'error': "KeyError: 'question'"}
+    assert results[3] == {'error': 'RuntimeError: Elasticsearch is down'}
+    assert 'answer' in results[0]
+    assert results[4] == {'answer': '<p>the <b>dwarf</b></p>'}
+
+
+def test_reader_error_for_one_question():
+    def read(question, documents, top_k_reader):
+        if question == 'unreadable':
+            raise ValueError('Too long')
+        return {'question': question, 'no_ans_gap': 0.0,
+                'answers': [fake_answer(documents[0])]}
+
+    retriever = FakeRetriever()
+    results = answer_batch(
+        [{'question': 'unreadable'}, {'question': 'halfling',
+                                      'mode': 'top_answer'}],
+        retriever, submit_now(read), AnswerCache('v1'), no_adaptive_reading)
+    assert results == [{'error': 'ValueError: Too long'},
+                       {'answer': '<p>the <b>halfling</b></p>'}]
+
+
+def test_adaptive_items_are_answered_one_by_one(finder):
+    asked = []
+
+    def answer_adaptively(question, top_k_reader):
+        asked.append((question, top_k_reader))
+        return {'question': question, 'no_ans_gap': 0.0,
+                'answers': [fake_answer(FakeDocument('x', 'elf'))]}
+
+    results = ask(finder, [{'question': 'an elf', 'mode': 'top_answer',
+                            'adaptive': True},
+                           {'question': 'a dwarf', 'adaptive': False}],
+                  answer_adaptively=answer_adaptively, adaptive_reading=True)
+    assert asked == [('an elf', 1)]
+    assert finder.reader.batches == [['a dwarf']]
+    assert results[0] == {'answer': '<p>the <b>elf</b></p>'}
+
+
+def test_too_many_questions(finder):
+    with pytest.raises(ValueError):
+        ask(finder, [{'question': 'a'}] * 3, max_questions=2)
+    assert finder.reader.batches == []
+
+
+class FakeBatchResponder:
+
+    class config:
+        batch_max_questions = 2
+
+    def answer_batch(self, items):
+        return [{'answer': item['question']} for item in items]
+
+
+def test_batch_route(flask_main, serve_responder):
+    serve_responder(FakeBatchResponder())
+    client = flask_main.app.test_client()
+
+    response = client.post('/batch', json={'questions': [
+        'a', {'question': 'b', 'mode': 'top_answer'}]})
+    assert response.status_code == 200
+    assert response.get_json() == {'results': [{'answer': 'a'},
+                                               {'answer': 'b'}]}
+
+
+def test_batch_route_limits_questions(flask_main, serve_responder):
+    serve_responder(FakeBatchResponder())
+    client = flask_main.app.test_client()
+
+    response = client.post('/batch', json={'questions': ['a', 'b', 'c']})
+    assert response.status_code == 413
+    assert 'at most 2' in response.get_json()['error']
+
+
+@pytest.mark.parametrize('body', [{}, {'questions': 'a'}, [1, 2]])
+def test_batch_route_rejects_malformed_bodies(flask_main, serve_responder,
+                                              body):
+    serve_responder(FakeBatchResponder())
+    response = flask_main.app.test_client().post('/batch', json=body)
+    assert response.status_code == 400
+
+
+def test_batch_route_rejects_invalid_json(flask_main, serve_responder):
+    serve_responder(FakeBatchResponder())
+    response = flask_main.app.test_client().post(
+        '/batch', data='{"questions": [', content_type='application/json')
+    assert response.status_code == 400
+
+
+def test_modes_share_one_cached_prediction(finder):
+    cache = AnswerCache('v1', max_size=16)
+    ask(finder, [{'question': 'tall halfling'}], cache)
+    results = ask(finder, [{'question': 'tall halfling',
+                            'mode': 'top_answer'},
+                           {'question': 'tall halfling',
+                            'mode': 'all_answers'}], cache)
+    assert finder.reader.batches == [['tall halfling']]
+    assert results[0] == {'answer': '<p>the <b>halfling</b></p>'}
+    assert len(results[1]['answer']['answers']) == 2
+
+
+def test_top_answer_reads_only_one_answer():
+    top_ks = []
+
+    def read(question, documents, top_k_reader):
+        top_ks.append(top_k_reader)
+        return {'question': question, 'no_ans_gap': 0.0,
+                'answers': [fake_answer(document)
+                            for document in documents][:top_k_reader]}
+
+    results = answer_batch(
+        [{'question': 'tall halfling', 'mode': 'top_answer'},
+         {'question': 'a dwarf'}],
+        FakeRetriever(), submit_now(read), AnswerCache('v1'),
+        no_adaptive_reading)
+    assert top_ks == [1, 5]
+    assert results[0] == {'answer': '<p>the <b>tall</b></p>'}
@@ -0,0 +1,115 @@
+import os
+import threading
+
+import pytest
+
+from questionAnswering.batching import BatchingFinder
+
+
+class FakeDocument:
+    def __init__(self, id, text):
+        self.id = id
+        self.text = text
+        self.meta = {'name': 'Article ' + id}
+
+
+class FakeRetriever:
+    def retrieve(self, query, top_k=10):
+        if query == 'nothing':
+            return []
+        return [FakeDocument(word, word) for word in query.split()][:top_k]
+
+
+class FakeReader:
+    '''Answers with every retrieved word, longest first.'''
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def predict_batch(self, question_doc_list, top_k_per_question,
+                      batch_size):
+        self.batch_sizes.append(len(question_doc_list))
+        results = []
+        for question_with_docs in question_doc_list:
+            answers = [{'answer': doc.text, 'score': len(doc.text),
+                        'document_id': doc.id}
+                       for doc in question_with_docs['docs']]
+            answers.sort(key=lambda answer: answer['score'], reverse=True)
+            results.append({'question': None, 'no_ans_gap': 0.0,
+                            'answers': answers[:top_k_per_question]})
+        return results
+
+
+def answer_concurrently(finder, questions, top_k_reader):
+    predictions = {}
+
+    def ask(question):
+        predictions[question] = finder.get_answers(question,
+                                                   top_k_reader=top_k_reader)
+
+    threads = [threading.Thread(target=ask, args=(question,))
+               for question in questions]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return predictions
+
+
+def test_concurrent_questions_share_a_batch():
+    reader = FakeReader()
+    finder = BatchingFinder(FakeRetriever(), reader, max_wait=1,
+                            max_batch_size=4)
+    questions = ['a bb', 'ccc d', 'ee f', 'g hhhh']
+    predictions = answer_concurrently(finder, questions, top_k_reader=1)
+    finder.close()
+
+    assert reader.batch_sizes == [4]
+    assert predictions['g hhhh']['question'] == 'g hhhh'
+    assert [answer['answer'] for answer in
+            predictions['g hhhh']['answers']] == ['hhhh']
+    assert (predictions['a bb']['answers'][0]['meta'] ==
+            {'name': 'Article bb'})
+
+
+def test_batches_are_limited_in_size():
+    reader = FakeReader()
+    finder = BatchingFinder(FakeRetriever(), reader, max_wait=0.05,
+                            max_batch_size=2)
+    answer_concurrently(finder, ['a', 'b', 'c', 'd', 'e'], top_k_reader=5)
+    finder.close()
+    assert max(reader.batch_sizes) <= 2
+    assert sum(reader.batch_sizes) == 5
+
+
+def test_question_without_documents():
+    finder = BatchingFinder(FakeRetriever(), FakeReader())
+    assert finder.get_answers('nothing') == {'question': 'nothing',
+                                             'answers': []}
+    finder.close()
+
+
+def test_reader_errors_reach_the_caller():
+    reader = FakeReader()
+    reader.predict_batch = None
+    finder = BatchingFinder(FakeRetriever(), reader, max_wait=0)
+    with pytest.raises(TypeError):
+        finder.get_answers('a')
+    finder.close()
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs os.fork')
+def test_after_fork_restarts_worker():
+    finder = BatchingFinder(FakeRetriever(), FakeReader(), max_wait=0)
+
+    pid = os.fork()
+    if pid == 0:
+        ok = False
+        try:
+            finder.after_fork()
+            prediction = finder.get_answers('tall halfling', top_k_reader=1)
+            ok = prediction['answers'][0]['answer'] == 'halfling'
+        finally:
+            os._exit(0 if ok else 1)
+    assert os.waitpid(pid, 0)[1] == 0
+    finder.close()
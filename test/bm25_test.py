@@ -0,0 +1,73 @@
+import pytest
+
+from questionAnswering.bm25 import BM25Index, tokenize
+
+articles = {'Halfling': 'Halflings are about 3 feet tall.',
+            'Dwarf': 'Dwarves are stout. A dwarf stands 4 to 5 feet tall.',
+            'Fireball': 'A bright streak flashes to a point you choose.',
+            'Empty': ''}
+
+
+def test_tokenize():
+    assert tokenize("How tall is a Halfling's cart?") == [
+        'how', 'tall', 'is', 'a', 'halfling', 's', 'cart']
+
+
+def test_search_ranks_matching_articles():
+    index = BM25Index.build(articles)
+    results = index.search('How tall are halflings?')
+    assert [index.titles[doc_id] for doc_id, _ in results] == ['Halfling',
+                                                               'Dwarf']
+    assert results[0][1] > results[1][1]
+    assert index.search('unknown words') == []
+
+
+def test_top_k():
+    index = BM25Index.build(articles)
+    assert len(index.search('a', top_k=1)) == 1
+
+
+@pytest.mark.parametrize('k1, b', [(1.2, 0.75), (2.0, 0.0)])
+def test_matches_bm25_formula(k1, b):
+    import math
+    index = BM25Index.build(articles, k1=k1, b=b)
+    lengths = [len(tokenize(text)) for text in articles.values()]
+    average_length = sum(lengths) / len(lengths)
+    # 'tall' is in two of the four articles, once in each.
+    idf = math.log(1 + (4 - 2 + 0.5) / (2 + 0.5))
+    expected = idf * (k1 + 1) / (1 + k1 * (1 - b + b * lengths[0] /
+                                           average_length))
+    assert index.search('tall')[0][1] == pytest.approx(expected, rel=1e-6)
+
+
+def test_save_and_load(tmp_path):
+    articles_filepath = tmp_path / 'articles.json'
+    articles_filepath.write_text('{"Halfling": "About 3 feet tall."}')
+    index_directory = str(tmp_path / 'index')
+
+    index = BM25Index.load_or_build(str(articles_filepath), index_directory)
+    loaded = BM25Index.load_or_build(str(articles_filepath), index_directory)
+    assert loaded.search('tall') == index.search('tall')
+    assert loaded.passage_text(0) == 'About 3 feet tall.'
+
+    articles_filepath.write_text('{"Dwarf": "4 to 5 feet tall."}')
+    rebuilt = BM25Index.load_or_build(str(articles_filepath), index_directory)
+    assert rebuilt.titles == ['Dwarf']
+
+
+def test_chunked_index(tmp_path):
+    articles_filepath = tmp_path / 'articles.json'
+    articles_filepath.write_text(
+        '{"Halfling": "Small folk.\\nAbout 3 feet tall.\\n"}')
+    index_directory = str(tmp_path / 'index')
+
+    index = BM25Index.load_or_build(str(articles_filepath), index_directory,
+                                    chunk_size=15, chunk_overlap=0)
+    assert len(index) == 2
+    [(doc_id, _)] = index.search('tall')
+    assert index.passage_text(doc_id) == 'About 3 feet tall.\n'
+    assert index.titles[doc_id] == 'Halfling'
+    assert index.article_offsets[doc_id] == len('Small folk.\n')
+
+    whole = BM25Index.load_or_build(str(articles_filepath), index_directory)
+    assert len(whole) == 1
@@ -0,0 +1,62 @@
+import pytest
+
+from questionAnswering.chunking import (article_passages,
+                                        map_answers_to_articles,
+                                        split_article)
+
+text = 'First line.\nSecond line.\nThird line.\n'
+
+
+def test_passages_are_substrings_at_their_offsets():
+    for chunk_size in [1, 12, 25, 30, 100]:
+        for overlap in [0, 1, 2]:
+            passages = split_article(text, chunk_size, overlap)
+            assert passages[0][0] == 0
+            assert passages[-1][0] + len(passages[-1][1]) == len(text)
+            for offset, passage in passages:
+                assert text[offset:offset + len(passage)] == passage
+
+
+def test_chunk_size_and_overlap():
+    assert split_article(text, 100) == [(0, text)]
+    assert split_article(text, 25, overlap=0) == [
+        (0, 'First line.\nSecond line.\n'), (25, 'Third line.\n')]
+    assert split_article(text, 25, overlap=1) == [
+        (0, 'First line.\nSecond line.\n'),
+        (12, 'Second line.\nThird line.\n')]
+
+
+def test_long_paragraph_is_kept_whole():
+    assert split_article('A long paragraph.\nShort.', 5, overlap=0) == [
+        (0, 'A long paragraph.\n'), (18, 'Short.')]
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        split_article(text, 0)
+    with pytest.raises(ValueError):
+        split_article(text, 10, overlap=-1)
+
+
+def test_article_passages():
+    articles = {'Lines': text, 'Empty': ''}
+    assert article_passages(articles) == [
+        {'name': 'Lines', 'text': text, 'article_offset': 0},
+        {'name': 'Empty', 'text': '', 'article_offset': 0}]
+    assert [passage['article_offset']
+            for passage in article_passages(articles, 25, 0)] == [0, 25]
+
+
+def test_map_answers_to_articles():
+    prediction = {'answers': [
+        {'answer': 'Third', 'offset_start_in_doc': 0,
+         'offset_end_in_doc': 5, 'meta': {'article_offset': 25}},
+        {'answer': None, 'offset_start_in_doc': None,
+         'offset_end_in_doc': None, 'meta': {'article_offset': 25}},
+        {'answer': 'First', 'offset_start_in_doc': 0,
+         'offset_end_in_doc': 5, 'meta': {}}]}
+    answers = map_answers_to_articles(prediction)['answers']
+    assert text[answers[0]['offset_start_in_doc']:
+                answers[0]['offset_end_in_doc']] == 'Third'
+    assert answers[1]['offset_start_in_doc'] is None
+    assert answers[2]['offset_start_in_doc'] == 0
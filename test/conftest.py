@@ -0,0 +1,62 @@
+import importlib
+import os
+
+import pytest
+
+from questionAnswering.responder_loader import ResponderLoader
+from svgParsing import formatted_text
+from svgParsing.lexicon import Lexicon
+
+# The words the parsing tests look up, so they don't need the packaged word
+# list.
+test_words = ['and', 'ins', 'insight', 'more', 'next', 'one', 'page', 'races',
+              'sight', 'three', 'twinned', 'two', 'word']
+
+
+@pytest.fixture
+def english_words(monkeypatch):
+    '''Use a small in-memory word list to decide where spaces go.'''
+    monkeypatch.setattr(formatted_text, 'english_words',
+                        Lexicon(words=test_words))
+    # Join decisions made with another word list mustn't be reused.
+    formatted_text.join_decision.cache_clear()
+    yield
+    formatted_text.join_decision.cache_clear()
+
+
+@pytest.fixture
+def svg_directory(tmp_path, monkeypatch):
+    '''Read svg pages from a temporary directory. Process pools started with
+    fork see it too.'''
+    from svgParsing import parse_rules
+
+    monkeypatch.setattr(formatted_text, 'svg_directory', str(tmp_path))
+    monkeypatch.setattr(parse_rules, 'svg_directory', str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def flask_main(monkeypatch):
+    '''The flask app's module, with a loader that hasn't started loading the
+    real responder. Tests set main.responder_loader to load a fake one.'''
+    monkeypatch.syspath_prepend(os.path.join(os.path.dirname(__file__), '..',
+                                             'flaskapp'))
+    with monkeypatch.context() as importing:
+        # Importing the app starts loading the models.
+        importing.setattr(ResponderLoader, 'start', lambda self: self)
+        main = importlib.import_module('main')
+    monkeypatch.setattr(main, 'responder_loader',
+                        ResponderLoader(lambda report_stage: None))
+    return main
+
+
+
+@pytest.fixture
+def serve_responder(flask_main, monkeypatch):
+    '''Return a function that makes the flask app answer with a fake
+    responder.'''
+    def serve(responder):
+        loader = ResponderLoader(lambda report_stage: responder)
+        loader.wait()
+        monkeypatch.setattr(flask_main, 'responder_loader', loader)
+    return serve
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from questionAnswering.dense_index import DenseIndex
+
+embeddings = np.array([[1.0, 0.0], [0.0, 1.0], [0.6, 0.8], [-1.0, 0.0]],
+                      dtype=np.float32)
+titles = ['East', 'North', 'North East', 'West']
+
+
+@pytest.mark.parametrize('dtype', [np.float32, np.float16])
+def test_search(dtype):
+    index = DenseIndex(embeddings.astype(dtype), titles)
+    results = index.search(np.array([1.0, 0.1]), top_k=2)
+    assert [titles[doc_id] for doc_id, _ in results] == ['East', 'North East']
+    assert results[0][1] == pytest.approx(1.0)
+    assert len(index.search(np.array([1.0, 0.1]), top_k=10)) == 4
+
+
+def test_save_and_load(tmp_path):
+    DenseIndex(embeddings, titles, 'v1').save(str(tmp_path))
+    loaded = DenseIndex.load(str(tmp_path))
+    assert isinstance(loaded.embeddings, np.memmap)
+    assert loaded.titles == titles
+    assert loaded.version == 'v1'
+    assert (loaded.search(np.array([0.0, 1.0]), top_k=1) ==
+            [(1, pytest.approx(1.0))])
+
+
+def test_embeddings_must_match_titles():
+    with pytest.raises(ValueError):
+        DenseIndex(embeddings, titles[:2])
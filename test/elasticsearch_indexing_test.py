@@ -0,0 +1,186 @@
+import threading
+
+import pytest
+
+from questionAnswering.elasticsearch_indexing import (aliased_indices,
+                                                      bulk_index,
+                                                      index_passages,
+                                                      passage_actions,
+                                                      switch_alias)
+
+passages = [{'name': 'Article {}'.format(i), 'text': 'Text {}'.format(i),
+             'article_offset': 0} for i in range(10)]
+
+
+class StubIndices:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def get_settings(self, index):
+        return {index: {'settings': {'index': {'refresh_interval': '5s'}}}}
+
+    def put_settings(self, index, body):
+        self.calls.append(('put_settings', body))
+
+    def refresh(self, index):
+        self.calls.append(('refresh', index))
+
+
+class StubClient:
+    '''Stores indexed documents by id. Rejects the first attempt at each id
+    in reject_once with the given status, and fails whole requests while
+    failing_requests is above 0.'''
+
+    def __init__(self, reject_once=(), status=429, failing_requests=0):
+        self.documents = {}
+        self.reject_once = set(reject_once)
+        self.status = status
+        self.failing_requests = failing_requests
+        self.bulk_sizes = []
+        self.calls = []
+        self.indices = StubIndices(self.calls)
+        self.lock = threading.Lock()
+
+    def bulk(self, body):
+        with self.lock:
+            self.calls.append(('bulk', len(body) // 2))
+            if self.failing_requests:
+                self.failing_requests -= 1
+                raise ConnectionError('Connection refused')
+            self.bulk_sizes.append(len(body) // 2)
+            items = []
+            for action, source in zip(body[::2], body[1::2]):
+                doc_id = action['index']['_id']
+                if doc_id in self.reject_once:
+                    self.reject_once.discard(doc_id)
+                    items.append({'index': {'_id': doc_id,
+                                            'status': self.status,
+                                            'error': {'type': 'rejected'}}})
+                else:
+                    self.documents[doc_id] = source
+                    items.append({'index': {'_id': doc_id, 'status': 201}})
+            return {'errors': any(item['index']['status'] >= 300
+                                  for item in items),
+                    'items': items}
+
+
+def test_indexes_in_chunks():
+    client = StubClient()
+    actions = passage_actions('document', passages)
+    assert bulk_index(client, actions, chunk_size=3, thread_count=2) == 10
+    assert sorted(client.bulk_sizes) == [1, 3, 3, 3]
+    assert sorted(source['name'] for source in client.documents.values()) \
+        == sorted(passage['name'] for passage in passages)
+    assert not any(key.startswith('_')
+                   for source in client.documents.values() for key in source)
+
+
+def test_retries_rejected_documents_with_backoff():
+    actions = passage_actions('document', passages)
+    client = StubClient(reject_once=[actions[0]['_id'], actions[5]['_id']])
+    sleeps = []
+    bulk_index(client, actions, chunk_size=4, sleep=sleeps.append)
+    assert len(client.documents) == 10
+    assert sleeps == [0.5]
+
+
+def test_retries_failed_requests():
+    client = StubClient(failing_requests=2)
+    sleeps = []
+    bulk_index(client, passage_actions('document', passages), chunk_size=100,
+               sleep=sleeps.append)
+    assert len(client.documents) == 10
+    assert sleeps == [0.5, 1.0]
+
+
+def test_gives_up():
+    client = StubClient(failing_requests=10)
+    with pytest.raises(ValueError):
+        bulk_index(client, passage_actions('document', passages),
+                   max_retries=2, sleep=lambda seconds: None)
+
+
+def test_does_not_retry_permanent_errors():
+    actions = passage_actions('document', passages)
+    client = StubClient(reject_once=[actions[0]['_id']], status=400)
+    with pytest.raises(ValueError):
+        bulk_index(client, actions, sleep=lambda seconds: None)
+    assert len(client.documents) == 9
+
+
+def test_ids_are_stable():
+    assert passage_actions('a', passages)[0]['_id'] == \
+        passage_actions('b', passages)[0]['_id']
+    assert len({action['_id']
+                for action in passage_actions('a', passages)}) == 10
+
+
+def test_refresh_is_off_during_load():
+    client = StubClient()
+    index_passages(client, 'document', passages)
+    assert client.calls[0] == ('put_settings',
+                               {'index': {'refresh_interval': '-1'}})
+    assert client.calls[-2:] == [
+        ('put_settings', {'index': {'refresh_interval': '5s'}}),
+        ('refresh', 'document')]
+
+
+class StubAliasIndices:
+    '''Indices by name, with the aliases of each.'''
+
+    def __init__(self, names):
+        self.aliases = {name: set() for name in names}
+
+    def exists(self, index):
+        return index in self.aliases or self.exists_alias(index)
+
+    def exists_alias(self, name):
+        return any(name in aliases for aliases in self.aliases.values())
+
+    def get_alias(self, name):
+        return {index: {'aliases': {name: {}}}
+                for index, aliases in self.aliases.items() if name in aliases}
+
+    def get(self, index):
+        prefix = index.rstrip('*')
+        return {name: {} for name in self.aliases if name.startswith(prefix)}
+
+    def update_aliases(self, body):
+        for action in body['actions']:
+            (kind, target), = action.items()
+            if kind == 'add':
+                self.aliases[target['index']].add(target['alias'])
+            elif kind == 'remove':
+                self.aliases[target['index']].discard(target['alias'])
+            else:
+                del self.aliases[target['index']]
+
+    def delete(self, index):
+        del self.aliases[index]
+
+
+class StubAliasClient:
+    def __init__(self, names):
+        self.indices = StubAliasIndices(names)
+
+
+def test_switch_alias():
+    client = StubAliasClient(['document', 'document-v1', 'document-v2',
+                              'document-v3', 'label'])
+    # The unversioned index is replaced by the alias.
+    assert switch_alias(client, 'document', 'document-v1') == [
+        'document-v2', 'document-v3']
+    assert aliased_indices(client, 'document') == ['document-v1']
+    assert 'document' not in client.indices.aliases
+
+    client.indices.aliases['document-v2'] = set()
+    assert switch_alias(client, 'document', 'document-v2') == []
+    assert aliased_indices(client, 'document') == ['document-v2']
+    assert sorted(client.indices.aliases) == ['document-v1', 'document-v2',
+                                              'label']
+
+    client.indices.aliases['document-v3'] = set()
+    assert switch_alias(client, 'document', 'document-v3',
+                        keep_previous=False) == ['document-v1',
+                                                 'document-v2']
+    assert aliased_indices(client, 'document') == ['document-v3']
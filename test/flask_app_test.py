@@ -0,0 +1,66 @@
+import pytest
+
+
+class RecordingResponder:
+    '''Records the arguments each question is asked with.'''
+
+    def __init__(self):
+        self.calls = []
+
+    def top_answer_in_context(self, question, top_5=False, adaptive=None,
+                              use_cache=True):
+        self.calls.append((question, top_5, adaptive, use_cache))
+        return '<p>answer</p>'
+
+
+def test_questions_can_bypass_the_answer_cache(flask_main, serve_responder):
+    responder = RecordingResponder()
+    serve_responder(responder)
+    client = flask_main.app.test_client()
+
+    client.post('/json-question', json={'question': 'cached'})
+    client.post('/json-answers-in-context',
+                json={'question': 'timed', 'adaptive': True, 'cache': False})
+    assert responder.calls == [('cached', False, None, True),
+                               ('timed', True, True, False)]
+
+
+@pytest.fixture
+def admin_token(flask_main, monkeypatch):
+    '''Turn on reindexing, with an admin token.'''
+    monkeypatch.setattr(flask_main, 'admin_reindex_enabled', True)
+    monkeypatch.setattr(flask_main, 'admin_token', 'secret')
+    return {'X-Crows-Admin-Token': 'secret'}
+
+
+def test_reindexing_is_off_by_default(flask_main, serve_responder):
+    serve_responder(RecordingResponder())
+    response = flask_main.app.test_client().post(
+        '/admin/reindex', headers={'X-Crows-Admin-Token': 'secret'})
+    assert response.status_code == 404
+
+
+def test_reindexing_needs_the_admin_token(flask_main, serve_responder,
+                                          admin_token):
+    serve_responder(RecordingResponder())
+    client = flask_main.app.test_client()
+    # Coming from this machine, like every request behind a reverse proxy.
+    assert client.post('/admin/reindex').status_code == 403
+    assert client.post('/admin/reindex', headers={
+        'X-Crows-Admin-Token': 'guess'}).status_code == 403
+    assert client.get('/admin/reindex/status').status_code == 403
+    assert client.get('/admin/reindex/status',
+                      headers=admin_token).status_code == 200
+    # Starting a reindex changes the index, so GET can't.
+    assert client.get('/admin/reindex',
+                      headers=admin_token).status_code == 405
+
+
+def test_reindexing_is_off_in_prefork_workers(flask_main, serve_responder,
+                                               admin_token, monkeypatch):
+    serve_responder(RecordingResponder())
+    monkeypatch.setattr(flask_main, 'prefork_master_pid', 1)
+    response = flask_main.app.test_client().post('/admin/reindex',
+                                                 headers=admin_token)
+    assert response.status_code == 409
+    assert 'Restart the server' in response.get_json()['error']
@@ -1,7 +1,20 @@
-from functools import partial
+import os
+import pickle
+import tracemalloc
+import xml.etree.ElementTree as ET
+from functools import partial, reduce
 import pytest
 
-from svgParsing.formatted_text import FormattedText
+from svgParsing import formatted_text
+from svgParsing.formatted_text import (CompactPage, FormattedText,
+                                       iter_text_pieces,
+                                       join_decision, merge_pages,
+                                       merge_runs, parse_svg_tag,
+                                       stitch_pages, strip_footer,
+                                       svg_to_text, traverse_element_tree,
+                                       xml_namespace)
+
+pytestmark = pytest.mark.usefixtures('english_words')
 
 no_space_cases = [('T', 'winned'),
                   ('Half', '-'),
@@ -85,3 +98,216 @@ def test_bold_triple_case():
     first_merge = plain_word.merge(bold_word)
     second_merge = first_merge.merge(plain_word)
     assert second_merge.text == expected
+
+def test_join_decisions_are_cached():
+    join_decision.cache_clear()
+    formatted_text_fn('Ins').merge(formatted_text_fn('ight'))
+    formatted_text_fn('The Ins').merge(formatted_text_fn('ight of'))
+    cache_info = join_decision.cache_info()
+    assert (cache_info.hits, cache_info.misses) == (1, 1)
+
+
+@pytest.mark.parametrize('page_texts', [
+    [],
+    [[], ['one']],
+    [['Races', 'and'], ['more', 'Next'], [], ['page']],
+    [['one'], ['two'], ['three']],
+])
+def test_stitch_pages_matches_merge_pages(page_texts):
+    def make_pages():
+        return [[formatted_text_fn(text) for text in texts]
+                for texts in page_texts]
+
+    stitched = [text.text for text in stitch_pages(make_pages())]
+    reduced = [text.text for text in reduce(merge_pages, make_pages(), [])]
+    assert stitched == reduced
+
+
+def svg_text(content, size=42, fill='#000000', bold=False):
+    style = 'fill:{};font-size:{}px'.format(fill, size)
+    if bold:
+        style += ';font-weight:bold'
+    return '<text style="{}"><tspan>{}</tspan></text>'.format(style, content)
+
+
+def svg_page(*children):
+    return ('<svg xmlns="http://www.w3.org/2000/svg">{}</svg>'
+            .format(''.join(children)))
+
+
+footer = [svg_text('Permission granted to copy', size=30),
+          svg_text('12', size=40),
+          svg_text('System Reference Document 5.1', size=30)]
+
+svg_pages = {
+    'nested_groups': svg_page(
+        '<g>', svg_text('Races'), '<g><g>', svg_text('and'), '</g>',
+        svg_text('more', size=50), '</g>', svg_text('Next', size=50),
+        '</g>'),
+    'after_first_group': svg_page(
+        svg_text('Before the group'),
+        '<g>', svg_text('one'), svg_text('two'), '</g>',
+        '<g>', svg_text('Second group'), '</g>',
+        svg_text('After the groups')),
+    'footer': svg_page('<g>', *footer, svg_text('Insight', bold=True),
+                       svg_text('page'), '</g>'),
+    'footer_only': svg_page('<g>', *footer, '</g>'),
+    'short_page': svg_page('<g>', svg_text('one'),
+                           svg_text('two', size=50), '</g>'),
+    'empty_tspan': svg_page('<g>', svg_text('one'),
+                            '<text style="fill:#000000;font-size:42px">'
+                            '</text>', svg_text('three'), '</g>'),
+}
+
+
+def dom_svg_to_text(filename):
+    '''svg_to_text as it was before pages were streamed: the whole tree is
+    parsed, and the text elements of the first top-level group are merged
+    and stripped of their footer in lists.'''
+    root = ET.parse(os.path.join(formatted_text.svg_directory,
+                                 filename)).getroot()
+    top_g = root.find(xml_namespace['svg'] + 'g')
+    text_list = []
+    for element in traverse_element_tree(top_g):
+        if parse_svg_tag(element) == 'text':
+            text_object = FormattedText.from_text_element(element)
+            if text_object:
+                text_list.append(text_object)
+
+    merged_text_list = []
+    merge_text = text_list[0]
+    for text in text_list[1:]:
+        if merge_text.should_merge(text):
+            merge_text = merge_text.merge(text)
+        else:
+            merged_text_list.append(merge_text)
+            merge_text = text
+    merged_text_list.append(merge_text)
+
+    if ('Permission granted' in merged_text_list[0].text and
+            'System Reference Document' in merged_text_list[2].text):
+        merged_text_list = merged_text_list[3:]
+    return merged_text_list
+
+
+@pytest.fixture
+def svg_files(svg_directory):
+    for name, svg in svg_pages.items():
+        (svg_directory / (name + '.svg')).write_text(svg)
+    return svg_directory
+
+
+@pytest.mark.parametrize('name', sorted(svg_pages))
+def test_svg_to_text_matches_dom_parsing(svg_files, name):
+    filename = name + '.svg'
+    assert ([text.to_tuple() for text in svg_to_text(filename)] ==
+            [text.to_tuple() for text in dom_svg_to_text(filename)])
+
+
+def test_iter_text_pieces_reads_only_the_first_group(svg_files):
+    pieces = iter_text_pieces(str(svg_files / 'after_first_group.svg'))
+    assert [piece.text for piece in pieces] == ['one', 'two']
+
+
+def test_iter_text_pieces_reads_nested_groups(svg_files):
+    pieces = iter_text_pieces(str(svg_files / 'nested_groups.svg'))
+    # Collected first, so the pieces must outlive the elements they were
+    # read from.
+    assert [piece.text for piece in list(pieces)] == \
+        ['Races', 'and', 'more', 'Next']
+
+
+def test_merge_runs():
+    texts = [formatted_text_fn('Races'), formatted_text_fn('and'),
+             FormattedText('more', color='#000000', size=50),
+             FormattedText('Next', color='#000000', size=50),
+             formatted_text_fn('page')]
+    assert [text.text for text in merge_runs(texts)] == \
+        ['Races and', 'more Next', 'page']
+    assert list(merge_runs([])) == []
+
+
+def test_strip_footer():
+    texts = [formatted_text_fn('Permission granted to copy'),
+             formatted_text_fn('12'),
+             formatted_text_fn('System Reference Document 5.1'),
+             formatted_text_fn('Insight')]
+    assert [text.text for text in strip_footer(texts)] == ['Insight']
+    assert list(strip_footer(texts[:3])) == []
+
+
+def test_strip_footer_keeps_short_pages():
+    # The DOM parser failed on these, by looking for a third piece of text.
+    texts = [formatted_text_fn('Permission granted to copy'),
+             formatted_text_fn('12')]
+    assert list(strip_footer(texts)) == texts
+    assert list(strip_footer([])) == []
+
+
+compact_texts = [FormattedText('Races', '#000000', 42, bold=True),
+                 FormattedText('and', '#000000', 42, italic=True),
+                 FormattedText('more', '#ff0000', 50, True, True),
+                 FormattedText('Next', '#ff0000', 50)]
+
+
+def test_compact_page_round_trip():
+    page = CompactPage(compact_texts)
+    assert len(page) == 4
+    assert [text.to_tuple() for text in page] == \
+        [text.to_tuple() for text in compact_texts]
+    assert page[-1].to_tuple() == compact_texts[-1].to_tuple()
+    assert [text.text for text in page[1:3]] == ['and', 'more']
+
+    page[0] = formatted_text_fn('one')
+    del page[1]
+    page.insert(0, formatted_text_fn('two'))
+    assert [text.text for text in page] == ['two', 'one', 'more', 'Next']
+
+
+def test_compact_page_pickles_with_colors():
+    page = CompactPage(compact_texts)
+    copy = pickle.loads(pickle.dumps(page))
+    assert [text.to_tuple() for text in copy] == \
+        [text.to_tuple() for text in compact_texts]
+
+
+@pytest.mark.parametrize('page_texts', [
+    [[], ['one']],
+    [['Races', 'and'], ['more', 'Next'], [], ['page']],
+])
+def test_merge_pages_on_compact_pages(page_texts):
+    def make_pages(page_type):
+        return [page_type(formatted_text_fn(text) for text in texts)
+                for texts in page_texts]
+
+    compact = reduce(merge_pages, make_pages(CompactPage), CompactPage())
+    reduced = reduce(merge_pages, make_pages(list), [])
+    assert isinstance(compact, CompactPage)
+    assert [text.text for text in compact] == [text.text for text in reduced]
+    assert [text.text for text in stitch_pages(make_pages(CompactPage))] == \
+        [text.text for text in reduced]
+
+
+def test_svg_to_text_compact(svg_files):
+    page = svg_to_text('footer.svg', compact=True)
+    assert isinstance(page, CompactPage)
+    assert [text.to_tuple() for text in page] == \
+        [text.to_tuple() for text in svg_to_text('footer.svg')]
+
+
+def test_compact_page_uses_less_memory():
+    texts = [FormattedText('word {}'.format(i), '#000000', 42 + i % 3,
+                           i % 2 == 0) for i in range(2000)]
+
+    def traced_size(build):
+        tracemalloc.start()
+        result = build()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return size, result
+
+    # The text strings are shared, so only the objects and columns count.
+    list_size, _ = traced_size(lambda: [FormattedText(*text.to_tuple())
+                                        for text in texts])
+    compact_size, _ = traced_size(lambda: CompactPage(texts))
+    assert compact_size < list_size / 2
@@ -0,0 +1,68 @@
+import asyncio
+import threading
+
+import pytest
+
+from questionAnswering.inference_pool import (InferencePool, InferenceTimeout,
+                                              PoolFull)
+
+
+def test_call_returns_result():
+    pool = InferencePool(workers=2, queue_depth=0)
+    assert pool.call(pow, 2, 10) == 1024
+    assert pool.stats()['completed'] == 1
+    pool.close()
+
+
+def test_full_queue_is_refused():
+    release = threading.Event()
+    pool = InferencePool(workers=1, queue_depth=1, timeout=5)
+    running = pool.submit(release.wait, 5)
+    waiting = pool.submit(release.wait, 5)
+    with pytest.raises(PoolFull):
+        pool.submit(release.wait, 5)
+    assert pool.stats()['rejected'] == 1
+    release.set()
+    assert running.result(5) and waiting.result(5)
+    # Room again once the tasks finish.
+    assert pool.call(len, 'abc') == 3
+    pool.close()
+
+
+def test_timeout_drops_waiting_task():
+    release = threading.Event()
+    calls = []
+    pool = InferencePool(workers=1, queue_depth=1)
+    pool.submit(release.wait, 5)
+    with pytest.raises(InferenceTimeout):
+        pool.call(calls.append, 'late', timeout=0.01)
+    release.set()
+    pool.close()
+    assert calls == []
+    stats = pool.stats()
+    assert (stats['timed_out'], stats['in_flight']) == (1, 0)
+
+
+def test_run_in_event_loop():
+    release = threading.Event()
+    pool = InferencePool(workers=1, queue_depth=0)
+
+    async def ask():
+        first = asyncio.ensure_future(pool.run(release.wait, 5))
+        await asyncio.sleep(0)
+        with pytest.raises(PoolFull):
+            await pool.run(len, 'abc')
+        release.set()
+        assert await first
+        with pytest.raises(InferenceTimeout):
+            await pool.run(threading.Event().wait, 0.5, timeout=0.01)
+
+    asyncio.run(ask())
+    pool.close()
+
+
+def test_invalid_sizes():
+    with pytest.raises(ValueError):
+        InferencePool(workers=0)
+    with pytest.raises(ValueError):
+        InferencePool(queue_depth=-1)
@@ -0,0 +1,37 @@
+import pytest
+
+from svgParsing.lexicon import Lexicon
+
+words = ['insight', 'a', 'zebra', 'Aaron', 'ins', 'sight', 'aardvark']
+
+
+@pytest.fixture
+def lexicon(tmp_path):
+    filepath = str(tmp_path / 'words.txt')
+    Lexicon.write(words, filepath)
+    return Lexicon(filepath)
+
+
+@pytest.mark.parametrize('word', ['insight', 'a', 'zebra', 'aardvark', 'ins'])
+def test_contains(lexicon, word):
+    assert word in lexicon
+
+
+@pytest.mark.parametrize('word', ['aaron', 'Aaron', 'insig', 'zzz', '', 'b'])
+def test_does_not_contain(lexicon, word):
+    assert word not in lexicon
+
+
+def test_in_memory_words():
+    lexicon = Lexicon(words=['Aaron', 'word'])
+    assert lexicon.filepath is None
+    assert 'word' in lexicon
+    # Like a file written by Lexicon.write, only lowercase words are kept.
+    assert 'Aaron' not in lexicon
+    assert 'aaron' not in lexicon
+
+
+def test_missing_file_is_an_error(tmp_path):
+    lexicon = Lexicon(str(tmp_path / 'missing.txt'))
+    with pytest.raises(FileNotFoundError):
+        'word' in lexicon
@@ -0,0 +1,92 @@
+import pytest
+
+from questionAnswering.metrics import Registry, TimedReader, histogram_totals
+
+
+def test_counter():
+    registry = Registry()
+    lookups = registry.counter('lookups_total', 'Lookups.', ['result'])
+    lookups.inc(result='hit')
+    lookups.inc(2, result='hit')
+    lookups.inc(result='miss')
+    assert lookups.value(result='hit') == 3
+    assert registry.render() == (
+        '# HELP lookups_total Lookups.\n'
+        '# TYPE lookups_total counter\n'
+        'lookups_total{result="hit"} 3\n'
+        'lookups_total{result="miss"} 1\n')
+
+
+def test_labels_must_match():
+    registry = Registry()
+    lookups = registry.counter('lookups_total', 'Lookups.', ['result'])
+    with pytest.raises(ValueError):
+        lookups.inc(stage='reader')
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    seconds = registry.histogram('seconds', 'Seconds.', ['stage'],
+                                 buckets=(0.1, 1))
+    for value in [0.05, 0.1, 0.5, 2]:
+        seconds.observe(value, stage='reader')
+    assert seconds.totals(stage='reader') == (4, pytest.approx(2.65))
+    lines = registry.render().splitlines()
+    assert lines[2:] == [
+        'seconds_bucket{stage="reader",le="0.1"} 2',
+        'seconds_bucket{stage="reader",le="1"} 3',
+        'seconds_bucket{stage="reader",le="+Inf"} 4',
+        'seconds_sum{stage="reader"} 2.65',
+        'seconds_count{stage="reader"} 4']
+    assert histogram_totals(registry.render(), 'seconds') == \
+        {'stage="reader"': [4, 2.65]}
+
+
+def test_timer_records_on_error():
+    registry = Registry()
+    seconds = registry.histogram('seconds', 'Seconds.', ['stage'])
+    with pytest.raises(RuntimeError):
+        with seconds.time(stage='reader'):
+            raise RuntimeError()
+    assert seconds.totals(stage='reader')[0] == 1
+
+
+def test_disabled_records_nothing():
+    registry = Registry(enabled=False)
+    seconds = registry.histogram('seconds', 'Seconds.', ['stage'])
+    lookups = registry.counter('lookups_total', 'Lookups.')
+    with seconds.time(stage='reader'):
+        pass
+    seconds.observe(1, stage='reader')
+    lookups.inc()
+    assert seconds.totals(stage='reader') == (0, 0)
+    assert lookups.value() == 0
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    errors = registry.counter('errors_total', 'Errors.', ['where'])
+    errors.inc(where='a "quoted"\\path')
+    assert 'errors_total{where="a \\"quoted\\"\\\\path"} 1' in \
+        registry.render()
+
+
+class FakeDocument:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeReader:
+    name = 'fake'
+
+    def predict(self, question, documents, top_k):
+        return {'question': question, 'answers': []}
+
+
+def test_timed_reader_passes_through():
+    reader = TimedReader(FakeReader())
+    assert reader.name == 'fake'
+    prediction = reader.predict(question='how tall',
+                                documents=[FakeDocument('three feet tall')],
+                                top_k=1)
+    assert prediction == {'question': 'how tall', 'answers': []}
@@ -0,0 +1,51 @@
+import os
+
+from svgParsing.formatted_text import FormattedText
+from svgParsing.page_cache import PageCache
+
+page = [FormattedText('Races', '#58180d', 108),
+        FormattedText('bold words', '#000000', 42, bold=True),
+        FormattedText('italic words', '#000000', 42, italic=True)]
+
+
+def write_svg(directory, content):
+    svg_filepath = directory / '1.svg'
+    svg_filepath.write_text(content)
+    return str(svg_filepath)
+
+
+def test_round_trip(tmp_path):
+    cache = PageCache(str(tmp_path / 'cache'))
+    key = cache.key(write_svg(tmp_path, '<svg/>'))
+    assert cache.get(key) is None
+
+    cache.put(key, page)
+    cached_page = cache.get(key)
+    assert ([text.to_tuple() for text in cached_page] ==
+            [text.to_tuple() for text in page])
+
+
+def test_changed_file_changes_key(tmp_path):
+    cache = PageCache(str(tmp_path / 'cache'))
+    key = cache.key(write_svg(tmp_path, '<svg/>'))
+    cache.put(key, page)
+
+    new_key = cache.key(write_svg(tmp_path, '<svg><g/></svg>'))
+    assert new_key != key
+    assert cache.get(new_key) is None
+
+
+def test_prune(tmp_path):
+    cache = PageCache(str(tmp_path / 'cache'))
+    old_key, new_key = 'a' * 64, 'b' * 64
+    cache.put(old_key, page)
+    cache.put(new_key, page)
+    (tmp_path / 'cache' / (old_key + '.json.tmp')).write_text('[')
+    (tmp_path / 'cache' / 'notes.txt').write_text('Not a page.')
+
+    cache.prune([new_key])
+    assert cache.get(old_key) is None
+    assert cache.get(new_key) is not None
+    assert sorted(os.listdir(tmp_path / 'cache')) == \
+        [new_key + '.json', 'notes.txt']
+
@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+from svgParsing.page_cache import PageCache
+from svgParsing.parse_rules import iter_pages, parse_pages
+
+pytestmark = pytest.mark.usefixtures('english_words')
+
+
+def svg_text(content, size=42):
+    return ('<text style="fill:#000000;font-size:{}px"><tspan>{}</tspan>'
+            '</text>'.format(size, content))
+
+
+page_texts = [[('Races', 42), ('and', 42), ('more', 50)],
+              [('Next', 50), ('page', 42)],
+              [('one', 42), ('two', 60), ('three', 42)]]
+
+
+@pytest.fixture
+def svg_pages(svg_directory):
+    for page_number, texts in enumerate(page_texts, 1):
+        (svg_directory / '{}.svg'.format(page_number)).write_text(
+            '<svg xmlns="http://www.w3.org/2000/svg"><g>{}</g></svg>'.format(
+                ''.join(svg_text(*text) for text in texts)))
+    return range(1, len(page_texts) + 1)
+
+
+def test_process_pool_gives_the_same_pages_in_order(svg_pages):
+    serial = parse_pages(svg_pages, workers=1)
+    pooled = parse_pages(svg_pages, workers=2)
+    assert [[text.to_tuple() for text in page] for page in pooled] == \
+        [[text.to_tuple() for text in page] for page in serial]
+    assert [[text.text for text in page] for page in serial] == \
+        [['Races and', 'more'], ['Next', 'page'], ['one', 'two', 'three']]
+
+
+def test_compact_pages_hold_the_same_text(svg_pages):
+    compact = parse_pages(svg_pages, workers=2, compact=True)
+    assert [[text.to_tuple() for text in page] for page in compact] == \
+        [[text.to_tuple() for text in page]
+         for page in parse_pages(svg_pages)]
+
+
+def test_cache_is_pruned_when_stopping_early(svg_pages, tmp_path):
+    cache = PageCache(str(tmp_path / 'cache'))
+    cache.put('a' * 64, [])
+
+    pages = iter_pages(svg_pages, cache=cache)
+    next(pages)
+    pages.close()
+    # The stale page is removed, and the one that was read is kept.
+    assert sorted(os.listdir(tmp_path / 'cache')) == sorted(
+        cache.key(str(tmp_path / '{}.svg'.format(page_number))) + '.json'
+        for page_number in svg_pages[:1])
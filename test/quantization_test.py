@@ -0,0 +1,41 @@
+import pytest
+
+from questionAnswering.quantization import (quantize_reader,
+                                            quantized_model_filepath)
+
+torch = pytest.importorskip('torch')
+
+
+class FakeInferencer:
+    def __init__(self):
+        self.model = torch.nn.Sequential(torch.nn.Linear(8, 4),
+                                         torch.nn.ReLU(),
+                                         torch.nn.Linear(4, 2))
+
+
+class FakeReader:
+    def __init__(self):
+        self.inferencer = FakeInferencer()
+
+
+def test_quantize_reader_caches_weights(tmp_path):
+    torch.manual_seed(0)
+    cache_filepath = quantized_model_filepath(str(tmp_path / 'model'))
+    first = quantize_reader(FakeReader(), cache_filepath)
+    assert isinstance(first.inferencer.model[0],
+                      torch.nn.quantized.dynamic.Linear)
+
+    # A reader with different weights loads the saved quantized weights.
+    second = quantize_reader(FakeReader(), cache_filepath)
+    inputs = torch.randn(3, 8)
+    assert torch.equal(first.inferencer.model(inputs),
+                       second.inferencer.model(inputs))
+
+
+def test_quantized_output_is_close():
+    torch.manual_seed(0)
+    reader = FakeReader()
+    inputs = torch.randn(16, 8)
+    expected = reader.inferencer.model(inputs).detach()
+    quantized = quantize_reader(reader).inferencer.model(inputs)
+    assert torch.allclose(quantized, expected, atol=0.1)
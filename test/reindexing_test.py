@@ -0,0 +1,65 @@
+import json
+import threading
+
+from questionAnswering.reindexing import (BackgroundJob, SwitchableRetriever,
+                                          read_warm_up_questions)
+
+
+class NamedRetriever:
+    def __init__(self, name):
+        self.name = name
+
+    def retrieve(self, query, filters=None, top_k=10, index=None):
+        return [self.name, query, top_k]
+
+
+def test_switchable_retriever():
+    retriever = SwitchableRetriever(NamedRetriever('old'))
+    assert retriever.retrieve('question', top_k=3) == ['old', 'question', 3]
+    previous = retriever.switch(NamedRetriever('new'))
+    assert previous.name == 'old'
+    assert retriever.retrieve('question')[0] == 'new'
+
+
+def test_read_warm_up_questions(tmp_path):
+    benchmark_filepath = tmp_path / 'benchmark.json'
+    assert read_warm_up_questions(str(benchmark_filepath)) == []
+    benchmark_filepath.write_text(json.dumps({'data': [{'paragraphs': [
+        {'qas': [{'question': 'How tall is a halfling?'}]}]}]}))
+    assert read_warm_up_questions(str(benchmark_filepath)) == [
+        'How tall is a halfling?']
+
+
+def test_background_job_runs_one_at_a_time():
+    release = threading.Event()
+    stages = []
+
+    def task(report_stage):
+        report_stage('building')
+        stages.append('building')
+        release.wait(5)
+
+    job = BackgroundJob(task)
+    assert job.status() == {'running': False, 'stage': 'not started',
+                            'runs': 0}
+    assert job.start()
+    assert not job.start()
+    release.set()
+    job.wait(5)
+    status = job.status()
+    assert (status['stage'], status['runs'], status['running']) == (
+        'finished', 1, False)
+    assert job.start()
+    job.wait(5)
+    assert stages == ['building', 'building']
+
+
+def test_background_job_reports_errors():
+    def task(report_stage):
+        raise ValueError('No articles.')
+
+    job = BackgroundJob(task)
+    job.start()
+    job.wait(5)
+    assert job.status()['stage'] == 'failed'
+    assert job.status()['error'] == 'ValueError: No articles.'
@@ -0,0 +1,38 @@
+import threading
+
+import pytest
+
+from questionAnswering.responder_loader import (ResponderLoader,
+                                                ResponderNotReady)
+
+
+def test_loads_in_background():
+    release = threading.Event()
+
+    def factory(report_stage):
+        report_stage('loading reader')
+        release.wait()
+        return 'responder'
+
+    loader = ResponderLoader(factory).start()
+    with pytest.raises(ResponderNotReady):
+        loader.get()
+    assert not loader.wait(timeout=0.01)
+    assert loader.status()['stage'] == 'loading reader'
+
+    release.set()
+    assert loader.wait()
+    assert loader.get() == 'responder'
+    assert loader.status()['stage'] == 'ready'
+
+
+def test_load_errors_are_recorded():
+    def factory(report_stage):
+        raise ImportError('No module named haystack')
+
+    loader = ResponderLoader(factory)
+    assert not loader.wait()
+    with pytest.raises(ResponderNotReady) as error:
+        loader.get()
+    assert error.value.status['stage'] == 'failed'
+    assert 'haystack' in error.value.status['error']
@@ -0,0 +1,58 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from questionAnswering.shared_weights import (child_pids, map_model_weights,
+                                              memory_report, memory_usage,
+                                              supports_mmap, weights_filepath)
+
+
+def test_weights_filepath():
+    assert weights_filepath('/models/reader/') == '/models/reader--weights.pt'
+
+
+def test_memory_usage_of_this_process():
+    usage = memory_usage()
+    assert usage['rss_mb'] > 0
+    if 'pss_mb' in usage:
+        assert 0 < usage['pss_mb'] <= usage['rss_mb']
+
+
+def test_memory_report_of_children():
+    child = subprocess.Popen([sys.executable, '-c',
+                              'import time; time.sleep(30)'])
+    try:
+        assert child_pids(os.getpid()) == [child.pid]
+        report = memory_report([os.getpid(), child.pid, 2**22 + 1])
+    finally:
+        child.kill()
+        child.wait()
+
+    # The process that doesn't exist is left out.
+    assert sorted(report['processes']) == sorted([str(os.getpid()),
+                                                  str(child.pid)])
+    assert report['total_rss_mb'] == pytest.approx(
+        sum(usage['rss_mb'] for usage in report['processes'].values()))
+
+
+def test_map_model_weights(tmp_path):
+    torch = pytest.importorskip('torch')
+    if not supports_mmap():
+        pytest.skip('torch {} cannot memory map weights'.format(
+            torch.__version__))
+
+    torch.manual_seed(0)
+    filepath = str(tmp_path / 'model--weights.pt')
+    model = torch.nn.Linear(8, 4)
+    inputs = torch.randn(3, 8)
+    expected = model(inputs)
+    assert map_model_weights(model, filepath)
+    assert os.path.exists(filepath)
+    assert torch.equal(model(inputs), expected)
+
+    # A model with different weights loads the saved ones.
+    other = torch.nn.Linear(8, 4)
+    assert map_model_weights(other, filepath)
+    assert torch.equal(other(inputs), expected)
@@ -0,0 +1,84 @@
+from functools import partial
+
+import pytest
+
+from questionAnswering.adaptive_reading import read_documents
+from questionAnswering.streaming import stream_answers
+
+
+class FakeDocument:
+    def __init__(self, id, score, answer_score, article_offset=0):
+        self.id = id
+        self.text = id
+        self.score = score
+        self.answer_score = answer_score
+        self.meta = {'name': 'Article ' + id,
+                     'article_offset': article_offset}
+
+
+class FakeRetriever:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def retrieve(self, query, top_k=10):
+        return self.documents[:top_k]
+
+
+class FakeReader:
+    '''Finds one answer at the start of each document.'''
+
+    def __init__(self):
+        self.reads = []
+
+    def predict(self, question, documents, top_k):
+        self.reads.append([document.id for document in documents])
+        answers = [{'answer': document.text, 'score': document.answer_score,
+                    'document_id': document.id, 'offset_start_in_doc': 0,
+                    'offset_end_in_doc': len(document.text)}
+                   for document in documents]
+        answers.sort(key=lambda answer: answer['score'], reverse=True)
+        return {'question': question, 'no_ans_gap': len(documents),
+                'answers': answers[:top_k]}
+
+
+def stream(documents, top_k_reader=2, step=2):
+    reader = FakeReader()
+    updates = list(stream_answers(FakeRetriever(documents),
+                                  partial(read_documents, reader), 'question',
+                                  top_k_reader, step=step))
+    return updates, reader
+
+
+def answer_texts(prediction):
+    return [answer['answer'] for answer in prediction['answers']]
+
+
+def test_best_document_is_read_first():
+    documents = [FakeDocument('b', 5, 0.9), FakeDocument('a', 10, 0.2),
+                 FakeDocument('c', 3, 0.5), FakeDocument('d', 1, 0.7),
+                 FakeDocument('e', 0, 0.1)]
+    updates, reader = stream(documents)
+    assert reader.reads == [['a'], ['b', 'c'], ['d', 'e']]
+    assert [unread for _, unread in updates] == [4, 2, 0]
+    assert [answer_texts(prediction) for prediction, _ in updates] == \
+        [['a'], ['b', 'c'], ['b', 'd']]
+    assert updates[-1][0]['no_ans_gap'] == 2
+
+
+def test_offsets_are_mapped_once():
+    documents = [FakeDocument('a', 10, 0.9, article_offset=100),
+                 FakeDocument('b', 5, 0.1, article_offset=200)]
+    updates, _ = stream(documents)
+    answers = updates[-1][0]['answers']
+    assert [answer['offset_start_in_doc'] for answer in answers] == [100, 200]
+
+
+def test_no_documents():
+    updates, reader = stream([])
+    assert updates == [({'question': 'question', 'answers': []}, 0)]
+    assert reader.reads == []
+
+
+def test_step_must_be_positive():
+    with pytest.raises(ValueError):
+        stream([FakeDocument('a', 1, 1)], step=0)
@@ -0,0 +1,37 @@
+from svgParsing.formatted_text import FormattedText
+from svgParsing.table_filter import TableFilter, table_font_size
+from svgParsing.table_names import tables_to_remove
+
+
+def make_texts(text_size_pairs):
+    return [FormattedText(text, '#000000', size)
+            for text, size in text_size_pairs]
+
+
+def test_removes_table_and_title():
+    texts = make_texts([('Wind', 42), ('1 2 3', table_font_size),
+                        ('After', 42)])
+    table_filter = TableFilter(['Wind', 'Temperature'])
+    assert [t.text for t in table_filter.filter(texts)] == ['After']
+    assert table_filter.unmatched_titles() == ['Temperature']
+
+
+def test_keeps_unlisted_tables_and_titles_without_tables():
+    texts = make_texts([('Wind', 42), ('Other', 42), ('1 2 3', table_font_size),
+                        ('Wind', 42)])
+    table_filter = TableFilter(['Wind'])
+    assert ([t.text for t in table_filter.filter(texts)] ==
+            ['Wind', 'Other', '1 2 3', 'Wind'])
+    assert table_filter.unmatched_titles() == ['Wind']
+
+
+def test_table_body_matching_a_title():
+    # A table whose text is also a title is only removed once.
+    texts = make_texts([('Wind', 42), ('Wind', table_font_size),
+                        ('4 5 6', table_font_size), ('After', 42)])
+    table_filter = TableFilter(['Wind'])
+    assert [t.text for t in table_filter.filter(texts)] == ['After']
+
+
+def test_configured_titles_are_strings():
+    assert all(isinstance(title, str) for title in tables_to_remove)